@@ -0,0 +1,71 @@
+"""
+Benchmark the strategies for large `in` lookups in the DjangoSerializer
+against a local sqlite database.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_in_strategies.py [rows] [values]
+"""
+import sys
+import timeit
+
+import django
+from django.conf import settings
+
+
+def setup_django():
+    settings.configure(
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        INSTALLED_APPS=[],
+    )
+    django.setup()
+
+    from django.db import connection, models
+
+    class Item(models.Model):
+        name = models.CharField(max_length=32)
+
+        class Meta:
+            app_label = 'filterql_benchmarks'
+
+    with connection.schema_editor() as schema_editor:
+        schema_editor.create_model(Item)
+
+    return Item
+
+
+def main(rows=200000, values=100000, repeat=3):
+    Item = setup_django()
+    Item.objects.bulk_create((Item(id=number, name='item %s' % number) for number in range(rows)), batch_size=5000)
+
+    from filterql import IN, L
+    from filterql.serializers import (ArrayInStrategy, ChunkedInStrategy, DjangoSerializer,
+                                      TemporaryTableInStrategy)
+
+    lookup = L('id', list(range(0, values * 2, 2)), lookup=IN)
+    temporary_table = TemporaryTableInStrategy()
+    strategies = [
+        ('none', None),
+        ('chunked', ChunkedInStrategy()),
+        ('array', ArrayInStrategy()),
+        ('temporary table', temporary_table),
+    ]
+
+    print('%s rows, `in` lookup with %s values, best of %s' % (rows, values, repeat))
+    for name, strategy in strategies:
+        serializer = DjangoSerializer(in_strategy=strategy)
+
+        def run():
+            return Item.objects.filter(serializer.deserialize(lookup)).count()
+
+        try:
+            with temporary_table.scope():
+                count = run()
+                seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+        except Exception as e:
+            print('%-16s failed: %s' % (name, e))
+        else:
+            print('%-16s %8.1f ms  (%s matches)' % (name, seconds * 1000, count))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
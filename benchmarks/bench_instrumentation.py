@@ -0,0 +1,51 @@
+"""
+Benchmark the overhead of the instrumentation hooks.
+
+Times every instrumented operation without instrumentation and with an
+instrumentation whose callbacks do nothing, and compares the cost of the
+check done when disabled with the time of the operation.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_instrumentation.py [width] [depth] [in_size]
+"""
+import json
+import sys
+
+from bench_in_strategies import setup_django
+from bench_suite import make_lookup, time_call
+
+from filterql import instrumentation, L
+from filterql.instrumentation import Instrumentation, instrumented
+
+
+def main(width=4, depth=3, in_size=100, repeat=5):
+    setup_django()
+    from filterql.serializers import DjangoSerializer
+
+    lookup = make_lookup(width, depth, in_size)
+    lookup_json = lookup.dumps()
+    lookup_dict = json.loads(lookup_json)
+    serializer = DjangoSerializer()
+
+    operations = [
+        ('dumps', lookup.dumps),
+        ('from_json', lambda: L.from_json(lookup_json)),
+        ('from_dict', lambda: L.from_dict(lookup_dict)),
+        ('django_deserialize', lambda: serializer.deserialize(lookup)),
+    ]
+
+    # The only work done by an instrumented function when disabled.
+    check = time_call(lambda: instrumentation.active is None, repeat) - time_call(lambda: None, repeat)
+
+    print('width %s, depth %s, `in` size %s, best of %s' % (width, depth, in_size, repeat))
+    print('%-20s %12s %12s %12s' % ('operation', 'disabled', 'no-op', 'check'))
+    for name, operation in operations:
+        disabled = time_call(operation, repeat)
+        with instrumented(Instrumentation()):
+            enabled = time_call(operation, repeat)
+        print('%-20s %9.1f us %9.1f us %10.4f %%' % (
+            name, disabled * 1e6, enabled * 1e6, max(check, 0) / disabled * 100))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
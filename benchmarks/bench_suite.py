@@ -0,0 +1,214 @@
+"""
+Benchmark lookup construction, serialization, parsing and the Django
+serializer on synthetic lookups of different widths, depths and `in` sizes.
+
+Results are saved per commit in `benchmarks/results/<commit>.json` and can be
+compared with the results of another commit. The exit code is 1 when a
+benchmark is slower than the threshold compared to the other results.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_suite.py [--filter TEXT] [--repeat N]
+        [--save] [--compare COMMIT|PATH] [--threshold RATIO]
+"""
+import argparse
+from datetime import datetime, timedelta
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+
+from filterql import GTE, ICONTAINS, IN, L, LT
+from filterql.lookup import LookupNode
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Widths, depths and `in` sizes of the synthetic lookups.
+SHAPES = [
+    (2, 1, 10),
+    (4, 2, 10),
+    (4, 3, 100),
+    (8, 2, 1000),
+]
+
+
+def make_leaf(number, in_size):
+    """
+    Create one of the leaf types used in real lookups.
+    """
+    kind = number % 5
+    if kind == 0:
+        return L('name', 'name %s' % number)
+    if kind == 1:
+        return L('count', number, lookup=LT)
+    if kind == 2:
+        return L('created', datetime(2017, 1, 1) + timedelta(days=number), lookup=GTE)
+    if kind == 3:
+        return L('id', list(range(number, number + in_size)), lookup=IN)
+    return L('owner__name', 'spindle', lookup=ICONTAINS)
+
+
+def make_lookup(width, depth, in_size, counter=None):
+    """
+    Create a lookup with `width` children per node and `depth` levels of
+    nodes, alternating `and` and `or` and negating every third node.
+    """
+    counter = counter if counter is not None else [0]
+    filters = []
+    for _ in range(width):
+        if depth > 1:
+            filters.append(make_lookup(width, depth - 1, in_size, counter))
+        else:
+            counter[0] += 1
+            filters.append(make_leaf(counter[0], in_size).filters[0])
+
+    connector = LookupNode.AND if depth % 2 else LookupNode.OR
+    return LookupNode(filters=filters, connector=connector, negated=counter[0] % 3 == 0)
+
+
+def chain(width, depth, in_size):
+    """
+    Build a lookup like users do, with `L(...)` and the `&`, `|` and `~`
+    operators.
+    """
+    lookup = make_leaf(0, in_size)
+    for number in range(1, width ** depth):
+        leaf = make_leaf(number, in_size)
+        if number % 3 == 0:
+            lookup = lookup | ~leaf
+        elif number % 2:
+            lookup = lookup & leaf
+        else:
+            lookup = lookup | leaf
+    return lookup
+
+
+def first_leaf(lookup):
+    """
+    Get the first leaf of a lookup, like to route on a top level field.
+    """
+    while isinstance(lookup, LookupNode):
+        lookup = lookup.filters[0]
+    return lookup
+
+
+def benchmarks(width, depth, in_size):
+    """
+    Get the benchmarks for a lookup shape as names and functions to time.
+    """
+    lookup = make_lookup(width, depth, in_size)
+    lookup_json = lookup.dumps()
+    lookup_dict = json.loads(lookup_json)
+
+    from filterql.serializers import DjangoSerializer
+    serializer = DjangoSerializer(use_process_cache=False)
+    uncached = DjangoSerializer(cache_size=0, use_process_cache=False)
+
+    return [
+        ('construct', lambda: chain(width, depth, in_size)),
+        ('dumps', lookup.dumps),
+        ('from_json', lambda: L.from_json(lookup_json)),
+        ('from_json_lazy_first_leaf', lambda: first_leaf(L.from_json(lookup_json, lazy=True))),
+        ('from_dict', lambda: L.from_dict(lookup_dict)),
+        ('django_deserialize', lambda: serializer.deserialize(lookup)),
+        ('django_deserialize_uncached', lambda: uncached.deserialize(lookup)),
+    ]
+
+
+def time_call(function, repeat):
+    """
+    Get the best time of a single call in seconds.
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(name_filter=None, repeat=5):
+    results = {}
+    for width, depth, in_size in SHAPES:
+        for name, function in benchmarks(width, depth, in_size):
+            key = '%s[width=%s,depth=%s,in=%s]' % (name, width, depth, in_size)
+            if name_filter and name_filter not in key:
+                continue
+            results[key] = time_call(function, repeat)
+            print('%-50s %12.1f us' % (key, results[key] * 1e6))
+            sys.stdout.flush()
+    return results
+
+
+def commit():
+    try:
+        output = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(RESULTS_DIR), stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return output.decode().strip()
+
+
+def save(results):
+    if not os.path.isdir(RESULTS_DIR):
+        os.makedirs(RESULTS_DIR)
+
+    path = os.path.join(RESULTS_DIR, '%s.json' % commit())
+    with open(path, 'w') as results_file:
+        json.dump({
+            'commit': commit(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results,
+        }, results_file, indent=2, sort_keys=True)
+    print('Saved results to %s' % path)
+
+
+def compare(results, other, threshold):
+    """
+    Print the ratio of the results with the other results.
+
+    Returns:
+        bool: True when a benchmark is slower than the threshold.
+    """
+    path = other if os.path.exists(other) else os.path.join(RESULTS_DIR, '%s.json' % other)
+    with open(path) as results_file:
+        other_results = json.load(results_file)['results']
+
+    slower = False
+    print('\nCompared with %s' % path)
+    for key, seconds in sorted(results.items()):
+        if key not in other_results:
+            continue
+        ratio = seconds / other_results[key]
+        flag = ''
+        if ratio > threshold:
+            flag = 'slower'
+            slower = True
+        elif ratio < 1 / threshold:
+            flag = 'faster'
+        print('%-50s %6.2fx %s' % (key, ratio, flag))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filter', help='only run benchmarks with this text in their name')
+    parser.add_argument('--repeat', type=int, default=5, help='the number of timings to take the best of')
+    parser.add_argument('--save', action='store_true', help='save the results for the current commit')
+    parser.add_argument('--compare', help='the commit or path of results to compare with')
+    parser.add_argument('--threshold', type=float, default=1.1, help='the ratio that counts as a regression')
+    args = parser.parse_args()
+
+    # The benchmarks of the Django serializer use a local sqlite database.
+    from bench_in_strategies import setup_django
+    setup_django()
+
+    results = run(args.filter, args.repeat)
+    if args.save:
+        save(results)
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,4 @@
-from .lookup import L  # noqa
+from .lookup import L, Param  # noqa
 from .lookup_types import (CONTAINS, DAY, ENDSWITH, EXACT, GT, GTE, HOUR, # noqa
                            ICONTAINS, IENDSWITH, IEXACT, IN, ISNULL,
                            ISTARTSWITH, LT, LTE, MINUTE, MONTH, SECOND,
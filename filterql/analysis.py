@@ -0,0 +1,378 @@
+from collections import namedtuple
+
+from .evaluators import iter_leaves
+from .lookup import FIELD_KEY, LOOKUP_KEY, LookupNode, VALUE_KEY
+from .lookup_types import (CONTAINS, ENDSWITH, EXACT, GT, GTE, ICONTAINS, IENDSWITH, IEXACT, IN, ISNULL,
+                           ISTARTSWITH, LT, LTE, STARTSWITH)
+from .rewriters import rewrite_date_ranges
+
+
+# Bounds are stored as sortable keys. An unbounded lower bound sorts before
+# and an unbounded upper bound after all values. For a bounded key the last
+# item makes a closed lower bound sort before an open one, and a closed
+# upper bound after an open one. The key of the upper bound of an interval is
+# also the key of the lower bound of the gap after it, and the other way round.
+_UNBOUNDED_LOWER = (0,)
+_UNBOUNDED_UPPER = (2,)
+
+
+def _lower_key(value, closed):
+    return _UNBOUNDED_LOWER if value is None else (1, value, 0 if closed else 1)
+
+
+def _upper_key(value, closed):
+    return _UNBOUNDED_UPPER if value is None else (1, value, 1 if closed else 0)
+
+
+Interval = namedtuple('Interval', ['lower', 'lower_closed', 'upper', 'upper_closed'])
+
+
+class IntervalSet(object):
+    """
+    Set of values of a field described by disjoint intervals and whether the
+    field can be null. Unbounded sides of an interval are None.
+    """
+    def __init__(self, keys=None, null=False):
+        """
+        Args:
+            keys (list): Pairs of lower and upper bound keys.
+            null (bool): Whether null is part of the set.
+        """
+        self._keys = self._normalize(keys or [])
+        self.null = null
+
+    @staticmethod
+    def _normalize(keys):
+        """
+        Sort the intervals and merge the ones that overlap or touch.
+        """
+        result = []
+        for lower, upper in sorted(key for key in keys if key[0] < key[1]):
+            # There is no gap when the upper bound does not sort before the
+            # next lower bound.
+            if result and not result[-1][1] < lower:
+                if result[-1][1] < upper:
+                    result[-1] = (result[-1][0], upper)
+            else:
+                result.append((lower, upper))
+        return result
+
+    @classmethod
+    def range(cls, lower=None, upper=None, lower_closed=True, upper_closed=False):
+        """
+        Create a set with a single interval, half open by default.
+        """
+        return cls([(_lower_key(lower, lower_closed), _upper_key(upper, upper_closed))])
+
+    @classmethod
+    def points(cls, values):
+        """
+        Create a set with the given values.
+        """
+        return cls([((1, value, 0), (1, value, 1)) for value in values])
+
+    @classmethod
+    def universe(cls):
+        """
+        Create a set with all values including null.
+        """
+        return cls([(_UNBOUNDED_LOWER, _UNBOUNDED_UPPER)], null=True)
+
+    @property
+    def intervals(self):
+        """
+        The intervals of the set in ascending order.
+        """
+        return [
+            Interval(
+                None if lower == _UNBOUNDED_LOWER else lower[1],
+                lower != _UNBOUNDED_LOWER and lower[2] == 0,
+                None if upper == _UNBOUNDED_UPPER else upper[1],
+                upper != _UNBOUNDED_UPPER and upper[2] == 1,
+            )
+            for lower, upper in self._keys
+        ]
+
+    def values(self):
+        """
+        Get the values of a set that only contains single values.
+
+        Returns:
+            list: The values, with None for null, or None when the set
+                contains a range.
+        """
+        values = [None] if self.null else []
+        for lower, upper in self._keys:
+            if lower[0] != 1 or upper[0] != 1 or lower[1:] != (upper[1], 0) or upper[2] != 1:
+                return None
+            values.append(lower[1])
+        return values
+
+    def is_empty(self):
+        return not self._keys and not self.null
+
+    def is_universe(self):
+        return self.null and self._keys == [(_UNBOUNDED_LOWER, _UNBOUNDED_UPPER)]
+
+    def union(self, other):
+        return IntervalSet(self._keys + other._keys, self.null or other.null)
+
+    def intersection(self, other):
+        keys = []
+        index = other_index = 0
+        while index < len(self._keys) and other_index < len(other._keys):
+            lower, upper = self._keys[index]
+            other_lower, other_upper = other._keys[other_index]
+            keys.append((max(lower, other_lower), min(upper, other_upper)))
+            if upper < other_upper:
+                index += 1
+            else:
+                other_index += 1
+        return IntervalSet(keys, self.null and other.null)
+
+    def complement(self):
+        keys = []
+        lower = _UNBOUNDED_LOWER
+        for interval_lower, interval_upper in self._keys:
+            keys.append((lower, interval_lower))
+            lower = interval_upper
+        keys.append((lower, _UNBOUNDED_UPPER))
+        return IntervalSet(keys, not self.null)
+
+    def issubset(self, other):
+        return self.intersection(other) == self
+
+    def overlaps(self, other):
+        return not self.intersection(other).is_empty()
+
+    def contains(self, value):
+        """
+        Check whether a value (or null for None) is part of the set.
+        """
+        if value is None:
+            return self.null
+        return any(lower <= (1, value, 0) and (1, value, 1) <= upper for lower, upper in self._keys)
+
+    def __eq__(self, other):
+        return isinstance(other, IntervalSet) and self._keys == other._keys and self.null == other.null
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'IntervalSet(%s, null=%s)' % (self.intervals, self.null)
+
+
+def _unknown():
+    """
+    Bounds for a part of a lookup that says nothing about the field.
+    """
+    return IntervalSet.universe(), IntervalSet()
+
+
+def _successor(prefix):
+    """
+    The smallest string after all strings that start with the prefix.
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def leaf_domain(filter_dict):
+    """
+    Get the exact set of values matching a filter dict.
+
+    Args:
+        filter_dict (dict): Dict with the filter keys and values.
+
+    Returns:
+        IntervalSet: The values of the field matching the filter or None when
+            the set can not be described with intervals.
+    """
+    lookup = filter_dict[LOOKUP_KEY]
+    value = filter_dict[VALUE_KEY]
+
+    if lookup == EXACT:
+        return IntervalSet(null=True) if value is None else IntervalSet.points([value])
+    if lookup == IN:
+        return IntervalSet.points(value)
+    if lookup == ISNULL:
+        return IntervalSet(null=True) if value else IntervalSet.range()
+    if lookup in (GT, GTE):
+        return IntervalSet.range(lower=value, lower_closed=lookup == GTE)
+    if lookup in (LT, LTE):
+        return IntervalSet.range(upper=value, upper_closed=lookup == LTE)
+    if lookup == STARTSWITH and isinstance(value, str) and value and ord(value[-1]) < 0x10ffff:
+        return IntervalSet.range(value, _successor(value))
+    return None
+
+
+def _analyze(node, field):
+    """
+    Get an over and under approximation of the values of a field matching a
+    lookup. Matching records always have a value in the over approximation
+    and records with a value in the under approximation always match,
+    whatever the values of their other fields.
+    """
+    results = []
+    for _filter in node.filters:
+        if isinstance(_filter, LookupNode):
+            results.append(_analyze(_filter, field))
+        elif _filter[FIELD_KEY] != field:
+            results.append(_unknown())
+        else:
+            try:
+                domain = leaf_domain(_filter)
+            except TypeError:
+                domain = None
+            results.append(_unknown() if domain is None else (domain, domain))
+
+    try:
+        if node.connector == LookupNode.OR:
+            over, under = IntervalSet(), IntervalSet()
+            for result in results:
+                over, under = over.union(result[0]), under.union(result[1])
+        else:
+            over, under = IntervalSet.universe(), IntervalSet.universe()
+            for result in results:
+                over, under = over.intersection(result[0]), under.intersection(result[1])
+    except TypeError:
+        # Values of different types that can not be ordered.
+        return _unknown()
+
+    if node.negated:
+        # A negated comparison never matches null in SQL, but always does in
+        # Python, so null is left out of the under approximation and always
+        # part of the over approximation.
+        over, under = under.complement(), over.complement()
+        over.null, under.null = True, False
+
+    return over, under
+
+
+def field_domain(lookup, field, as_datetime=False):
+    """
+    Get the values of a field that records matching a lookup can have.
+
+    The result is a superset of the values: a record with a value outside of
+    it never matches, which is enough to skip partitions or shards. `and`
+    nodes intersect, `or` nodes unite and `not` nodes complement the values
+    of their children. Date part lookups are first rewritten into ranges
+    with `rewrite_date_ranges`.
+
+    Args:
+        lookup (LookupNode): The lookup to analyze.
+        field (string): The name of the field.
+        as_datetime (bool): Whether the ranges for date part lookups should
+            use datetime bounds, for datetime fields.
+
+    Returns:
+        IntervalSet: The possible values of the field.
+    """
+    return _analyze(rewrite_date_ranges(lookup, as_datetime), field)[0]
+
+
+# Text lookup types as the kind of match and whether it is case insensitive.
+TEXT_MATCHES = {
+    EXACT: (EXACT, False),
+    IEXACT: (EXACT, True),
+    CONTAINS: (CONTAINS, False),
+    ICONTAINS: (CONTAINS, True),
+    STARTSWITH: (STARTSWITH, False),
+    ISTARTSWITH: (STARTSWITH, True),
+    ENDSWITH: (ENDSWITH, False),
+    IENDSWITH: (ENDSWITH, True),
+}
+
+
+def _text_implies(filter_dict, other_dict):
+    """
+    Check whether a text filter implies another text filter on the same field.
+    """
+    value, other_value = filter_dict[VALUE_KEY], other_dict[VALUE_KEY]
+    if not (isinstance(value, str) and isinstance(other_value, str)):
+        return False
+
+    kind, fold = TEXT_MATCHES[filter_dict[LOOKUP_KEY]]
+    other_kind, other_fold = TEXT_MATCHES[other_dict[LOOKUP_KEY]]
+
+    # A case insensitive match never implies a case sensitive one.
+    if fold and not other_fold:
+        return False
+    if other_fold:
+        value, other_value = value.lower(), other_value.lower()
+
+    if other_kind == EXACT:
+        return kind == EXACT and value == other_value
+    if other_kind == CONTAINS:
+        return other_value in value
+    if other_kind == STARTSWITH:
+        return kind in (EXACT, STARTSWITH) and value.startswith(other_value)
+    return kind in (EXACT, ENDSWITH) and value.endswith(other_value)
+
+
+def _single_field(node):
+    """
+    Get the field of a lookup that only has leaves on one field.
+    """
+    fields = set(_filter[FIELD_KEY] for _filter in iter_leaves(node))
+    return fields.pop() if len(fields) == 1 else None
+
+
+def _implies(lookup, other):
+    """
+    Check whether a lookup implies another, see `implies`.
+    """
+    if isinstance(lookup, dict) and isinstance(other, dict):
+        if lookup == other:
+            return True
+        if lookup[FIELD_KEY] != other[FIELD_KEY]:
+            return False
+        if lookup[LOOKUP_KEY] in TEXT_MATCHES and other[LOOKUP_KEY] in TEXT_MATCHES:
+            if _text_implies(lookup, other):
+                return True
+
+    if isinstance(other, LookupNode) and not other.negated:
+        if other.connector == LookupNode.AND:
+            if all(_implies(lookup, _filter) for _filter in other.filters):
+                return True
+        elif any(_implies(lookup, _filter) for _filter in other.filters):
+            return True
+
+    if isinstance(lookup, LookupNode) and not lookup.negated:
+        if lookup.connector == LookupNode.OR:
+            if lookup.filters and all(_implies(_filter, other) for _filter in lookup.filters):
+                return True
+        elif any(_implies(_filter, other) for _filter in lookup.filters):
+            return True
+
+    # Compare the values of the field when the other lookup only uses one field.
+    lookup = lookup if isinstance(lookup, LookupNode) else LookupNode(filters=[lookup])
+    other = other if isinstance(other, LookupNode) else LookupNode(filters=[other])
+    field = _single_field(other)
+    if field is None:
+        return False
+
+    try:
+        return _analyze(lookup, field)[0].issubset(_analyze(other, field)[1])
+    except TypeError:
+        return False
+
+
+def implies(lookup, other):
+    """
+    Check whether every record matching a lookup also matches another lookup.
+
+    The check is sound but incomplete: True means the lookup certainly
+    implies the other, False means it could not be proven. It covers
+    conjunctions and disjunctions of leaves, range bounds, `in` subsets, text
+    patterns and date part refinements. A narrower lookup can be evaluated
+    in memory over the cached results of a lookup it implies.
+
+    Args:
+        lookup (LookupNode): The (narrower) lookup.
+        other (LookupNode): The (wider) lookup.
+
+    Returns:
+        bool: True when the lookup implies the other.
+    """
+    return _implies(rewrite_date_ranges(lookup), rewrite_date_ranges(other))
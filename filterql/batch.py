@@ -0,0 +1,137 @@
+from .cache import canonical
+from .evaluators import check_date_parts, evaluate_leaf_mask, match_filter
+from .lookup import LookupNode
+
+
+class BatchEvaluator(object):
+    """
+    Evaluates many lookups against the same records at once.
+
+    The lookups are merged into a single DAG where equal leaves (with values
+    of the same types, see `canonical`) and equal subtrees (with the children
+    in any order) are shared, so every distinct predicate is evaluated once
+    per record or column, whatever the number of lookups using it.
+    """
+    def __init__(self, lookups):
+        """
+        Args:
+            lookups (list): The lookups to evaluate.
+        """
+        self.lookups = list(lookups)
+        # Leaves as filter dicts and nodes as the `or` flag, the negated flag
+        # and the indexes of their children. Children come before parents.
+        self.nodes = []
+        self._keys = {}
+        self.roots = [self._add(lookup) for lookup in self.lookups]
+
+    def _add(self, _filter):
+        if not isinstance(_filter, LookupNode):
+            key = canonical(_filter)
+            value = _filter
+        else:
+            children = []
+            for child in _filter.filters:
+                index = self._add(child)
+                if index not in children:
+                    children.append(index)
+
+            # A node with a single child is the same as the child.
+            if len(children) == 1 and not _filter.negated:
+                return children[0]
+
+            is_or = _filter.connector == LookupNode.OR
+            key = (is_or, _filter.negated, frozenset(children))
+            value = (is_or, _filter.negated, children)
+
+        index = self._keys.get(key)
+        if index is None:
+            index = self._keys[key] = len(self.nodes)
+            self.nodes.append(value)
+        return index
+
+    @property
+    def leaf_count(self):
+        """
+        The number of distinct leaves.
+        """
+        return sum(1 for node in self.nodes if isinstance(node, dict))
+
+    def evaluate(self, record):
+        """
+        Evaluate all lookups for a single record.
+
+        Every shared leaf or subtree is evaluated at most once, and only when
+        it is needed for the result.
+
+        Args:
+            record (dict|object): The record to evaluate the lookups for.
+
+        Returns:
+            list: A bool for every lookup, True when the record matches it.
+        """
+        nodes = self.nodes
+        results = [None] * len(nodes)
+
+        def evaluate(index):
+            result = results[index]
+            if result is None:
+                node = nodes[index]
+                if isinstance(node, dict):
+                    result = match_filter(node, record)
+                else:
+                    is_or, negated, children = node
+                    if is_or:
+                        result = any(evaluate(child) for child in children)
+                    else:
+                        result = all(evaluate(child) for child in children)
+                    result = result != negated
+                results[index] = result
+            return result
+
+        return [evaluate(root) for root in self.roots]
+
+    def evaluate_mask(self, records, date_parts=None):
+        """
+        Evaluate all lookups column by column for a list of records.
+
+        Args:
+            records (list): The records to evaluate the lookups for.
+            date_parts (DatePartCache): Cache with the decomposed datetime
+                fields of the records.
+
+        Returns:
+            list: A mask for every lookup, with a bool for every record.
+
+        Raises:
+            ValueError: When the date part cache is for other records.
+        """
+        check_date_parts(records, date_parts)
+        columns = {}
+        masks = []
+        for node in self.nodes:
+            if isinstance(node, dict):
+                masks.append(evaluate_leaf_mask(node, records, columns, date_parts))
+                continue
+
+            is_or, negated, children = node
+            mask = [not is_or] * len(records)
+            for child in children:
+                if is_or:
+                    mask = [a or b for a, b in zip(mask, masks[child])]
+                else:
+                    mask = [a and b for a, b in zip(mask, masks[child])]
+            masks.append([not value for value in mask] if negated else mask)
+
+        return [masks[root] for root in self.roots]
+
+    def filter(self, records, date_parts=None):
+        """
+        Filter a list of records with all lookups.
+
+        Returns:
+            list: The list of matching records for every lookup.
+        """
+        return [
+            [record for record, matches in zip(records, mask) if matches]
+            for mask in self.evaluate_mask(records, date_parts)
+        ]
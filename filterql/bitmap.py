@@ -0,0 +1,186 @@
+from .evaluators import get_field_value, match_filter
+from .lookup import FIELD_KEY, LOOKUP_KEY, LookupNode, VALUE_KEY
+from .lookup_types import EXACT, IN, ISNULL
+
+
+# Lookup types answered from the bitmaps of an index.
+INDEXED_LOOKUPS = [EXACT, IN, ISNULL]
+
+
+def bitset(indexes, size):
+    """
+    Create a bitset with the bits at the given indexes set.
+
+    Bitsets are Python ints, bit `i` is set when row `i` is part of the set.
+
+    Args:
+        indexes (iterable): The indexes of the rows in the set.
+        size (int): The number of rows.
+
+    Returns:
+        int: The bitset.
+    """
+    data = bytearray((size + 7) // 8)
+    for index in indexes:
+        data[index >> 3] |= 1 << (index & 7)
+    return int.from_bytes(bytes(data), 'little')
+
+
+def bitset_indexes(bits):
+    """
+    Get the indexes of the set bits of a bitset in ascending order.
+    """
+    indexes = []
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    for byte_index, byte in enumerate(data):
+        if byte:
+            offset = byte_index << 3
+            indexes.extend(offset + bit for bit in range(8) if byte >> bit & 1)
+    return indexes
+
+
+class BitmapIndex(object):
+    """
+    Bitmap index over fields with few distinct values of a list of records.
+
+    Every distinct value of an indexed field (including null) has a bitset
+    of the rows with that value. `exact`, `in` and `isnull` leaves on indexed
+    fields are answered with bitwise operations on these bitsets, `and`, `or`
+    and `not` nodes combine the results bitwise and all other leaves are only
+    checked for the rows that can still change the result.
+
+    The index is not updated when the records change.
+    """
+    def __init__(self, records, fields):
+        """
+        Args:
+            records (list): The records to index.
+            fields (iterable): The names of the fields to index.
+
+        Raises:
+            TypeError: When a value of an indexed field can not be hashed.
+        """
+        self.records = records
+        self.size = len(records)
+        self.universe = (1 << self.size) - 1
+        self.bitmaps = {}
+
+        for field in fields:
+            rows = {}
+            for index, record in enumerate(records):
+                rows.setdefault(get_field_value(record, field), []).append(index)
+            self.bitmaps[field] = dict((value, bitset(indexes, self.size)) for value, indexes in rows.items())
+
+    def cardinality(self, field):
+        """
+        The number of distinct values of an indexed field, null included.
+        """
+        return len(self.bitmaps[field])
+
+    def leaf_bitset(self, filter_dict):
+        """
+        Get the rows matching a filter dict from the bitmaps.
+
+        Returns:
+            int: The bitset of the matching rows, or None when the filter can
+                not be answered from the index.
+        """
+        bitmaps = self.bitmaps.get(filter_dict[FIELD_KEY])
+        lookup = filter_dict[LOOKUP_KEY]
+        if bitmaps is None or lookup not in INDEXED_LOOKUPS:
+            return None
+
+        value = filter_dict[VALUE_KEY]
+        if lookup == ISNULL:
+            null = bitmaps.get(None, 0)
+            return null if value else self.universe & ~null
+
+        values = [value] if lookup == EXACT else value
+        # A string matches its substrings with `in`, leave it to the evaluator.
+        if isinstance(values, str):
+            return None
+
+        bits = 0
+        try:
+            for value in values:
+                bits |= bitmaps.get(value, 0)
+        except TypeError:
+            return None
+        return bits
+
+    def _order(self, _filter):
+        # Evaluate indexed leaves first, then nodes and then other leaves.
+        if isinstance(_filter, LookupNode):
+            return 1
+        if _filter[FIELD_KEY] in self.bitmaps and _filter[LOOKUP_KEY] in INDEXED_LOOKUPS:
+            return 0
+        return 2
+
+    def _match_rows(self, filter_dict, candidates):
+        records = self.records
+        return bitset(
+            (index for index in bitset_indexes(candidates) if match_filter(filter_dict, records[index])),
+            self.size,
+        )
+
+    def _evaluate(self, node, candidates):
+        """
+        Get the rows of the candidates that match a node.
+        """
+        is_or = node.connector == LookupNode.OR
+        result = 0 if is_or else candidates
+        # The rows of the candidates whose result is not known yet.
+        open_rows = candidates
+
+        for _filter in sorted(node.filters, key=self._order):
+            if not open_rows:
+                break
+
+            if isinstance(_filter, LookupNode):
+                bits = self._evaluate(_filter, open_rows)
+            else:
+                bits = self.leaf_bitset(_filter)
+                if bits is None:
+                    bits = self._match_rows(_filter, open_rows)
+
+            if is_or:
+                result |= bits & open_rows
+                open_rows &= ~bits
+            else:
+                result &= bits
+                open_rows = result
+
+        if node.negated:
+            return candidates & ~result
+        return result
+
+    def evaluate(self, lookup):
+        """
+        Evaluate a lookup for all records.
+
+        Args:
+            lookup (LookupNode): The lookup to evaluate.
+
+        Returns:
+            int: The bitset of the matching rows.
+        """
+        return self._evaluate(lookup, self.universe)
+
+    def where(self, lookup):
+        """
+        Get the indexes of the records matching a lookup in ascending order.
+        """
+        return bitset_indexes(self.evaluate(lookup))
+
+    def count(self, lookup):
+        """
+        Get the number of records matching a lookup.
+        """
+        return bin(self.evaluate(lookup)).count('1')
+
+    def filter(self, lookup):
+        """
+        Get the records matching a lookup.
+        """
+        records = self.records
+        return [records[index] for index in self.where(lookup)]
@@ -0,0 +1,224 @@
+import hashlib
+import time
+
+import simplejson as json
+
+from .evaluators import filter_records, iter_leaves
+from .lookup import FIELD_KEY, LOOKUP_KEY, LookupNode, TYPE_KEY, VALUE_KEY
+from .lookup_types import IN
+from .utils import LRUCache, TypeEncoder
+
+
+def _canonical_children(node, connector, children):
+    for _filter in node.filters:
+        # Nested nodes with the same connector or a single child are merged.
+        if isinstance(_filter, LookupNode) and not _filter.negated and (
+                _filter.connector == connector or len(_filter) == 1):
+            _canonical_children(_filter, connector, children)
+        else:
+            children.add(canonical(_filter))
+    return children
+
+
+def canonical(lookup):
+    """
+    Get the canonical json for a lookup or filter dict, see `fingerprint`.
+
+    The type names of the values are part of the json, so values that are
+    encoded the same, like a date and its string, are not the same.
+
+    Args:
+        lookup (LookupNode|dict): The lookup or filter dict.
+
+    Returns:
+        string: Json that is the same for lookups with the same meaning.
+    """
+    if not isinstance(lookup, LookupNode):
+        value = lookup[VALUE_KEY]
+        filter_dict = {FIELD_KEY: lookup[FIELD_KEY], LOOKUP_KEY: lookup[LOOKUP_KEY], VALUE_KEY: value}
+        filter_dict[TYPE_KEY] = type(value).__name__
+        if filter_dict[LOOKUP_KEY] == IN:
+            try:
+                filter_dict[TYPE_KEY] = sorted(set(type(item).__name__ for item in value))
+                filter_dict[VALUE_KEY] = sorted(set(value))
+            except TypeError:
+                pass
+        return json.dumps(filter_dict, cls=TypeEncoder, sort_keys=True, use_decimal=True)
+
+    children = _canonical_children(lookup, lookup.connector, set())
+
+    # A node with a single child is the same as the child.
+    if len(children) == 1 and not lookup.negated:
+        return children.pop()
+
+    node_json = json.dumps({lookup.connector: sorted(children)})
+    if lookup.negated:
+        return json.dumps({LookupNode.NOT: node_json})
+    return node_json
+
+
+def fingerprint(lookup):
+    """
+    Get a fingerprint that is the same for lookups with the same meaning.
+
+    The order of the children of a node, duplicate children, nested nodes
+    with the same connector and the order of `in` values do not change the
+    fingerprint.
+
+    Args:
+        lookup (LookupNode): The lookup to get the fingerprint of.
+
+    Returns:
+        string: The hex digest of the canonical form of the lookup.
+    """
+    return hashlib.sha1(canonical(lookup).encode('utf-8')).hexdigest()
+
+
+class ResultCache(object):
+    """
+    Cache for the results of lookups, keyed by their fingerprint.
+
+    Entries are evicted when they are the least recently used of more than
+    `maxsize` entries or older than `ttl` seconds. Writes invalidate only the
+    entries with lookups on the written fields.
+    """
+    def __init__(self, maxsize=128, ttl=None, answer_from_supersets=False, timer=time.time):
+        """
+        Args:
+            maxsize (int): The maximum number of cached results.
+            ttl (float): The number of seconds a result is valid, forever
+                when None.
+            answer_from_supersets (bool): Whether to answer a lookup by
+                filtering the cached records of a lookup that contains it.
+                Only use this when the results are lists of records.
+            timer (callable): Function returning the current time in seconds.
+        """
+        self.ttl = ttl
+        self.answer_from_supersets = answer_from_supersets
+        self.timer = timer
+        self._entries = LRUCache(maxsize, on_evict=self._unindex)
+        self._field_keys = {}
+
+    @property
+    def maxsize(self):
+        """
+        The maximum number of cached results.
+        """
+        return self._entries.maxsize
+
+    @property
+    def hits(self):
+        """
+        The number of lookups answered from the cache.
+        """
+        return self._entries.hits
+
+    @property
+    def misses(self):
+        """
+        The number of lookups that were not cached.
+        """
+        return self._entries.misses
+
+    def get(self, lookup, executor):
+        """
+        Get the result of a lookup, executing it when it is not cached.
+
+        Args:
+            lookup (LookupNode): The lookup to get the result of.
+            executor (callable): Function that executes a lookup and returns
+                the result.
+
+        Returns:
+            The result of the lookup.
+        """
+        key = fingerprint(lookup)
+        entry = self._entries.peek(key)
+        if entry is not None and self._expired(entry):
+            self._remove(key)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry[1]
+
+        result = self._from_superset(lookup) if self.answer_from_supersets else None
+        if result is None:
+            result = executor(lookup)
+        self.set(lookup, result, key=key)
+        return result
+
+    def set(self, lookup, result, key=None):
+        """
+        Store the result of a lookup.
+
+        Args:
+            lookup (LookupNode): The lookup of the result.
+            result: The result of the lookup.
+            key (string): The fingerprint of the lookup, when already known.
+        """
+        key = key or fingerprint(lookup)
+        self._remove(key)
+
+        expires = None if self.ttl is None else self.timer() + self.ttl
+        fields = set(_filter[FIELD_KEY] for _filter in iter_leaves(lookup))
+        for field in fields:
+            self._field_keys.setdefault(field, set()).add(key)
+        self._entries.set(key, (lookup, result, expires, fields))
+
+    def _expired(self, entry):
+        return entry[2] is not None and entry[2] <= self.timer()
+
+    def _unindex(self, key, entry):
+        for field in entry[3]:
+            keys = self._field_keys[field]
+            keys.discard(key)
+            if not keys:
+                del self._field_keys[field]
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        if entry is not None:
+            self._unindex(key, entry)
+
+    def _from_superset(self, lookup):
+        """
+        Filter the cached records of a lookup that contains the given lookup.
+        """
+        for key, entry in self._entries.items():
+            if self._expired(entry):
+                self._remove(key)
+            elif entry[0].contains(lookup):
+                return filter_records(lookup, entry[1])
+        return None
+
+    def invalidate(self, fields):
+        """
+        Evict the results of all lookups on any of the given fields.
+
+        Args:
+            fields (iterable): The names of the written fields.
+
+        Returns:
+            int: The number of evicted results.
+        """
+        keys = set()
+        for field in fields:
+            keys.update(self._field_keys.get(field, ()))
+
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        """
+        Evict all results and reset the counters.
+        """
+        self._entries.clear()
+        self._field_keys.clear()
+
+    def __contains__(self, lookup):
+        entry = self._entries.peek(fingerprint(lookup))
+        return entry is not None and not self._expired(entry)
+
+    def __len__(self):
+        return len(self._entries)
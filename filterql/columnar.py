@@ -0,0 +1,447 @@
+from datetime import date, datetime
+import multiprocessing
+import numbers
+import os
+
+import numpy as np
+
+from .evaluators import iter_leaves, MATCHERS
+from .lookup import FIELD_KEY, LOOKUP_KEY, LookupNode, VALUE_KEY
+from .lookup_types import (CONTAINS, DAY, ENDSWITH, EXACT, GT, GTE, HOUR, ICONTAINS, IENDSWITH, IEXACT, IN,
+                           ISNULL, ISTARTSWITH, LT, LTE, MINUTE, MONTH, SECOND, STARTSWITH, YEAR)
+
+
+# The number of rows evaluated at once, a multiple of 8 for bitmaps.
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+OPERATORS = {
+    EXACT: np.equal,
+    GT: np.greater,
+    GTE: np.greater_equal,
+    LT: np.less,
+    LTE: np.less_equal,
+}
+
+TEXT_MATCHES = {
+    CONTAINS: (lambda column, value: np.char.find(column, value) >= 0, False),
+    ICONTAINS: (lambda column, value: np.char.find(column, value) >= 0, True),
+    STARTSWITH: (np.char.startswith, False),
+    ISTARTSWITH: (np.char.startswith, True),
+    ENDSWITH: (np.char.endswith, False),
+    IENDSWITH: (np.char.endswith, True),
+    IEXACT: (np.equal, True),
+}
+
+# Date parts as the unit to truncate to, the unit of the part and the modulo.
+DATE_PARTS = {
+    MONTH: ('M', 'M', 12),
+    DAY: ('M', 'D', None),
+    HOUR: ('D', 'h', None),
+    MINUTE: ('h', 'm', None),
+    SECOND: ('m', 's', None),
+}
+
+
+def _python_type(column):
+    """
+    Get the Python type matching the values of a column, None when the
+    values are not compared natively.
+    """
+    kind = column.dtype.kind
+    if kind in 'biuf':
+        return numbers.Number
+    if kind == 'U':
+        return str
+    if kind == 'M':
+        return date if np.datetime_data(column.dtype)[0] in ('Y', 'M', 'W', 'D') else datetime
+    return None
+
+
+def _matches_type(column, value):
+    value_type = _python_type(column)
+    if value_type is numbers.Number:
+        return isinstance(value, numbers.Number) and not isinstance(value, complex)
+    if value_type is date:
+        return type(value) is date
+    if value_type is datetime:
+        return isinstance(value, datetime) and value.tzinfo is None
+    return value_type is not None and isinstance(value, value_type)
+
+
+def _native(column, value):
+    return np.datetime64(value) if column.dtype.kind == 'M' else value
+
+
+def null_mask(column):
+    """
+    Get a mask of the null values of a column: None in object columns, NaN in
+    float columns and NaT in datetime columns.
+    """
+    kind = column.dtype.kind
+    if kind == 'O':
+        return np.fromiter((value is None for value in column), bool, len(column))
+    if kind in 'fM':
+        return np.isnan(column)
+    return np.zeros(len(column), bool)
+
+
+def python_values(column):
+    """
+    Get the values of a column as Python objects, with None for null.
+    """
+    kind = column.dtype.kind
+    if kind == 'M':
+        # Finer units than microseconds are converted to integers.
+        if np.datetime_data(column.dtype)[0] in ('ns', 'ps', 'fs', 'as'):
+            column = column.astype('M8[us]')
+        return column.tolist()
+    if kind == 'f':
+        return [None if value != value else value for value in column.tolist()]
+    return column.tolist()
+
+
+def _date_part(column, lookup):
+    if lookup == YEAR:
+        return column.astype('M8[Y]').astype(np.int64) + 1970
+
+    truncate, unit, modulo = DATE_PARTS[lookup]
+    if modulo:
+        return column.astype('M8[%s]' % unit).astype(np.int64) % modulo + 1
+
+    part = (column - column.astype('M8[%s]' % truncate)).astype('m8[%s]' % unit).astype(np.int64)
+    return part + 1 if lookup == DAY else part
+
+
+def _fast_leaf_mask(column, lookup, value):
+    """
+    Evaluate a leaf with numpy operations, None when the values of the column
+    can not be compared natively with the value.
+    """
+    if lookup == ISNULL:
+        null = null_mask(column)
+        return null if value else ~null
+
+    if lookup in OPERATORS and _matches_type(column, value):
+        return OPERATORS[lookup](column, _native(column, value))
+
+    if lookup == IN:
+        values = list(value)
+        if all(_matches_type(column, item) for item in values):
+            if not values:
+                return np.zeros(len(column), bool)
+            return np.isin(column, [_native(column, item) for item in values])
+        return None
+
+    if lookup in TEXT_MATCHES and column.dtype.kind == 'U' and isinstance(value, str):
+        match, fold = TEXT_MATCHES[lookup]
+        if fold:
+            column, value = np.char.lower(column), value.lower()
+        return match(column, value)
+
+    if (lookup == YEAR or lookup in DATE_PARTS) and column.dtype.kind == 'M' and isinstance(value, numbers.Number):
+        # Dates have no time parts.
+        if _python_type(column) is date and lookup in (HOUR, MINUTE, SECOND):
+            return None
+        null = np.isnat(column)
+        mask = _date_part(column, lookup) == value
+        mask[null] = False
+        return mask
+
+    return None
+
+
+def leaf_mask(column, filter_dict):
+    """
+    Evaluate a filter dict for all values of a column.
+
+    Values are compared with numpy when the column type matches the value,
+    other values are matched one by one with the in memory `MATCHERS`, so the
+    results are the same as for the other filterql backends.
+
+    Args:
+        column (numpy.ndarray): The values of the field.
+        filter_dict (dict): Dict with the filter keys and values.
+
+    Returns:
+        numpy.ndarray: A bool for every value, True when it matches.
+    """
+    lookup = filter_dict[LOOKUP_KEY]
+    value = filter_dict[VALUE_KEY]
+
+    mask = _fast_leaf_mask(column, lookup, value)
+    if mask is not None:
+        return np.asarray(mask, bool)
+
+    match = MATCHERS[lookup]
+    return np.fromiter((match(item, value) for item in python_values(column)), bool, len(column))
+
+
+def evaluate_columns(lookup, columns, start=0, stop=None):
+    """
+    Evaluate a lookup for a slice of rows of columnar data.
+
+    Args:
+        lookup (LookupNode): The lookup to evaluate.
+        columns (dict): The column array of every field, all of the same
+            length. Fields without a column are null.
+        start (int): The first row of the slice.
+        stop (int): The row after the slice, the end of the columns when None.
+
+    Returns:
+        numpy.ndarray: A bool for every row of the slice, True when it matches.
+    """
+    if stop is None:
+        stop = min(len(column) for column in columns.values()) if columns else start
+    size = stop - start
+    chunk = {}
+
+    def evaluate(node):
+        mask = None
+        is_or = node.connector == LookupNode.OR
+        for _filter in node.filters:
+            if isinstance(_filter, LookupNode):
+                result = evaluate(_filter)
+            else:
+                field = _filter[FIELD_KEY]
+                column = chunk.get(field)
+                if column is None:
+                    column = columns.get(field)
+                    if column is None:
+                        column = np.full(size, None, object)
+                    else:
+                        column = column[start:stop]
+                    chunk[field] = column
+                result = leaf_mask(column, _filter)
+
+            if mask is None:
+                mask = result
+            elif is_or:
+                mask = mask | result
+            else:
+                mask = mask & result
+
+        if mask is None:
+            mask = np.full(size, not is_or, bool)
+        return ~mask if node.negated else mask
+
+    return evaluate(lookup)
+
+
+def fields(lookup):
+    """
+    Get the names of the fields used by the leaves of a lookup.
+    """
+    return set(_filter[FIELD_KEY] for _filter in iter_leaves(lookup))
+
+
+class ColumnarDataset(object):
+    """
+    Dataset stored as a directory with a `.npy` file for every field.
+
+    Columns are memory mapped when they are first used by a lookup and
+    evaluated in chunks of rows, so datasets can be larger than memory.
+    """
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Args:
+            path (string): The directory with the `<field>.npy` files.
+            chunk_size (int): The number of rows evaluated at once.
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self._columns = {}
+        self._length = None
+
+    def column(self, field):
+        """
+        Get the memory mapped column of a field, None when it does not exist.
+        """
+        if field not in self._columns:
+            path = os.path.join(self.path, '%s.npy' % field)
+            self._columns[field] = np.load(path, mmap_mode='r') if os.path.exists(path) else None
+        return self._columns[field]
+
+    def __len__(self):
+        if self._length is None:
+            lengths = set(
+                len(np.load(os.path.join(self.path, name), mmap_mode='r'))
+                for name in os.listdir(self.path) if name.endswith('.npy')
+            )
+            if len(lengths) > 1:
+                raise ValueError('Columns have different lengths %s' % sorted(lengths))
+            self._length = lengths.pop() if lengths else 0
+        return self._length
+
+    def masks(self, lookup):
+        """
+        Evaluate a lookup chunk by chunk, only opening the columns it uses.
+
+        Yields:
+            tuple: The first row of the chunk and its mask.
+        """
+        columns = dict((field, self.column(field)) for field in fields(lookup))
+        columns = dict((field, column) for field, column in columns.items() if column is not None)
+
+        for start in range(0, len(self), self.chunk_size):
+            stop = min(start + self.chunk_size, len(self))
+            yield start, evaluate_columns(lookup, columns, start, stop)
+
+    def where(self, lookup):
+        """
+        Get the indexes of the rows matching a lookup.
+
+        Returns:
+            numpy.ndarray: The indexes of the matching rows.
+        """
+        indexes = [np.flatnonzero(mask) + start for start, mask in self.masks(lookup)]
+        return np.concatenate(indexes) if indexes else np.zeros(0, np.int64)
+
+    def write_bitmap(self, lookup, path):
+        """
+        Write a bitmap of the rows matching a lookup to a file, one bit per row
+        in big endian bit order like `numpy.packbits`.
+
+        Returns:
+            int: The number of matching rows.
+        """
+        if self.chunk_size % 8:
+            raise ValueError('The chunk size must be a multiple of 8 to write a bitmap')
+
+        count = 0
+        with open(path, 'wb') as bitmap:
+            for _, mask in self.masks(lookup):
+                count += int(np.count_nonzero(mask))
+                bitmap.write(np.packbits(mask).tobytes())
+        return count
+
+
+def read_bitmap(path, length):
+    """
+    Read a bitmap written by `ColumnarDataset.write_bitmap`.
+
+    Returns:
+        numpy.ndarray: A bool for every row.
+    """
+    return np.unpackbits(np.fromfile(path, np.uint8), count=length).astype(bool)
+
+
+# The shared columns of a worker process of a `SharedColumnPool`.
+_worker_columns = {}
+_worker_memory = []
+
+
+def _attach(specs):
+    """
+    Attach a worker process to the shared memory of the columns.
+    """
+    from multiprocessing import shared_memory
+
+    for field, (name, dtype, shape) in specs.items():
+        memory = shared_memory.SharedMemory(name=name)
+        _worker_memory.append(memory)
+        _worker_columns[field] = np.ndarray(shape, dtype, buffer=memory.buf)
+
+
+def _evaluate_slice(task):
+    lookup, start, stop = task
+    return np.packbits(evaluate_columns(lookup, _worker_columns, start, stop))
+
+
+class SharedColumnPool(object):
+    """
+    Pool of worker processes evaluating lookups over columns in shared memory.
+
+    The columns are copied into shared memory once and every worker attaches
+    to them when it starts, so lookups only send the lookup to the workers
+    and get a packed mask back. Every worker evaluates a slice of the rows.
+    Close the pool to stop the workers and free the shared memory. Needs
+    python 3.8 or later for the shared memory.
+    """
+    def __init__(self, columns, processes=None, slice_size=None):
+        """
+        Args:
+            columns (dict): The column array of every field, all of the same
+                length. Columns of Python objects can not be shared.
+            processes (int): The number of worker processes, the number of
+                CPUs when None.
+            slice_size (int): The number of rows per task, a multiple of 8,
+                the rows are split evenly over the workers when None.
+
+        Raises:
+            ValueError: When the columns can not be shared.
+        """
+        # Lazy import, the other columnar evaluation runs on older pythons.
+        from multiprocessing import shared_memory
+
+        lengths = set(len(column) for column in columns.values())
+        if len(lengths) > 1:
+            raise ValueError('Columns have different lengths %s' % sorted(lengths))
+        self.length = lengths.pop() if lengths else 0
+
+        self.processes = processes or multiprocessing.cpu_count()
+        self.slice_size = slice_size or -(-self.length // (8 * self.processes)) * 8 or 8
+        if self.slice_size % 8:
+            raise ValueError('The slice size must be a multiple of 8')
+
+        self._memory = []
+        specs = {}
+        try:
+            for field, column in columns.items():
+                column = np.ascontiguousarray(column)
+                if column.dtype.hasobject:
+                    raise ValueError('Column `%s` of Python objects can not be shared' % field)
+                memory = shared_memory.SharedMemory(create=True, size=max(column.nbytes, 1))
+                self._memory.append(memory)
+                np.ndarray(column.shape, column.dtype, buffer=memory.buf)[...] = column
+                specs[field] = (memory.name, column.dtype.str, column.shape)
+        except Exception:
+            self._free()
+            raise
+
+        self._pool = multiprocessing.Pool(self.processes, initializer=_attach, initargs=(specs,))
+
+    def evaluate(self, lookup):
+        """
+        Evaluate a lookup for all rows in the worker processes.
+
+        Args:
+            lookup (LookupNode): The lookup to evaluate.
+
+        Returns:
+            numpy.ndarray: A bool for every row, True when it matches.
+        """
+        tasks = [
+            (lookup, start, min(start + self.slice_size, self.length))
+            for start in range(0, self.length, self.slice_size)
+        ]
+        if not tasks:
+            return np.zeros(0, bool)
+
+        packed = self._pool.map(_evaluate_slice, tasks)
+        return np.unpackbits(np.concatenate(packed), count=self.length).astype(bool)
+
+    def where(self, lookup):
+        """
+        Get the indexes of the rows matching a lookup.
+        """
+        return np.flatnonzero(self.evaluate(lookup))
+
+    def _free(self):
+        while self._memory:
+            memory = self._memory.pop()
+            memory.close()
+            memory.unlink()
+
+    def close(self):
+        """
+        Stop the workers and free the shared memory.
+        """
+        self._pool.close()
+        self._pool.join()
+        self._free()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,110 @@
+from .evaluators import get_field_value
+from .lookup_types import DAY, HOUR, MINUTE, MONTH, SECOND, WEEK, YEAR
+
+
+DATE_PARTS = [YEAR, MONTH, WEEK, DAY, HOUR, MINUTE, SECOND]
+
+
+def decompose(value):
+    """
+    Decompose a date or datetime into all of its date parts at once.
+
+    Args:
+        value (date|datetime): The value to decompose.
+
+    Returns:
+        tuple: The parts in the order of DATE_PARTS, parts that do not
+            exist for the value (like the hour of a date) are None.
+    """
+    isocalendar = getattr(value, 'isocalendar', None)
+    if isocalendar is None:
+        return (None,) * len(DATE_PARTS)
+
+    return (
+        value.year,
+        value.month,
+        isocalendar()[1],
+        value.day,
+        getattr(value, 'hour', None),
+        getattr(value, 'minute', None),
+        getattr(value, 'second', None),
+    )
+
+
+class DatePartCache(object):
+    """
+    Derived date part columns for a dataset.
+
+    Every datetime field is decomposed once for all records and shared by
+    all leaves and lookups evaluated against the same dataset.
+    """
+    def __init__(self, records):
+        """
+        Args:
+            records (list): The records of the dataset.
+        """
+        self.records = records
+        self._columns = {}
+        self._size = len(records)
+
+    def column(self, field, part):
+        """
+        Get a date part of a field for all records.
+
+        Args:
+            field (string): The name of the datetime field.
+            part (string): One of the DATE_PARTS.
+
+        Returns:
+            list: The date part for every record in the dataset.
+        """
+        # The dataset changed in size, none of the columns line up anymore.
+        if len(self.records) != self._size:
+            self.invalidate()
+
+        columns = self._columns.get(field)
+        if columns is None:
+            columns = self._columns[field] = self._decompose(field)
+
+        return columns[DATE_PARTS.index(part)]
+
+    def _decompose(self, field):
+        """
+        Decompose a field into a column per date part.
+        """
+        # Many records share a date, only decompose distinct values.
+        decomposed = {}
+        rows = []
+        for record in self.records:
+            value = get_field_value(record, field)
+            # Aware datetimes in different time zones are equal for the same
+            # moment but have different parts, the offset tells them apart.
+            utcoffset = getattr(value, 'utcoffset', None)
+            key = (value, utcoffset()) if utcoffset is not None else value
+            try:
+                parts = decomposed[key]
+            except KeyError:
+                parts = decomposed[key] = decompose(value)
+            except TypeError:
+                parts = decompose(value)
+            rows.append(parts)
+
+        return [list(column) for column in zip(*rows)] if rows else [[] for part in DATE_PARTS]
+
+    def invalidate(self, fields=None):
+        """
+        Drop the cached columns after the data changed.
+
+        Args:
+            fields (iterable): The changed fields, defaults to all fields.
+        """
+        self._size = len(self.records)
+        if fields is None:
+            self._columns.clear()
+            return
+
+        for field in fields:
+            self._columns.pop(field, None)
+
+    def __contains__(self, field):
+        return field in self._columns
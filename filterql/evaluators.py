@@ -0,0 +1,312 @@
+from .lookup import FIELD_KEY, LOOKUP_KEY, LookupNode, VALUE_KEY
+from .lookup_types import (CONTAINS, DAY, ENDSWITH, EXACT, GT, GTE, HOUR, ICONTAINS, IENDSWITH, IEXACT, IN,
+                           ISNULL, ISTARTSWITH, LT, LTE, MINUTE, MONTH, SECOND, STARTSWITH, WEEK, YEAR)
+from .utils import compact_values
+
+
+FIELD_SEPARATOR = '__'
+
+
+def get_field_value(record, field):
+    """
+    Get the value of a field from a record.
+
+    Records can be dicts or objects. Fields spanning relations are
+    separated by `__` like in Django lookups.
+
+    Args:
+        record (dict|object): The record to get the value from.
+        field (string): The name of the field.
+
+    Returns:
+        The value of the field or None when the field does not exist.
+    """
+    for name in field.split(FIELD_SEPARATOR):
+        if record is None:
+            return None
+        if isinstance(record, dict):
+            record = record.get(name)
+        else:
+            record = getattr(record, name, None)
+
+    return record
+
+
+def iter_leaves(lookup):
+    """
+    Iterate recursively over all filter dicts in a lookup.
+
+    Args:
+        lookup (LookupNode): The lookup to iterate over.
+
+    Yields:
+        dict: The filter dicts of the lookup.
+    """
+    for _filter in lookup.filters:
+        if isinstance(_filter, LookupNode):
+            for leaf in iter_leaves(_filter):
+                yield leaf
+        else:
+            yield _filter
+
+
+def _text(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    return '%s' % value
+
+
+def _date_part(part):
+    def extract(value):
+        return getattr(value, part, None)
+    return extract
+
+
+def _iso_week(value):
+    isocalendar = getattr(value, 'isocalendar', None)
+    if isocalendar is None:
+        return None
+    return isocalendar()[1]
+
+
+def _compare(compare):
+    def match(value, lookup_value):
+        if value is None:
+            return False
+        try:
+            return compare(value, lookup_value)
+        except TypeError:
+            return False
+    return match
+
+
+def _text_match(compare, fold=False):
+    def match(value, lookup_value):
+        value = _text(value)
+        lookup_value = _text(lookup_value)
+        if value is None or lookup_value is None:
+            return False
+        if fold:
+            return compare(value.lower(), lookup_value.lower())
+        return compare(value, lookup_value)
+    return match
+
+
+def _iexact(value, lookup_value):
+    # Like `exact`, `iexact` with None is a null check.
+    if lookup_value is None:
+        return value is None
+    return _folded_equals(value, lookup_value)
+
+
+def _in(value, lookup_value):
+    try:
+        return value in lookup_value
+    except TypeError:
+        return False
+
+
+def _isnull(value, lookup_value):
+    return (value is None) == lookup_value
+
+
+DATE_PART_EXTRACTORS = {
+    YEAR: _date_part('year'),
+    MONTH: _date_part('month'),
+    WEEK: _iso_week,
+    DAY: _date_part('day'),
+    HOUR: _date_part('hour'),
+    MINUTE: _date_part('minute'),
+    SECOND: _date_part('second'),
+}
+
+_equals = _compare(lambda value, lookup_value: value == lookup_value)
+_contains = _text_match(lambda value, lookup_value: lookup_value in value)
+_startswith = _text_match(lambda value, lookup_value: value.startswith(lookup_value))
+_endswith = _text_match(lambda value, lookup_value: value.endswith(lookup_value))
+_folded_equals = _text_match(lambda value, lookup_value: value == lookup_value, fold=True)
+
+
+MATCHERS = {
+    # Text matchers.
+    CONTAINS: _contains,
+    STARTSWITH: _startswith,
+    ENDSWITH: _endswith,
+    ICONTAINS: _text_match(lambda value, lookup_value: lookup_value in value, fold=True),
+    ISTARTSWITH: _text_match(lambda value, lookup_value: value.startswith(lookup_value), fold=True),
+    IENDSWITH: _text_match(lambda value, lookup_value: value.endswith(lookup_value), fold=True),
+    IEXACT: _iexact,
+
+    # Boundary matchers.
+    IN: _in,
+    GT: _compare(lambda value, lookup_value: value > lookup_value),
+    LT: _compare(lambda value, lookup_value: value < lookup_value),
+    GTE: _compare(lambda value, lookup_value: value >= lookup_value),
+    LTE: _compare(lambda value, lookup_value: value <= lookup_value),
+
+    # Miscellaneous matchers.
+    ISNULL: _isnull,
+    EXACT: lambda value, lookup_value: value == lookup_value,
+}
+
+# Date/time matchers compare the extracted part with the lookup value.
+for _lookup, _extract in DATE_PART_EXTRACTORS.items():
+    MATCHERS[_lookup] = (lambda extract: lambda value, lookup_value: _equals(extract(value), lookup_value))(_extract)
+
+
+def match_filter(filter_dict, record):
+    """
+    Check whether a record matches a single filter dict.
+
+    Args:
+        filter_dict (dict): Dict with the filter keys and values.
+        record (dict|object): The record to match.
+
+    Returns:
+        bool: True when the record matches the filter.
+    """
+    match = MATCHERS[filter_dict[LOOKUP_KEY]]
+    return match(get_field_value(record, filter_dict[FIELD_KEY]), filter_dict[VALUE_KEY])
+
+
+def evaluate(lookup, record):
+    """
+    Evaluate a lookup against a single record in memory.
+
+    Args:
+        lookup (LookupNode): The lookup to evaluate.
+        record (dict|object): The record to evaluate the lookup for.
+
+    Returns:
+        bool: True when the record matches the lookup.
+    """
+    results = (
+        evaluate(_filter, record) if isinstance(_filter, LookupNode) else match_filter(_filter, record)
+        for _filter in lookup.filters
+    )
+
+    if lookup.connector == LookupNode.OR:
+        result = any(results)
+    else:
+        result = all(results)
+
+    return result != lookup.negated
+
+
+def evaluate_leaf_mask(filter_dict, records, columns, date_parts):
+    """
+    Evaluate a single filter dict for all records at once.
+
+    Args:
+        filter_dict (dict): The filter to evaluate.
+        records (list): The records to evaluate the filter for.
+        columns (dict): The values of the fields of the records by field
+            name, the missing fields are read and added.
+        date_parts (DatePartCache): Cache with the decomposed datetime fields
+            of the records, checked with `check_date_parts`, or None.
+
+    Returns:
+        list: A bool for every record, True when it matches the filter.
+    """
+    field = filter_dict[FIELD_KEY]
+    lookup = filter_dict[LOOKUP_KEY]
+    lookup_value = filter_dict[VALUE_KEY]
+
+    if date_parts is not None and lookup in DATE_PART_EXTRACTORS:
+        return [value == lookup_value for value in date_parts.column(field, lookup)]
+
+    if lookup == IN:
+        # Compact once for fast membership tests of all records.
+        lookup_value = compact_values(lookup_value)
+
+    column = columns.get(field)
+    if column is None:
+        column = columns[field] = [get_field_value(record, field) for record in records]
+
+    match = MATCHERS[lookup]
+    return [match(value, lookup_value) for value in column]
+
+
+def _evaluate_mask(lookup, records, columns, date_parts):
+    mask = None
+    is_or = lookup.connector == LookupNode.OR
+
+    for _filter in lookup.filters:
+        if isinstance(_filter, LookupNode):
+            result = _evaluate_mask(_filter, records, columns, date_parts)
+        else:
+            result = evaluate_leaf_mask(_filter, records, columns, date_parts)
+
+        if mask is None:
+            mask = result
+        elif is_or:
+            mask = [a or b for a, b in zip(mask, result)]
+        else:
+            mask = [a and b for a, b in zip(mask, result)]
+
+    if mask is None:
+        mask = [not is_or] * len(records)
+
+    if lookup.negated:
+        return [not value for value in mask]
+    return mask
+
+
+def check_date_parts(records, date_parts):
+    """
+    Check that a date part cache was created for a list of records.
+
+    Raises:
+        ValueError: When the cache is for other records, its columns would
+            not line up with the records.
+    """
+    if date_parts is not None and date_parts.records is not records:
+        raise ValueError('The date part cache is not for these records')
+
+
+def evaluate_mask(lookup, records, date_parts=None):
+    """
+    Evaluate a lookup column by column for a list of records.
+
+    Every field is read once per record and date part lookups use the
+    shared columns of the date part cache when it is given.
+
+    Args:
+        lookup (LookupNode): The lookup to evaluate.
+        records (list): The records to evaluate the lookup for.
+        date_parts (DatePartCache): Cache with the decomposed datetime fields
+            of the records.
+
+    Returns:
+        list: A bool for every record, True when it matches the lookup.
+
+    Raises:
+        ValueError: When the date part cache is for other records.
+    """
+    check_date_parts(records, date_parts)
+    return _evaluate_mask(lookup, records, {}, date_parts)
+
+
+def filter_records(lookup, records, date_parts=None):
+    """
+    Filter an iterable of records with a lookup in memory.
+
+    Args:
+        lookup (LookupNode): The lookup to filter with.
+        records (iterable): The records to filter.
+        date_parts (DatePartCache): Optional cache with the decomposed
+            datetime fields of the same records, enables column evaluation.
+
+    Returns:
+        list: The records matching the lookup.
+
+    Raises:
+        ValueError: When the date part cache is for other records.
+    """
+    if date_parts is not None:
+        mask = evaluate_mask(lookup, records, date_parts)
+        return [record for record, matches in zip(records, mask) if matches]
+
+    return [record for record in records if evaluate(lookup, record)]
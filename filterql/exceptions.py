@@ -19,3 +19,12 @@ class UnsupportedLookupException(Exception):
         message = '`%s` is not a supported lookup! Supported lookups are: %s' % (lookup, LOOKUP_TYPES)
 
         super(UnsupportedLookupException, self).__init__(message)
+
+
+class SchemaException(InvalidValueException):
+
+    def __init__(self, errors):
+        self.errors = errors
+        message = '; '.join('%s at %s' % (error, path) for path, error in errors)
+
+        super(SchemaException, self).__init__(message)
@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+
+
+class Instrumentation(object):
+    """
+    Callbacks with measurements of filterql operations, like to feed metrics
+    or trace spans. All callbacks do nothing, override the ones you need.
+
+    Times are wall times in seconds. The stats of a lookup are its number of
+    `nodes` and `leaves` and its maximum `depth`, with a single node having
+    depth 1.
+    """
+    def on_from_json(self, seconds, stats):
+        """
+        Called after `LookupNode.from_json`. The stats also have the `bytes`
+        of the json and the number of `decoded` values per `_type`.
+        """
+
+    def on_from_dict(self, seconds, stats):
+        """
+        Called after `LookupNode.from_dict`.
+        """
+
+    def on_dumps(self, seconds, stats):
+        """
+        Called after `LookupNode.dumps`. The stats also have the `bytes` of
+        the json.
+        """
+
+    def on_decode(self, value_type, seconds):
+        """
+        Called after `type_decoder` decoded a value of a `_type`.
+        """
+
+    def on_deserialize(self, seconds, stats):
+        """
+        Called after `DjangoSerializer.deserialize`. The stats also have where
+        the template was found in `cache`: `hit` for the serializer cache,
+        `process_hit` for the process cache or `miss` when it was compiled.
+        """
+
+
+# The installed instrumentation, None when disabled. Instrumented functions
+# only check this, so there is no measurable overhead when disabled.
+active = None
+
+
+def install(instrumentation):
+    """
+    Install an instrumentation for all operations in the process.
+
+    Args:
+        instrumentation (Instrumentation): The callbacks, None to disable.
+
+    Returns:
+        Instrumentation: The previously installed instrumentation.
+    """
+    global active
+    previous, active = active, instrumentation
+    return previous
+
+
+@contextmanager
+def instrumented(instrumentation):
+    """
+    Install an instrumentation for the duration of a with block.
+    """
+    previous = install(instrumentation)
+    try:
+        yield instrumentation
+    finally:
+        install(previous)
+
+
+def lookup_stats(lookup, **stats):
+    """
+    Get the number of nodes and leaves and the maximum depth of a lookup.
+
+    Args:
+        lookup (LookupNode): The lookup to measure.
+        **stats: Extra stats to add.
+
+    Returns:
+        dict: The stats.
+    """
+    # Avoid circular import.
+    from .lookup import LookupNode
+
+    nodes = leaves = depth = 0
+    stack = [(lookup, 1)]
+    while stack:
+        node, node_depth = stack.pop()
+        nodes += 1
+        depth = max(depth, node_depth)
+        for _filter in node.filters:
+            if isinstance(_filter, LookupNode):
+                stack.append((_filter, node_depth + 1))
+            else:
+                leaves += 1
+
+    stats.update(nodes=nodes, leaves=leaves, depth=depth)
+    return stats
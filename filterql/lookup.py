@@ -1,8 +1,12 @@
+from copy import deepcopy
+from timeit import default_timer
+
 import simplejson as json
 
+from . import instrumentation
 from .exceptions import InvalidFormat, UnsupportedLookupException
-from .lookup_types import EXACT, LOOKUP_TYPES
-from .utils import ENCODERS, type_decoder, TypeEncoder
+from .lookup_types import EXACT, IN, LOOKUP_TYPES
+from .utils import compact_values, encoded_type, type_decoder, TypeEncoder
 from .validators import VALIDATORS
 
 
@@ -13,6 +17,30 @@ VALUE_KEY = '%svalue' % KEY_PREFIX
 TYPE_KEY = '%stype' % KEY_PREFIX
 
 
+class Param(object):
+    """
+    Placeholder for a value that is bound later, see `LookupNode.prepare`.
+    """
+    def __init__(self, name):
+        """
+        Args:
+            name (string): The name of the parameter.
+        """
+        self.name = name
+
+    def __eq__(self, other):
+        return isinstance(other, Param) and other.name == self.name
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((Param, self.name))
+
+    def __repr__(self):
+        return 'Param(%r)' % self.name
+
+
 class LookupNode(object):
     """
     Node used for lookups. Has filters that can be either a dict with
@@ -62,28 +90,61 @@ class LookupNode(object):
         Returns:
             string: The json string representing the lookup.
         """
-        return json.dumps(self.to_dict(), cls=TypeEncoder, use_decimal=True)
+        active = instrumentation.active
+        if active is None:
+            return json.dumps(self.to_dict(), cls=TypeEncoder, use_decimal=True)
+
+        start = default_timer()
+        l_json = json.dumps(self.to_dict(), cls=TypeEncoder, use_decimal=True)
+        active.on_dumps(default_timer() - start, instrumentation.lookup_stats(self, bytes=len(l_json)))
+        return l_json
 
     @staticmethod
-    def from_json(l_json):
+    def from_json(l_json, compact_in=False, lazy=False):
         """
         Function to create an instance from json.
 
         Args:
-            l_json (string): The json string representing a lookup.
+            l_json (string|bytes): The json representing a lookup.
+            compact_in (bool): Whether to store the values of `in` lookups
+                compactly, see `from_dict`.
+            lazy (bool): Whether to build the nodes and decode the values
+                only when they are accessed, see `LazyLookupNode`.
 
         Returns:
             LookupNode: The lookup instance based on the dict.
         """
-        return L.from_dict(json.loads(l_json, object_hook=type_decoder, use_decimal=True))
+        if lazy:
+            return LazyLookupNode(json.loads(l_json, use_decimal=True), compact_in, source=l_json)
+
+        active = instrumentation.active
+        if active is None:
+            return L._from_dict(json.loads(l_json, object_hook=type_decoder, use_decimal=True), compact_in)
+
+        decoded = {}
+
+        def decoder(dct):
+            value_type = dct.get(TYPE_KEY)
+            if value_type:
+                decoded[value_type] = decoded.get(value_type, 0) + 1
+            return type_decoder(dct)
+
+        start = default_timer()
+        lookup = L._from_dict(json.loads(l_json, object_hook=decoder, use_decimal=True), compact_in)
+        active.on_from_json(
+            default_timer() - start, instrumentation.lookup_stats(lookup, bytes=len(l_json), decoded=decoded))
+        return lookup
 
     @staticmethod
-    def from_dict(l_dict):
+    def from_dict(l_dict, compact_in=False):
         """
         Function to create an instance from a dict.
 
         Args:
             l_dict (dict): The dict that represents a lookup.
+            compact_in (bool): Whether to store the values of `in` lookups
+                compactly with `compact_values`: sorted typed arrays for
+                numbers, sorted tuples or frozensets for other values.
 
         Returns:
             LookupNode: The lookup instance based on the dict.
@@ -91,10 +152,26 @@ class LookupNode(object):
         Raises:
             InvalidFormat: When the dict is not of the Lookup format.
         """
+        active = instrumentation.active
+        if active is None:
+            return L._from_dict(l_dict, compact_in)
+
+        start = default_timer()
+        lookup = L._from_dict(l_dict, compact_in)
+        active.on_from_dict(default_timer() - start, instrumentation.lookup_stats(lookup))
+        return lookup
+
+    @staticmethod
+    def _split(l_dict):
+        """
+        Get the connector, the negated flag and the filters of a lookup dict.
+
+        Raises:
+            InvalidFormat: When the root of the dict is not of the Lookup format.
+        """
         # Set some defaults.
         negated = False
         connector = L.AND
-        children = []
 
         # Check for valid formatting and get root connector key.
         keys = list(l_dict)
@@ -117,22 +194,44 @@ class LookupNode(object):
             raise InvalidFormat(
                 'Lookup root connector must be `%s`, `%s` or `%s` %s' % (L.AND, L.NOT, L.OR, l_dict))
 
-        filters = l_dict.get(connector)
+        return connector, negated, l_dict.get(connector)
+
+    @staticmethod
+    def _is_node(_filter):
+        """
+        Check whether a filter of a lookup dict is a nested lookup.
+
+        Raises:
+            InvalidFormat: When the filter is neither a lookup nor a filter.
+        """
+        # Check if we have a filter or a nested lookup.
+        valid_filter_keys = [FIELD_KEY, LOOKUP_KEY, VALUE_KEY]
+        valid_type_filter_keys = valid_filter_keys + [TYPE_KEY]
+        filter_keys = set(list(_filter))
+
+        if len(filter_keys) == 1 and next(iter(filter_keys)) in (L.AND, L.OR, L.NOT):
+            return True
+        if filter_keys == set(valid_filter_keys) or filter_keys == set(valid_type_filter_keys):
+            return False
+        raise InvalidFormat('Not a lookup or node for filter %s' % _filter)
+
+    @staticmethod
+    def _from_dict(l_dict, compact_in):
+        """
+        Create an instance from a dict without instrumentation, see `from_dict`.
+        """
+        connector, negated, filters = L._split(l_dict)
+        children = []
 
         # Loop all filters in the lookup node.
         for _filter in filters:
-            # Check if we have a filter or a nested lookup.
-            valid_filter_keys = [FIELD_KEY, LOOKUP_KEY, VALUE_KEY]
-            valid_type_filter_keys = valid_filter_keys + [TYPE_KEY]
-            filter_keys = set(list(_filter))
-
-            if len(filter_keys) == 1 and next(iter(filter_keys)) in (L.AND, L.OR, L.NOT):
-                children.append(L.from_dict(_filter))
-            elif (filter_keys == set(valid_filter_keys) or
-                    filter_keys == set(valid_type_filter_keys)):
-                children.append(_filter)
+            if L._is_node(_filter):
+                children.append(L._from_dict(_filter, compact_in))
             else:
-                raise InvalidFormat('Not a lookup or node for filter %s' % _filter)
+                if compact_in and _filter[LOOKUP_KEY] == IN:
+                    _filter = dict(_filter)
+                    _filter[VALUE_KEY] = compact_values(_filter[VALUE_KEY])
+                children.append(_filter)
 
         lookup = LookupNode()
         lookup.filters = children
@@ -141,6 +240,62 @@ class LookupNode(object):
 
         return lookup
 
+    def prepare(self):
+        """
+        Validate the lookup once so values for its parameters can be bound
+        many times.
+
+        Returns:
+            PreparedLookup: The prepared lookup.
+        """
+        # Avoid circular import.
+        from .prepared import PreparedLookup
+        return PreparedLookup(self)
+
+    def explain(self, statistics=None, index=None):
+        """
+        Plan the in memory evaluation of the lookup and estimate its cost.
+
+        Args:
+            statistics (Statistics): The statistics of the records, to
+                estimate the selectivity.
+            index (BitmapIndex): The bitmap index of the records.
+
+        Returns:
+            Plan: The plan, see `filterql.planner.explain`.
+        """
+        # Avoid circular import.
+        from .planner import explain
+        return explain(self, statistics, index)
+
+    def implies(self, other):
+        """
+        Check whether every record matching this lookup matches the other.
+
+        Sound but incomplete, see `filterql.analysis.implies`.
+
+        Args:
+            other (LookupNode): The lookup to compare with.
+
+        Returns:
+            bool: True when this lookup certainly implies the other.
+        """
+        # Avoid circular import.
+        from .analysis import implies
+        return implies(self, other)
+
+    def contains(self, other):
+        """
+        Check whether every record matching the other lookup matches this one.
+
+        Args:
+            other (LookupNode): The lookup to compare with.
+
+        Returns:
+            bool: True when this lookup certainly contains the other.
+        """
+        return other.implies(self)
+
     def __len__(self):
         """
         The number of filters in the node.
@@ -210,6 +365,133 @@ class LookupNode(object):
         return obj
 
 
+class LazyLookupNode(LookupNode):
+    """
+    Node of a lookup loaded from json that builds its filters on first access.
+
+    Nested nodes stay raw dicts and values stay encoded until the filters of
+    their parent are accessed, so only the parts of a large lookup that are
+    used are decoded and validated. Invalid filters raise InvalidFormat when
+    they are accessed instead of when loaded.
+
+    A lookup that was not modified dumps to the json it was loaded from, and
+    unmodified nested nodes of a modified lookup are dumped from their raw
+    dicts. Dumping lazy lookups is not instrumented, since measuring the
+    lookup would build all its filters.
+    """
+    def __init__(self, l_dict, compact_in=False, source=None):
+        """
+        Args:
+            l_dict (dict): The dict that represents a lookup, with the values
+                still encoded.
+            compact_in (bool): Whether to store the values of `in` lookups
+                compactly, see `LookupNode.from_dict`.
+            source (string|bytes): The json the dict was loaded from.
+
+        Raises:
+            InvalidFormat: When the root of the dict is not of the Lookup format.
+        """
+        self.connector, self.negated, self._raw_filters = L._split(l_dict)
+        self._dict = l_dict
+        self._compact_in = compact_in
+        self._source = source
+        self._loaded = (self.connector, self.negated)
+        self._filters = None
+        # The loaded filters, with a copy of the leaves to detect changes.
+        self._children = None
+
+    @property
+    def filters(self):
+        if self._filters is None:
+            children = []
+            for _filter in self._raw_filters:
+                if L._is_node(_filter):
+                    children.append((LazyLookupNode(_filter, self._compact_in), None))
+                    continue
+
+                _filter = type_decoder(dict(_filter)) if TYPE_KEY in _filter else dict(_filter)
+                if self._compact_in and _filter[LOOKUP_KEY] == IN:
+                    _filter[VALUE_KEY] = compact_values(_filter[VALUE_KEY])
+                leaf = dict(_filter)
+                # Copy the decoded lists, so changes in place are detected.
+                if isinstance(leaf[VALUE_KEY], list):
+                    leaf[VALUE_KEY] = deepcopy(leaf[VALUE_KEY])
+                children.append((_filter, leaf))
+
+            self._children = children
+            self._filters = [child for child, _ in children]
+        return self._filters
+
+    @filters.setter
+    def filters(self, filters):
+        self._filters = filters
+        # Replaced filters are never the loaded filters.
+        self._loaded = None
+
+    @property
+    def is_loaded(self):
+        """
+        Whether the filters of this node were built.
+        """
+        return self._filters is not None
+
+    def is_modified(self):
+        """
+        Check whether the lookup was changed since it was loaded.
+        """
+        if (self.connector, self.negated) != self._loaded:
+            return True
+        if self._filters is None:
+            return False
+        if len(self._filters) != len(self._children):
+            return True
+
+        for _filter, (child, leaf) in zip(self._filters, self._children):
+            if _filter is not child:
+                return True
+            if leaf is None:
+                if child.is_modified():
+                    return True
+            elif child != leaf:
+                return True
+        return False
+
+    def _dump_dict(self):
+        """
+        Get the dict to dump, the raw dicts of the unmodified nodes.
+        """
+        if not self.is_modified():
+            return self._dict
+
+        tree_dict = {self.connector: [
+            f._dump_dict() if isinstance(f, LazyLookupNode) else f if isinstance(f, dict) else f.to_dict()
+            for f in self.filters
+        ]}
+        if self.negated:
+            return {self.NOT: tree_dict}
+        return tree_dict
+
+    def __invert__(self):
+        # The negated node is new, it was not loaded itself.
+        obj = LookupNode()
+        obj.add(self, self.AND)
+        obj.negate()
+        return obj
+
+    def dumps(self):
+        """
+        Dump this node and children to json, the json the lookup was loaded
+        from when it was not modified.
+
+        Returns:
+            string|bytes: The json the lookup was loaded from, a string or
+                bytes like it was given, or a json string when modified.
+        """
+        if self._source is not None and not self.is_modified():
+            return self._source
+        return json.dumps(self._dump_dict(), cls=TypeEncoder, use_decimal=True)
+
+
 class Lookup(LookupNode):
     """
     Class that creates the needed filters and is used as `leaf` for
@@ -219,9 +501,15 @@ class Lookup(LookupNode):
         """
         Validate the given args and init the lookup.
         """
+        # Iterators of `in` values would be exhausted by the validation.
+        if lookup == IN and hasattr(value, '__iter__') and not hasattr(value, '__len__'):
+            value = list(value)
+
         if validate:
             self._validate_lookup(lookup)
-            self._validate_value(value, lookup)
+            # Values of parameters are validated when they are bound.
+            if not isinstance(value, Param):
+                self._validate_value(value, lookup)
 
         self.value = value
         self.field = field
@@ -233,8 +521,9 @@ class Lookup(LookupNode):
             VALUE_KEY: self.value,
         }
 
-        if type(value) in list(ENCODERS):
-            total_filter[TYPE_KEY] = type(value).__name__
+        value_type = encoded_type(value)
+        if value_type:
+            total_filter[TYPE_KEY] = value_type
 
         super(type(self), self).__init__(filters=[total_filter])
 
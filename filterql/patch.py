@@ -0,0 +1,243 @@
+import simplejson as json
+
+from .exceptions import InvalidFormat, InvalidValueException
+from .lookup import FIELD_KEY, Lookup, LOOKUP_KEY, LookupNode, TYPE_KEY, VALUE_KEY
+from .utils import type_decoder, TypeEncoder
+
+
+OP_KEY = 'op'
+PATH_KEY = 'path'
+FILTER_KEY = 'filter'
+
+# Insert a filter or node before the child at the path.
+ADD = 'add'
+# Remove the child at the path.
+REMOVE = 'remove'
+# Replace the value of the filter at the path.
+REPLACE = 'replace'
+# Replace the child at the path, or the whole lookup for an empty path.
+SET = 'set'
+
+OPERATIONS = [ADD, REMOVE, REPLACE, SET]
+
+
+def _equal(a, b):
+    """
+    Check whether two filters or nodes are the same.
+    """
+    if a is b:
+        return True
+    if isinstance(a, LookupNode) != isinstance(b, LookupNode):
+        return False
+    if not isinstance(a, LookupNode):
+        return a == b
+    if (a.connector, a.negated, len(a)) != (b.connector, b.negated, len(b)):
+        return False
+    return all(_equal(child, other_child) for child, other_child in zip(a.filters, b.filters))
+
+
+def _to_dict(_filter):
+    return _filter.to_dict() if isinstance(_filter, LookupNode) else _filter
+
+
+def _replace_value(path, _filter):
+    operation = {OP_KEY: REPLACE, PATH_KEY: path, VALUE_KEY: _filter[VALUE_KEY]}
+    if TYPE_KEY in _filter:
+        operation[TYPE_KEY] = _filter[TYPE_KEY]
+    return operation
+
+
+def _diff_child(path, old, new, patch):
+    old_is_node, new_is_node = isinstance(old, LookupNode), isinstance(new, LookupNode)
+    if old_is_node and new_is_node:
+        _diff_node(path, old, new, patch)
+    elif not (old_is_node or new_is_node) and (old[FIELD_KEY], old[LOOKUP_KEY]) == (new[FIELD_KEY], new[LOOKUP_KEY]):
+        patch.append(_replace_value(path, new))
+    else:
+        patch.append({OP_KEY: SET, PATH_KEY: path, FILTER_KEY: _to_dict(new)})
+
+
+def _diff_node(path, old, new, patch):
+    if old.connector != new.connector or old.negated != new.negated:
+        patch.append({OP_KEY: SET, PATH_KEY: path, FILTER_KEY: new.to_dict()})
+        return
+
+    old_filters, new_filters = old.filters, new.filters
+
+    # Skip the children that are the same at the start and the end.
+    size = min(len(old_filters), len(new_filters))
+    start = 0
+    while start < size and _equal(old_filters[start], new_filters[start]):
+        start += 1
+    end = 0
+    while end < size - start and _equal(old_filters[-end - 1], new_filters[-end - 1]):
+        end += 1
+
+    old_changed = old_filters[start:len(old_filters) - end]
+    new_changed = new_filters[start:len(new_filters) - end]
+
+    # Pair the changed children first, so the indexes are not shifted yet.
+    for index, (old_child, new_child) in enumerate(zip(old_changed, new_changed)):
+        if not _equal(old_child, new_child):
+            _diff_child(path + [start + index], old_child, new_child, patch)
+
+    index = start + min(len(old_changed), len(new_changed))
+    for _ in range(len(old_changed) - len(new_changed)):
+        patch.append({OP_KEY: REMOVE, PATH_KEY: path + [index]})
+    for new_child in new_changed[len(old_changed):]:
+        patch.append({OP_KEY: ADD, PATH_KEY: path + [index], FILTER_KEY: _to_dict(new_child)})
+        index += 1
+
+
+def diff(old, new):
+    """
+    Get the operations that turn one lookup into another.
+
+    The children of nodes are compared in order, so an edit to a single leaf
+    or adding or removing a few children gives a patch with about as many
+    operations. A path is the list of indexes of the children from the root
+    to the changed filter or node.
+
+    Args:
+        old (LookupNode): The lookup before the change.
+        new (LookupNode): The lookup after the change.
+
+    Returns:
+        list: The patch, a list of operation dicts.
+    """
+    patch = []
+    _diff_node([], old, new, patch)
+    return patch
+
+
+def _leaf(field, value, lookup):
+    """
+    Get a filter dict with a value validated like a new `Lookup`.
+    """
+    return Lookup(field, value, lookup=lookup).filters[0]
+
+
+def _validated(_filter):
+    if not isinstance(_filter, LookupNode):
+        return _leaf(_filter[FIELD_KEY], _filter[VALUE_KEY], _filter[LOOKUP_KEY])
+    _filter.filters = [_validated(child) for child in _filter.filters]
+    return _filter
+
+
+def _from_dict(filter_dict):
+    """
+    Get the filter or node for a dict, validated like in `LookupNode.from_dict`
+    with the values validated like a new `Lookup`.
+    """
+    return _validated(LookupNode.from_dict({LookupNode.AND: [filter_dict]}).filters[0])
+
+
+def _copy(node):
+    copy = LookupNode.__new__(LookupNode)
+    copy.filters = node.filters[:]
+    copy.connector = node.connector
+    copy.negated = node.negated
+    return copy
+
+
+def apply_patch(lookup, patch):
+    """
+    Apply a patch made with `diff` to a lookup.
+
+    The given lookup is not changed. Only the nodes on the paths of the
+    operations are copied, all other nodes and filters are shared with the
+    given lookup, so work done on unchanged subtrees can be reused.
+
+    Args:
+        lookup (LookupNode): The lookup to patch.
+        patch (list): The operation dicts.
+
+    Returns:
+        LookupNode: The patched lookup.
+
+    Raises:
+        InvalidFormat: When an operation is unknown or its path does not
+            exist in the lookup.
+        InvalidValueException: When an index of a path is negative or a
+            new value is invalid for the lookup type of its filter.
+    """
+    copied = set()
+
+    def copy(node):
+        if id(node) in copied:
+            return node
+        node = _copy(node)
+        copied.add(id(node))
+        return node
+
+    root = lookup
+    for operation in patch:
+        op = operation.get(OP_KEY)
+        if op not in OPERATIONS:
+            raise InvalidFormat('Unknown patch operation %s' % operation)
+
+        path = operation.get(PATH_KEY)
+        if not isinstance(path, list) or (not path and op != SET):
+            raise InvalidFormat('Invalid path for patch operation %s' % operation)
+        if any(isinstance(index, int) and index < 0 for index in path):
+            raise InvalidValueException('Negative index in the path of patch operation %s' % operation)
+
+        if not path:
+            root = _from_dict(operation[FILTER_KEY])
+            if not isinstance(root, LookupNode):
+                raise InvalidFormat('Lookup root must be a node %s' % operation)
+            continue
+
+        # Copy the nodes on the path to the parent of the changed child.
+        root = parent = copy(root)
+        try:
+            for index in path[:-1]:
+                child = parent.filters[index]
+                if not isinstance(child, LookupNode):
+                    raise InvalidFormat('Invalid path for patch operation %s' % operation)
+                parent.filters[index] = parent = copy(child)
+
+            index = path[-1]
+            if op == ADD:
+                if not 0 <= index <= len(parent.filters):
+                    raise IndexError(index)
+                parent.filters.insert(index, _from_dict(operation[FILTER_KEY]))
+            elif op == REMOVE:
+                del parent.filters[index]
+            elif op == SET:
+                parent.filters[index] = _from_dict(operation[FILTER_KEY])
+            else:
+                _filter = parent.filters[index]
+                if isinstance(_filter, LookupNode):
+                    raise InvalidFormat('Can only replace the value of a filter %s' % operation)
+                parent.filters[index] = _leaf(_filter[FIELD_KEY], operation[VALUE_KEY], _filter[LOOKUP_KEY])
+        except (IndexError, TypeError, KeyError):
+            raise InvalidFormat('Invalid path for patch operation %s' % operation)
+
+    return root
+
+
+def dumps_patch(patch):
+    """
+    Dump a patch to json.
+
+    Args:
+        patch (list): The operation dicts.
+
+    Returns:
+        string: The json string representing the patch.
+    """
+    return json.dumps(patch, cls=TypeEncoder, use_decimal=True)
+
+
+def loads_patch(patch_json):
+    """
+    Load a patch from json, decoding the typed values.
+
+    Args:
+        patch_json (string): The json string representing a patch.
+
+    Returns:
+        list: The operation dicts.
+    """
+    return json.loads(patch_json, object_hook=type_decoder, use_decimal=True)
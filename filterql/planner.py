@@ -0,0 +1,400 @@
+from collections import Counter
+import math
+
+from .evaluators import get_field_value, iter_leaves
+from .lookup import FIELD_KEY, LOOKUP_KEY, LookupNode, VALUE_KEY
+from .lookup_types import (CONTAINS, DAY, ENDSWITH, EXACT, GT, GTE, HOUR, ICONTAINS, IENDSWITH, IEXACT, IN,
+                           ISNULL, ISTARTSWITH, LT, LTE, MINUTE, MONTH, SECOND, STARTSWITH, WEEK, YEAR)
+from .textmatch import TEXT_LOOKUPS
+from .utils import SortedValues
+
+
+# Cost of matching a single record, relative to comparing two values.
+LOOKUP_COSTS = {
+    ISNULL: 0.5,
+    EXACT: 1.0,
+    GT: 1.0,
+    GTE: 1.0,
+    LT: 1.0,
+    LTE: 1.0,
+    IN: 1.0,
+    YEAR: 2.0,
+    MONTH: 2.0,
+    DAY: 2.0,
+    HOUR: 2.0,
+    MINUTE: 2.0,
+    SECOND: 2.0,
+    WEEK: 4.0,
+    STARTSWITH: 2.0,
+    ENDSWITH: 2.0,
+    IEXACT: 3.0,
+    ISTARTSWITH: 4.0,
+    IENDSWITH: 4.0,
+    CONTAINS: 4.0,
+    ICONTAINS: 6.0,
+}
+
+# Extra cost per character of the pattern of a `contains` lookup.
+PATTERN_CHARACTER_COST = 0.1
+
+# Selectivity of lookups that can not be estimated from the statistics.
+DEFAULT_SELECTIVITY = {
+    EXACT: 0.005,
+    IEXACT: 0.005,
+    GT: 1.0 / 3,
+    GTE: 1.0 / 3,
+    LT: 1.0 / 3,
+    LTE: 1.0 / 3,
+    STARTSWITH: 0.1,
+    ISTARTSWITH: 0.1,
+    ENDSWITH: 0.1,
+    IENDSWITH: 0.1,
+    CONTAINS: 0.1,
+    ICONTAINS: 0.1,
+    YEAR: 0.1,
+    MONTH: 1.0 / 12,
+    WEEK: 1.0 / 53,
+    DAY: 1.0 / 31,
+    HOUR: 1.0 / 24,
+    MINUTE: 1.0 / 60,
+    SECOND: 1.0 / 60,
+}
+
+# Selectivity used to order children when there are no statistics.
+UNKNOWN_SELECTIVITY = 0.5
+
+
+class ColumnStatistics(object):
+    """
+    Statistics of the values of a field.
+    """
+    def __init__(self, count, nulls=0, distinct=None, minimum=None, maximum=None, frequencies=None):
+        """
+        Args:
+            count (int): The number of records.
+            nulls (int): The number of records where the field is null.
+            distinct (int): The number of distinct values, null excluded.
+            minimum: The smallest value.
+            maximum: The largest value.
+            frequencies (dict): The number of records of the most common values.
+        """
+        self.count = count
+        self.nulls = nulls
+        self.distinct = distinct
+        self.minimum = minimum
+        self.maximum = maximum
+        self.frequencies = frequencies or {}
+
+    @property
+    def null_fraction(self):
+        return float(self.nulls) / self.count if self.count else 0.0
+
+    def fraction(self, value):
+        """
+        Estimate the fraction of the records with the value.
+        """
+        if value is None:
+            return self.null_fraction
+        if not self.count:
+            return 0.0
+
+        try:
+            if value in self.frequencies:
+                return float(self.frequencies[value]) / self.count
+        except TypeError:
+            return 0.0
+
+        # Spread the records without a common value over the other values.
+        rest = self.count - self.nulls - sum(self.frequencies.values())
+        others = (self.distinct or 0) - len(self.frequencies)
+        if rest <= 0 or others <= 0:
+            return 0.0
+        return float(rest) / others / self.count
+
+    def range_fraction(self, lookup, value):
+        """
+        Estimate the fraction of the records in a range, None when the
+        minimum and maximum can not be interpolated.
+        """
+        try:
+            low, high = self.minimum, self.maximum
+            if lookup in (GT, GTE):
+                if value < low:
+                    return 1.0 - self.null_fraction
+                position = 1.0 - (value - low) / (high - low)
+            else:
+                if value > high:
+                    return 1.0 - self.null_fraction
+                position = (value - low) / (high - low)
+        except (TypeError, ZeroDivisionError):
+            return None
+
+        return min(max(float(position), 0.0), 1.0) * (1.0 - self.null_fraction)
+
+
+class Statistics(object):
+    """
+    Statistics of the records a lookup runs on, used to estimate selectivity.
+    """
+    def __init__(self, rows, columns=None):
+        """
+        Args:
+            rows (int): The number of records.
+            columns (dict): The `ColumnStatistics` of every field.
+        """
+        self.rows = rows
+        self.columns = columns or {}
+
+    @classmethod
+    def from_records(cls, records, fields, most_common=10):
+        """
+        Gather the statistics of fields of a list of records.
+
+        Args:
+            records (list): The records.
+            fields (iterable): The names of the fields.
+            most_common (int): The number of most common values to keep
+                frequencies of.
+        """
+        columns = {}
+        for field in fields:
+            values = [get_field_value(record, field) for record in records]
+            present = [value for value in values if value is not None]
+            try:
+                counts = Counter(present)
+            except TypeError:
+                counts = Counter()
+            try:
+                minimum, maximum = (min(present), max(present)) if present else (None, None)
+            except TypeError:
+                minimum = maximum = None
+            columns[field] = ColumnStatistics(
+                count=len(values),
+                nulls=len(values) - len(present),
+                distinct=len(counts) or None,
+                minimum=minimum,
+                maximum=maximum,
+                frequencies=dict(counts.most_common(most_common)),
+            )
+        return cls(len(records), columns)
+
+
+def leaf_cost(filter_dict):
+    """
+    Estimate the cost of matching a filter dict against a single record.
+    """
+    lookup = filter_dict[LOOKUP_KEY]
+    value = filter_dict[VALUE_KEY]
+    cost = LOOKUP_COSTS[lookup]
+
+    if lookup == IN:
+        # Membership of a list is a scan, compact values are searched.
+        if isinstance(value, SortedValues):
+            return cost + math.log(len(value) + 1, 2)
+        if isinstance(value, (frozenset, set)):
+            return cost
+        try:
+            return cost + len(value) / 2.0
+        except TypeError:
+            return cost
+
+    if lookup in (CONTAINS, ICONTAINS) and isinstance(value, str):
+        cost += len(value) * PATTERN_CHARACTER_COST
+    return cost
+
+
+def leaf_selectivity(filter_dict, statistics):
+    """
+    Estimate the fraction of the records matching a filter dict.
+
+    Returns:
+        float: The selectivity, None when there are no statistics.
+    """
+    if statistics is None:
+        return None
+
+    column = statistics.columns.get(filter_dict[FIELD_KEY])
+    lookup = filter_dict[LOOKUP_KEY]
+    value = filter_dict[VALUE_KEY]
+
+    if column is None:
+        return DEFAULT_SELECTIVITY.get(lookup, UNKNOWN_SELECTIVITY)
+    if lookup == ISNULL:
+        return column.null_fraction if value else 1.0 - column.null_fraction
+    if lookup == EXACT:
+        return column.fraction(value)
+    if lookup == IN:
+        try:
+            return min(sum(column.fraction(item) for item in set(value)), 1.0)
+        except TypeError:
+            return 0.0
+    if lookup in (GT, GTE, LT, LTE):
+        fraction = column.range_fraction(lookup, value)
+        if fraction is not None:
+            return fraction
+    return DEFAULT_SELECTIVITY.get(lookup, UNKNOWN_SELECTIVITY) * (1.0 - column.null_fraction)
+
+
+class Plan(object):
+    """
+    Plan of a node or leaf of a lookup for in memory evaluation.
+
+    Children are in the suggested order, cheap children that most often
+    decide the result first. The evaluators keep the order of the lookup, so
+    reorder the lookup to get the estimated cost. The cost is the expected
+    cost of evaluating the node or leaf for a single record in the suggested
+    order, taking the short circuiting of `and` and `or` into account.
+    """
+    def __init__(self, lookup, strategy, cost, selectivity, field=None, negated=False, children=None):
+        self.lookup = lookup
+        self.strategy = strategy
+        self.cost = cost
+        self.selectivity = selectivity
+        self.field = field
+        self.negated = negated
+        self.children = children or []
+        self.rows = None
+
+    @property
+    def total_cost(self):
+        """
+        The estimated cost for all records, the cost of a single record when
+        the number of records is not known.
+        """
+        return self.cost * self.rows if self.rows is not None else self.cost
+
+    def to_dict(self):
+        plan = {
+            'lookup': self.lookup,
+            'strategy': self.strategy,
+            'cost': self.cost,
+            'selectivity': self.selectivity,
+        }
+        if self.field is not None:
+            plan['field'] = self.field
+        if self.negated:
+            plan['negated'] = True
+        if self.children:
+            plan['children'] = [child.to_dict() for child in self.children]
+        if self.rows is not None:
+            plan['rows'] = self.rows
+            plan['total_cost'] = self.total_cost
+        return plan
+
+    def _lines(self, indent):
+        name = '%s%s' % ('not ' if self.negated else '', self.lookup)
+        if self.field is not None:
+            name = '%s %s' % (self.field, name)
+        selectivity = '' if self.selectivity is None else ' selectivity=%.4f' % self.selectivity
+        lines = ['%s%s (%s) cost=%.2f%s' % ('  ' * indent, name, self.strategy, self.cost, selectivity)]
+        for child in self.children:
+            lines.extend(child._lines(indent + 1))
+        return lines
+
+    def __str__(self):
+        lines = self._lines(0)
+        if self.rows is not None:
+            lines.append('total cost=%.2f for %s rows' % (self.total_cost, self.rows))
+        return '\n'.join(lines)
+
+
+def _leaf_strategy(filter_dict, text_fields, index):
+    field = filter_dict[FIELD_KEY]
+    lookup = filter_dict[LOOKUP_KEY]
+    value = filter_dict[VALUE_KEY]
+
+    if index is not None and field in index.bitmaps and index.leaf_bitset(filter_dict) is not None:
+        return 'bitmap'
+    if lookup in TEXT_LOOKUPS and text_fields[field] > 1:
+        return 'multi-pattern'
+    if lookup == IN:
+        if isinstance(value, SortedValues):
+            return 'binary search'
+        if isinstance(value, (frozenset, set)):
+            return 'hash'
+        return 'scan'
+    if lookup in (YEAR, MONTH, WEEK, DAY, HOUR, MINUTE, SECOND):
+        return 'date part'
+    if lookup in TEXT_LOOKUPS or lookup == IEXACT:
+        return 'text match'
+    return 'compare'
+
+
+def _plan(node, statistics, text_fields, index):
+    is_or = node.connector == LookupNode.OR
+    children = []
+    for _filter in node.filters:
+        if isinstance(_filter, LookupNode):
+            children.append(_plan(_filter, statistics, text_fields, index))
+        else:
+            strategy = _leaf_strategy(_filter, text_fields, index)
+            # A bitmap answers the leaf for all records at once.
+            cost = 0.0 if strategy == 'bitmap' else leaf_cost(_filter)
+            children.append(Plan(
+                _filter[LOOKUP_KEY], strategy, cost, leaf_selectivity(_filter, statistics),
+                field=_filter[FIELD_KEY]))
+
+    def rank(child):
+        # Cheap children that most often decide the result go first.
+        selectivity = UNKNOWN_SELECTIVITY if child.selectivity is None else child.selectivity
+        decides = selectivity if is_or else 1.0 - selectivity
+        return child.cost / decides if decides else float('inf')
+
+    children.sort(key=rank)
+
+    cost = 0.0
+    # The fraction of records for which the result is still open.
+    open_fraction = 1.0
+    selectivity = 0.0 if is_or else 1.0
+    for child in children:
+        cost += open_fraction * child.cost
+        child_selectivity = UNKNOWN_SELECTIVITY if child.selectivity is None else child.selectivity
+        if is_or:
+            open_fraction *= 1.0 - child_selectivity
+            selectivity = 1.0 - (1.0 - selectivity) * (1.0 - child_selectivity)
+        else:
+            open_fraction *= child_selectivity
+            selectivity *= child_selectivity
+
+    if statistics is None:
+        selectivity = None
+    elif node.negated:
+        selectivity = 1.0 - selectivity
+
+    if children and all(child.strategy in ('bitmap', 'bitwise') for child in children):
+        strategy = 'bitwise'
+    else:
+        strategy = 'short-circuit'
+
+    return Plan(node.connector, strategy, cost, selectivity, negated=node.negated, children=children)
+
+
+def explain(lookup, statistics=None, index=None):
+    """
+    Plan the in memory evaluation of a lookup and estimate its cost.
+
+    Every leaf has a cost from `LOOKUP_COSTS` (an `icontains` costs more than
+    an `exact`) and a strategy: `bitmap` when the `BitmapIndex` answers it,
+    `multi-pattern` for text leaves that share an Aho-Corasick pass,
+    `hash`, `binary search` or `scan` for `in` values, `date part`,
+    `text match` or `compare`. With statistics the selectivity of leaves is
+    estimated from the null fraction, most common values, number of distinct
+    values and the minimum and maximum, assuming independent fields. Children
+    are ordered so cheap children that decide the result go first, and the
+    cost of a node is the estimated cost with short circuiting in that order.
+    The evaluators do not reorder lookups, the plan only suggests the order.
+
+    Args:
+        lookup (LookupNode): The lookup to plan.
+        statistics (Statistics): The statistics of the records.
+        index (BitmapIndex): The bitmap index of the records.
+
+    Returns:
+        Plan: The plan of the root node.
+    """
+    text_fields = Counter(
+        _filter[FIELD_KEY] for _filter in iter_leaves(lookup) if _filter[LOOKUP_KEY] in TEXT_LOOKUPS)
+    plan = _plan(lookup, statistics, text_fields, index)
+    if statistics is not None:
+        plan.rows = statistics.rows
+    return plan
@@ -0,0 +1,157 @@
+import simplejson as json
+
+from .exceptions import InvalidValueException, UnsupportedLookupException
+from .lookup import FIELD_KEY, LOOKUP_KEY, LookupNode, Param, TYPE_KEY, VALUE_KEY
+from .lookup_types import IN, LOOKUP_TYPES
+from .utils import encoded_type, TypeEncoder
+from .validators import VALIDATORS
+
+
+class PreparedLookup(object):
+    """
+    Lookup with parameters that is validated once and bound many times, the
+    filterql equivalent of a prepared statement.
+
+    Filters without parameters are validated when preparing and shared by all
+    bound lookups. Binding only validates the bound values and creates the
+    nodes and the filters with parameters.
+    """
+    def __init__(self, lookup):
+        """
+        Validate the lookup and compile it into a template.
+
+        Args:
+            lookup (LookupNode): The lookup with `Param` values.
+
+        Raises:
+            UnsupportedLookupException: When a filter has an unknown lookup type.
+            InvalidValueException: When a value is invalid for its lookup type.
+        """
+        self.lookup = lookup
+        self._validators = {}
+        # The parameters of `in` lookups.
+        self._in_params = set()
+        self._template = self._compile(lookup)
+        self.params = frozenset(self._validators)
+
+    def _compile(self, node):
+        """
+        Compile a node into a template of the connector, negated and children.
+        Children are nested templates, filter dicts without parameters or a
+        tuple of the field, lookup type and name of a parameter.
+        """
+        children = []
+        for _filter in node.filters:
+            if isinstance(_filter, LookupNode):
+                children.append(self._compile(_filter))
+                continue
+
+            lookup = _filter[LOOKUP_KEY]
+            if lookup not in LOOKUP_TYPES:
+                raise UnsupportedLookupException(lookup)
+
+            value = _filter[VALUE_KEY]
+            validate = VALIDATORS.get(lookup)
+            if isinstance(value, Param):
+                validators = self._validators.setdefault(value.name, set())
+                if lookup == IN:
+                    self._in_params.add(value.name)
+                if validate:
+                    validators.add(validate)
+                children.append((_filter[FIELD_KEY], lookup, value.name))
+            else:
+                if validate:
+                    validate(value)
+                children.append(_filter)
+
+        return (node.connector, node.negated, children)
+
+    def _validate(self, values):
+        """
+        Validate the bound values once per parameter.
+        """
+        # Iterators of `in` values would be exhausted by the validation.
+        for name in self._in_params:
+            value = values.get(name)
+            if hasattr(value, '__iter__') and not hasattr(value, '__len__'):
+                values[name] = list(value)
+
+        for name, validators in self._validators.items():
+            if name not in values:
+                raise InvalidValueException('Missing value for parameter `%s`' % name)
+            for validate in validators:
+                validate(values[name])
+
+        if len(values) != len(self._validators):
+            unknown = sorted(set(values) - self.params)
+            raise InvalidValueException('Unknown parameters %s' % unknown)
+
+    def _build(self, template, values):
+        connector, negated, children = template
+        filters = []
+        for child in children:
+            if isinstance(child, dict):
+                filters.append(child)
+            elif len(child) == 3 and isinstance(child[2], list):
+                filters.append(self._build(child, values))
+            else:
+                field, lookup, name = child
+                value = values[name]
+                _filter = {FIELD_KEY: field, LOOKUP_KEY: lookup, VALUE_KEY: value}
+                value_type = encoded_type(value)
+                if value_type:
+                    _filter[TYPE_KEY] = value_type
+                filters.append(_filter)
+
+        # Skip the checks of the constructor, the template is valid.
+        node = LookupNode.__new__(LookupNode)
+        node.filters = filters
+        node.connector = connector
+        node.negated = negated
+        return node
+
+    def bind(self, **values):
+        """
+        Bind values to the parameters.
+
+        Args:
+            **values: The value for every parameter by name.
+
+        Returns:
+            LookupNode: The lookup with the bound values.
+
+        Raises:
+            InvalidValueException: When a parameter is missing, unknown or
+                has an invalid value.
+        """
+        self._validate(values)
+        return self._build(self._template, values)
+
+    def bind_dict(self, **values):
+        """
+        Bind values to the parameters and get the dict of the lookup.
+        """
+        return self.bind(**values).to_dict()
+
+    def bind_json(self, **values):
+        """
+        Bind values to the parameters and get the json of the lookup.
+        """
+        return json.dumps(self.bind_dict(**values), cls=TypeEncoder, use_decimal=True)
+
+    def bind_to(self, serializer, **values):
+        """
+        Bind values to the parameters and deserialize the lookup.
+
+        Every bound lookup has the same shape, so serializers that cache per
+        shape (like the Django and SQL serializers) only compile it once.
+
+        Args:
+            serializer: Serializer with a `deserialize` method, like
+                `DjangoSerializer` or `SQLSerializer`.
+            **values: The value for every parameter by name.
+
+        Returns:
+            The result of the serializer, like a Q object or SQL.
+        """
+        return serializer.deserialize(self.bind(**values))
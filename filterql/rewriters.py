@@ -0,0 +1,146 @@
+from datetime import date, datetime, timedelta
+
+from .lookup import FIELD_KEY, L, LOOKUP_KEY, LookupNode, VALUE_KEY
+from .lookup_types import DAY, GTE, HOUR, LT, MONTH, YEAR
+
+
+# Date parts that can be turned into a range, from coarse to fine. Every part
+# only narrows the range when all coarser parts are known.
+RANGE_PARTS = [YEAR, MONTH, DAY, HOUR]
+
+
+def _next_month(year, month):
+    if month == 12:
+        return year + 1, 1
+    return year, month + 1
+
+
+def date_part_range(parts, as_datetime=False):
+    """
+    Get the half open range for a prefix of the RANGE_PARTS.
+
+    Args:
+        parts (list): The values for the first parts of RANGE_PARTS.
+        as_datetime (bool): Whether to always return datetime bounds, date
+            bounds are used when no hour is given otherwise.
+
+    Returns:
+        tuple: The lower (inclusive) and upper (exclusive) bound.
+
+    Raises:
+        ValueError: When the parts do not form a valid date.
+    """
+    year = parts[0]
+    if len(parts) == 1:
+        lower, upper = date(year, 1, 1), date(year + 1, 1, 1)
+    elif len(parts) == 2:
+        lower, upper = date(year, parts[1], 1), date(*_next_month(year, parts[1]) + (1,))
+    else:
+        lower = date(year, parts[1], parts[2])
+        upper = lower + timedelta(days=1)
+
+    if len(parts) == 4:
+        lower = datetime(lower.year, lower.month, lower.day, parts[3])
+        upper = lower + timedelta(hours=1)
+    elif as_datetime:
+        lower = datetime(lower.year, lower.month, lower.day)
+        upper = datetime(upper.year, upper.month, upper.day)
+
+    return lower, upper
+
+
+def _range_filters(field, parts, as_datetime):
+    lower, upper = date_part_range(parts, as_datetime)
+    return [L(field, lower, lookup=GTE).filters[0], L(field, upper, lookup=LT).filters[0]]
+
+
+def _rewrite_and(filters, as_datetime):
+    """
+    Rewrite the direct leaves of an `and` node, combining the parts of the
+    same field into a single range.
+    """
+    parts_by_field = {}
+    for _filter in filters:
+        if isinstance(_filter, dict) and _filter[LOOKUP_KEY] in RANGE_PARTS:
+            parts = parts_by_field.setdefault(_filter[FIELD_KEY], {})
+            parts.setdefault(_filter[LOOKUP_KEY], _filter)
+
+    replaced = {}
+    for field, parts in parts_by_field.items():
+        prefix = []
+        for part in RANGE_PARTS:
+            if part not in parts:
+                break
+            prefix.append(parts[part])
+        if not prefix:
+            continue
+
+        try:
+            ranges = _range_filters(field, [_filter[VALUE_KEY] for _filter in prefix], as_datetime)
+        except (TypeError, ValueError):
+            continue
+
+        # The range takes the place of the first leaf, the others are dropped.
+        replaced[id(prefix[0])] = ranges
+        for _filter in prefix[1:]:
+            replaced[id(_filter)] = []
+
+    result = []
+    for _filter in filters:
+        if isinstance(_filter, LookupNode):
+            result.append(rewrite_date_ranges(_filter, as_datetime))
+        else:
+            result.extend(replaced.get(id(_filter), [_filter]))
+
+    return result
+
+
+def _rewrite_or(filters, as_datetime):
+    """
+    Rewrite the `year` leaves of an `or` node into an `and` of the range.
+    """
+    result = []
+    for _filter in filters:
+        if isinstance(_filter, LookupNode):
+            result.append(rewrite_date_ranges(_filter, as_datetime))
+            continue
+
+        if _filter[LOOKUP_KEY] == YEAR:
+            try:
+                ranges = _range_filters(_filter[FIELD_KEY], [_filter[VALUE_KEY]], as_datetime)
+            except (TypeError, ValueError):
+                pass
+            else:
+                _filter = LookupNode(filters=ranges, connector=LookupNode.AND)
+        result.append(_filter)
+
+    return result
+
+
+def rewrite_date_ranges(lookup, as_datetime=False):
+    """
+    Rewrite date part lookups into ranges on the field.
+
+    A lookup like `created__year=2020` makes most databases apply a function
+    on the column, so an index on it can not be used. The rewritten lookup
+    `created >= 2020-01-01 AND created < 2021-01-01` can use the index.
+    `year`, `month`, `day` and `hour` leaves on the same field under one
+    `and` are combined into a single range. Parts that do not narrow a known
+    range (like a `month` without a `year`) are left untouched.
+
+    The bounds are naive, so the rewrite is exact for date fields and for
+    datetime fields compared in the same time zone as the date parts.
+
+    Args:
+        lookup (LookupNode): The lookup to rewrite.
+        as_datetime (bool): Whether to use datetime bounds for all ranges.
+
+    Returns:
+        LookupNode: A new lookup, the given lookup is not changed.
+    """
+    if lookup.connector == LookupNode.OR:
+        filters = _rewrite_or(lookup.filters, as_datetime)
+    else:
+        filters = _rewrite_and(lookup.filters, as_datetime)
+
+    return LookupNode(filters=filters, connector=lookup.connector, negated=lookup.negated)
@@ -0,0 +1,228 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from .exceptions import InvalidValueException, SchemaException
+from .lookup import FIELD_KEY, LOOKUP_KEY, LookupNode, TYPE_KEY, VALUE_KEY
+from .lookup_types import (CONTAINS, DAY, ENDSWITH, EXACT, GT, GTE, HOUR, ICONTAINS, IENDSWITH, IEXACT, IN,
+                           ISNULL, ISTARTSWITH, LT, LTE, MINUTE, MONTH, SECOND, STARTSWITH, WEEK, YEAR)
+from .utils import DECODERS, encoded_type
+from .validators import in_validator, integer_validator, isnull_validator, VALIDATORS
+
+
+COMPARISON_LOOKUPS = [EXACT, GT, GTE, LT, LTE, IN, ISNULL]
+TEXT_LOOKUPS = [IEXACT, CONTAINS, ICONTAINS, STARTSWITH, ISTARTSWITH, ENDSWITH, IENDSWITH]
+DATE_PART_LOOKUPS = [YEAR, MONTH, WEEK, DAY]
+TIME_PART_LOOKUPS = [HOUR, MINUTE, SECOND]
+
+# The lookup types allowed for a field of a type when not given.
+DEFAULT_LOOKUPS = {
+    str: COMPARISON_LOOKUPS + TEXT_LOOKUPS,
+    bool: [EXACT, ISNULL],
+    date: COMPARISON_LOOKUPS + DATE_PART_LOOKUPS,
+    datetime: COMPARISON_LOOKUPS + DATE_PART_LOOKUPS + TIME_PART_LOOKUPS,
+    time: COMPARISON_LOOKUPS + TIME_PART_LOOKUPS,
+}
+
+# Types of values that are converted to the type of a field, like the
+# decoded json values.
+CONVERTED_TYPES = {
+    float: (int, Decimal),
+    Decimal: (int, float, str),
+    timedelta: (int, float, Decimal),
+}
+
+
+def _is_instance(value_type):
+    """
+    Get a check of the type of a value, without the subclasses that are a
+    different type for the database.
+    """
+    if value_type is int or value_type is float:
+        return lambda value: isinstance(value, value_type) and not isinstance(value, bool)
+    if value_type is date:
+        return lambda value: isinstance(value, date) and not isinstance(value, datetime)
+    return lambda value: isinstance(value, value_type)
+
+
+def type_coercer(value_type):
+    """
+    Get a function that coerces a value to a type, like a decoded json
+    string to a date.
+
+    Args:
+        value_type (type): The type of the values.
+
+    Returns:
+        function: Returns the value of the type for a value, raises
+            InvalidValueException when it can not be converted.
+    """
+    is_instance = _is_instance(value_type)
+    converted = CONVERTED_TYPES.get(value_type, (str,) if value_type.__name__ in DECODERS else ())
+    convert = DECODERS.get(value_type.__name__, value_type)
+    message = 'Value needs to be of type %s' % value_type.__name__
+
+    def coerce(value):
+        if type(value) is value_type or is_instance(value):
+            return value
+        if isinstance(value, converted) and not isinstance(value, bool):
+            try:
+                return convert(value)
+            except (ValueError, TypeError, ArithmeticError):
+                pass
+        raise InvalidValueException(message)
+
+    return coerce
+
+
+def lookup_checker(value_type, lookup):
+    """
+    Get a function that validates and coerces the value of a lookup type for
+    a field of a type.
+
+    Args:
+        value_type (type): The type of the field.
+        lookup (string): The lookup type.
+
+    Returns:
+        function: Returns the coerced value for a value, raises
+            InvalidValueException when it is invalid.
+    """
+    if lookup == ISNULL:
+        def check(value):
+            isnull_validator(value)
+            return value
+    elif lookup in DATE_PART_LOOKUPS or lookup in TIME_PART_LOOKUPS:
+        validate = VALIDATORS.get(lookup, integer_validator)
+
+        def check(value):
+            validate(value)
+            return value
+    elif lookup == IN:
+        coerce = type_coercer(value_type)
+
+        def check(values):
+            in_validator(values)
+            coerced = [coerce(value) for value in values]
+            # Keep the values when none were coerced.
+            if all(a is b for a, b in zip(coerced, values)):
+                return values
+            return coerced
+    else:
+        check = type_coercer(str if lookup in TEXT_LOOKUPS else value_type)
+
+    return check
+
+
+class Field(object):
+    """
+    A field of a schema with its type and allowed lookup types.
+    """
+    def __init__(self, value_type, lookups=None):
+        """
+        Args:
+            value_type (type): The type of the values of the field.
+            lookups (list): The allowed lookup types, the defaults for the
+                type in `DEFAULT_LOOKUPS` or the comparison lookups if not given.
+        """
+        self.value_type = value_type
+        if lookups is None:
+            lookups = DEFAULT_LOOKUPS.get(value_type, COMPARISON_LOOKUPS)
+        self.lookups = list(lookups)
+
+
+class Schema(object):
+    """
+    The fields that lookups are allowed to filter on.
+
+    A checker is compiled once for every field and allowed lookup type, so a
+    schema can be created once and used for every lookup, checking a lookup
+    costs a dict lookup and the checker per filter.
+    """
+    def __init__(self, fields):
+        """
+        Args:
+            fields (dict): A `Field` or the type of the values for every field
+                name.
+        """
+        self.fields = {
+            name: field if isinstance(field, Field) else Field(field)
+            for name, field in fields.items()
+        }
+        self._checkers = {
+            (name, lookup): lookup_checker(field.value_type, lookup)
+            for name, field in self.fields.items()
+            for lookup in field.lookups
+        }
+
+    def _error(self, _filter):
+        field = _filter.get(FIELD_KEY)
+        if field not in self.fields:
+            return 'Unknown field `%s`' % field
+        return 'Lookup `%s` is not allowed for field `%s`' % (_filter.get(LOOKUP_KEY), field)
+
+    def _validate(self, node, path, errors):
+        filters = []
+        for index, _filter in enumerate(node.filters):
+            if isinstance(_filter, LookupNode):
+                filters.append(self._validate(_filter, path + [index], errors))
+                continue
+
+            checker = self._checkers.get((_filter.get(FIELD_KEY), _filter.get(LOOKUP_KEY)))
+            if checker is None:
+                errors.append((path + [index], self._error(_filter)))
+                continue
+
+            value = _filter.get(VALUE_KEY)
+            try:
+                coerced = checker(value)
+            except InvalidValueException as exc:
+                errors.append((path + [index], '`%s`: %s' % (_filter[FIELD_KEY], exc)))
+                continue
+
+            if coerced is not value:
+                _filter = {key: _filter[key] for key in (FIELD_KEY, LOOKUP_KEY)}
+                _filter[VALUE_KEY] = coerced
+                value_type = encoded_type(coerced)
+                if value_type:
+                    _filter[TYPE_KEY] = value_type
+            filters.append(_filter)
+
+        validated = LookupNode.__new__(LookupNode)
+        validated.filters = filters
+        validated.connector = node.connector
+        validated.negated = node.negated
+        return validated
+
+    def validate(self, lookup):
+        """
+        Check all filters of a lookup and coerce their values to the types of
+        the fields.
+
+        Args:
+            lookup (LookupNode): The lookup to check.
+
+        Returns:
+            LookupNode: The lookup with the coerced values. Filters with
+                values that did not need to be coerced are shared with the
+                given lookup.
+
+        Raises:
+            SchemaException: With the errors of all invalid filters.
+        """
+        errors = []
+        validated = self._validate(lookup, [], errors)
+        if errors:
+            raise SchemaException(errors)
+        return validated
+
+    def from_dict(self, l_dict):
+        """
+        Load a lookup from a dict and check it, see `validate`.
+        """
+        return self.validate(LookupNode.from_dict(l_dict))
+
+    def from_json(self, lookup_json):
+        """
+        Load a lookup from json and check it, see `validate`.
+        """
+        return self.validate(LookupNode.from_json(lookup_json))
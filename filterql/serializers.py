@@ -1,22 +1,264 @@
+from contextlib import contextmanager
+from datetime import date, datetime, time
+import operator
+import re
+import threading
+from timeit import default_timer
+import uuid
+
+import simplejson as json
+
+from . import instrumentation
 from .lookup import FIELD_KEY, L, LOOKUP_KEY, LookupNode, VALUE_KEY
-from .lookup_types import EXACT
+from .lookup_types import (CONTAINS, DAY, ENDSWITH, EXACT, GT, GTE, HOUR, ICONTAINS, IENDSWITH, IEXACT, IN,
+                           ISNULL, ISTARTSWITH, LT, LTE, MINUTE, MONTH, SECOND, STARTSWITH, WEEK, YEAR)
+from .rewriters import rewrite_date_ranges
+from .utils import LRUCache, TypeEncoder
+
+
+class InStrategy(object):
+    """
+    Base class for converting `in` lookups with many values to django.
+
+    The base strategy keeps the plain `__in` lookup with all values.
+    """
+    def __init__(self, using='default'):
+        """
+        Args:
+            using (string): The alias of the database the Q object is used on.
+        """
+        self.using = using
+
+    @property
+    def connection(self):
+        from django.db import connections
+        return connections[self.using]
+
+    def adapt_value(self, value):
+        """
+        Get a value in the format the database of the connection stores it,
+        for strategies that pass the values outside the django query.
+        """
+        ops = self.connection.ops
+        if isinstance(value, datetime):
+            return ops.adapt_datetimefield_value(value)
+        if isinstance(value, date):
+            return ops.adapt_datefield_value(value)
+        if isinstance(value, time):
+            return ops.adapt_timefield_value(value)
+        if isinstance(value, uuid.UUID) and not self.connection.features.has_native_uuid_field:
+            return value.hex
+        return value
+
+    def convert(self, Q, django_lookup, values):
+        """
+        Convert an `in` lookup to a child of a Q object.
+
+        Args:
+            Q (type): The django Q class.
+            django_lookup (string): The django lookup, like `id__in`.
+            values (iterable): The values of the lookup.
+
+        Returns:
+            (Q|tuple): A Q object or a tuple with the lookup and a value.
+        """
+        return (django_lookup, list(values))
+
+
+class ChunkedInStrategy(InStrategy):
+    """
+    Split the values into `or`ed chunks below the `in` list limit of the backend.
+
+    This helps backends that limit the size of a single `in` list, like
+    Oracle. Chunks do not help backends that limit the parameters of the
+    whole query, like SQLite, so values above that limit are passed as a
+    single array parameter when the backend supports it, see
+    `ArrayInStrategy`.
+    """
+    def __init__(self, chunk_size=None, using='default', max_params=None):
+        """
+        Args:
+            chunk_size (int): The maximum number of values per chunk, defaults
+                to the limits of the database backend.
+            using (string): The alias of the database the Q object is used on.
+            max_params (int): The maximum number of parameters of a query,
+                defaults to the limit of the database backend.
+        """
+        super(ChunkedInStrategy, self).__init__(using)
+        self.chunk_size = chunk_size
+        self.max_params = max_params
+
+    def get_chunk_size(self):
+        if self.chunk_size:
+            return self.chunk_size
+
+        connection = self.connection
+        return connection.ops.max_in_list_size() or connection.features.max_query_params or 1000
+
+    def get_max_params(self):
+        return self.max_params or self.connection.features.max_query_params
+
+    def convert(self, Q, django_lookup, values):
+        values = list(values)
+
+        max_params = self.get_max_params()
+        if max_params and len(values) > max_params and self.connection.vendor in ArrayInStrategy.ARRAY_SQL:
+            return ArrayInStrategy(using=self.using).convert(Q, django_lookup, values)
+
+        size = self.get_chunk_size()
+        query = Q()
+        query.children = [(django_lookup, values[index:index + size]) for index in range(0, len(values), size)]
+        query.connector = Q.OR
+        return query
+
+
+class ArrayInStrategy(InStrategy):
+    """
+    Pass all values as a single array parameter.
+
+    PostgreSQL unnests a native array and SQLite reads a JSON array with
+    `json_each`. Other backends fall back to chunking.
+    """
+    ARRAY_SQL = {
+        'postgresql': 'SELECT unnest(%s)',
+        'sqlite': 'SELECT value FROM json_each(%s)',
+    }
+
+    def convert(self, Q, django_lookup, values):
+        from django.db.models.expressions import RawSQL
+
+        vendor = self.connection.vendor
+        sql = self.ARRAY_SQL.get(vendor)
+        if sql is None:
+            return ChunkedInStrategy(using=self.using).convert(Q, django_lookup, values)
+
+        values = list(values)
+        if vendor == 'sqlite':
+            # The JSON values are compared with the values as django stores them.
+            values = json.dumps([self.adapt_value(value) for value in values], cls=TypeEncoder)
+
+        return (django_lookup, RawSQL(sql, [values]))
+
+
+class TemporaryTableInStrategy(InStrategy):
+    """
+    Stage the values in a temporary table that is used in a subquery.
+
+    Lookups can only be converted in a `with strategy.scope():` block, the
+    tables are dropped at the end of the block, so the queries need to be
+    evaluated in the block. Scopes are per thread, like the connections.
+    """
+    COLUMN_TYPES = [
+        (bool, 'boolean'),
+        (int, 'bigint'),
+        (float, 'double precision'),
+    ]
+
+    def __init__(self, column_type=None, using='default'):
+        """
+        Args:
+            column_type (string): The database type of the value column,
+                defaults to a type based on the first value.
+            using (string): The alias of the database the Q object is used on.
+        """
+        super(TemporaryTableInStrategy, self).__init__(using)
+        self.column_type = column_type
+        self._local = threading.local()
+
+    def get_column_type(self, values):
+        if self.column_type:
+            return self.column_type
+
+        for value in values:
+            for value_type, column_type in self.COLUMN_TYPES:
+                if isinstance(value, value_type):
+                    return column_type
+            break
+        return 'text'
+
+    @property
+    def tables(self):
+        """
+        The temporary tables of the current scope of this thread, None
+        outside a scope.
+        """
+        return getattr(self._local, 'tables', None)
+
+    @contextmanager
+    def scope(self):
+        """
+        Drop the temporary tables created in a with block at the end of it.
+        """
+        previous = self.tables
+        self._local.tables = []
+        try:
+            yield self
+        finally:
+            tables, self._local.tables = self._local.tables, previous
+            with self.connection.cursor() as cursor:
+                for table in tables:
+                    cursor.execute('DROP TABLE IF EXISTS %s' % table)
+
+    def convert(self, Q, django_lookup, values):
+        from django.db.models.expressions import RawSQL
+
+        tables = self.tables
+        if tables is None:
+            raise RuntimeError('Temporary tables can only be created in a `with strategy.scope():` block')
+
+        values = [self.adapt_value(value) for value in values]
+        connection = self.connection
+        table = connection.ops.quote_name('filterql_in_%s' % uuid.uuid4().hex)
+
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE %s (value %s)' % (table, self.get_column_type(values)))
+            tables.append(table)
+            cursor.executemany('INSERT INTO %s (value) VALUES (%%s)' % table, [(value,) for value in values])
+
+        return (django_lookup, RawSQL('SELECT value FROM %s' % table, []))
 
 
 class DjangoSerializer():
     """
     Class for (de)serializing L dict or L json to django Q object.
+
+    The Q object is built from a template that is compiled once per shape of
+    the lookup (the structure, fields and lookup types without the values).
+    Templates are cached per serializer and for the whole process.
     """
     CONNECTOR_MAP = {
         L.AND: 'AND',
         L.OR: 'OR',
     }
 
-    def __init__(self):
+    # Templates shared by all serializers in the process.
+    process_cache = LRUCache(1024)
+
+    def __init__(self, cache_size=128, use_process_cache=True, in_strategy=None, in_threshold=1000,
+                 rewrite_dates=False):
         """
         Lazy set the DJANGO_SUFFIX_DELIMITER based on a Django constant.
+
+        Args:
+            cache_size (int): The maximum number of templates cached by this
+                serializer.
+            use_process_cache (bool): Whether to share templates with the other
+                serializers in the process.
+            in_strategy (InStrategy): The strategy for `in` lookups with more
+                than `in_threshold` values, by default they are not changed.
+            in_threshold (int): The number of values above which the
+                `in_strategy` is used.
+            rewrite_dates (bool): Whether to rewrite date part lookups into
+                index friendly ranges, see `rewrite_date_ranges`.
         """
         from django.db.models.constants import LOOKUP_SEP
         self.DJANGO_SUFFIX_DELIMITER = LOOKUP_SEP
+        self.rewrite_dates = rewrite_dates
+
+        self.cache = LRUCache(cache_size)
+        self.use_process_cache = use_process_cache
+        self.in_strategy = in_strategy
+        self.in_threshold = in_threshold
 
     def from_json(self, json_string):
         """
@@ -40,49 +282,827 @@ class DjangoSerializer():
         Returns:
             Q: Django Q filter.
         """
+        active = instrumentation.active
+        if active is None:
+            return self._deserialize(l_object)[0]
+
+        start = default_timer()
+        query, cache = self._deserialize(l_object)
+        active.on_deserialize(default_timer() - start, instrumentation.lookup_stats(l_object, cache=cache))
+        return query
+
+    def _deserialize(self, l_object):
+        """
+        Deserialize without instrumentation, see `deserialize`.
+
+        Returns:
+            tuple: The Q object and where its template was found.
+        """
         # Lazy import to avoid conflicts when not using this django serializer.
         from django.db.models import Q
 
-        # Set some defaults.
-        negated = l_object.negated
-        connector = self.CONNECTOR_MAP[l_object.connector]
-        children = []
+        if self.rewrite_dates:
+            l_object = rewrite_date_ranges(l_object)
 
-        filters = l_object.filters
+        values = []
+        shape = self._shape(l_object, values)
 
-        # Loop all filters in the lookup node.
-        for _filter in filters:
+        cache = 'hit'
+        template = self.cache.get(shape)
+        if template is None:
+            cache = 'process_hit'
+            if self.use_process_cache:
+                template = self.process_cache.get(shape)
+            if template is None:
+                cache = 'miss'
+                template = self._compile(shape)
+                if self.use_process_cache:
+                    self.process_cache.set(shape, template)
+            self.cache.set(shape, template)
+
+        return self._bind(Q, template, iter(values)), cache
+
+    def _shape(self, l_object, values):
+        """
+        Get the shape of a lookup and collect the values of its filters.
+
+        Args:
+            l_object (LookupNode): The L object to get the shape of.
+            values (list): The list to append the values to.
+
+        Returns:
+            tuple: The hashable shape of the lookup.
+        """
+        children = []
+        for _filter in l_object.filters:
             if isinstance(_filter, LookupNode):
-                children.append(self.deserialize(_filter))
+                children.append(self._shape(_filter, values))
+            else:
+                values.append(_filter[VALUE_KEY])
+                children.append((_filter[FIELD_KEY], _filter[LOOKUP_KEY]))
+
+        return (l_object.connector, l_object.negated, tuple(children))
+
+    def _compile(self, shape):
+        """
+        Compile the shape of a lookup into a template for the Q object.
+
+        Returns:
+            tuple: The django connector, negated and the children, which are
+                either a django lookup string, a tuple with the django lookup
+                string for `in` lookups or a nested template.
+        """
+        connector, negated, children = shape
+        template_children = []
+        for child in children:
+            if len(child) == 3:
+                template_children.append(self._compile(child))
+            elif child[1] == IN:
+                template_children.append((self._convert_lookup(*child),))
             else:
-                children.append(self._convert_filter(_filter))
+                template_children.append(self._convert_lookup(*child))
+
+        return (self.CONNECTOR_MAP[connector], negated, tuple(template_children))
+
+    def _bind(self, Q, template, values):
+        """
+        Build the Q object for a template with the values of a lookup.
+        """
+        connector, negated, children = template
 
         query = Q()
-        query.children = children
+        query.children = [
+            (child, next(values)) if isinstance(child, str) else
+            self._bind_in(Q, child[0], next(values)) if len(child) == 1 else
+            self._bind(Q, child, values)
+            for child in children
+        ]
         query.connector = connector
         query.negated = negated
 
         return query
 
+    def _bind_in(self, Q, django_lookup, values):
+        """
+        Bind the values of an `in` lookup, using the strategy for large lookups.
+        """
+        if self.in_strategy is not None and len(values) > self.in_threshold:
+            return self.in_strategy.convert(Q, django_lookup, values)
+        return (django_lookup, values)
+
+    def _convert_lookup(self, field, lookup):
+        """
+        Function to convert a field and L lookup type to a django lookup.
+
+        Returns:
+            string: The django lookup.
+        """
+        if lookup == EXACT:
+            return field
+        return '%s%s%s' % (field, self.DJANGO_SUFFIX_DELIMITER, lookup)
+
+
+class SQLDialect(object):
+    """
+    Hooks for compiling lookups to the SQL of a specific database.
+
+    The defaults follow standard SQL with `format` style placeholders like
+    used by PostgreSQL drivers.
+    """
+    placeholder = '%s'
+    like_escape = '\\'
+
+    TEXT_PATTERNS = {
+        CONTAINS: '%%%s%%',
+        ICONTAINS: '%%%s%%',
+        STARTSWITH: '%s%%',
+        ISTARTSWITH: '%s%%',
+        ENDSWITH: '%%%s',
+        IENDSWITH: '%%%s',
+    }
+
+    DATE_PARTS = {
+        YEAR: 'YEAR',
+        MONTH: 'MONTH',
+        WEEK: 'WEEK',
+        DAY: 'DAY',
+        HOUR: 'HOUR',
+        MINUTE: 'MINUTE',
+        SECOND: 'SECOND',
+    }
+
+    OPERATORS = {
+        EXACT: '=',
+        GT: '>',
+        LT: '<',
+        GTE: '>=',
+        LTE: '<=',
+    }
+
+    def quote_name(self, name):
+        """
+        Quote a table or column name.
+        """
+        return '"%s"' % name.replace('"', '""')
+
+    def column(self, field):
+        """
+        Get the column for a field, `__` separates the table and the column.
+        """
+        return '.'.join(self.quote_name(name) for name in field.split('__'))
+
+    def value_shape(self, lookup, value):
+        """
+        The part of a value that changes the SQL text of a lookup.
+
+        Args:
+            lookup (string): The lookup type.
+            value: The value of the lookup.
+
+        Returns:
+            The hashable shape of the value.
+        """
+        if lookup == IN:
+            return len(value)
+        if lookup == ISNULL:
+            return bool(value)
+        if lookup in (EXACT, IEXACT):
+            return value is None
+        return None
+
+    def nullable(self, lookup, value_shape):
+        """
+        Whether the SQL of a lookup is NULL when the column is NULL.
+
+        Such lookups need a guard under a negation to include the NULL rows,
+        like the in memory evaluators and django.
+        """
+        if lookup == ISNULL:
+            return False
+        if lookup in (EXACT, IEXACT) and value_shape:
+            return False
+        return not (lookup == IN and not value_shape)
+
+    def escape_like(self, value):
+        """
+        Escape the wildcards of a LIKE pattern.
+        """
+        escape = self.like_escape
+        return value.replace(escape, escape * 2).replace('%', escape + '%').replace('_', escape + '_')
+
+    def date_part(self, part, column):
+        """
+        Get the SQL expression for a date part of a column.
+        """
+        return 'EXTRACT(%s FROM %s)' % (self.DATE_PARTS[part], column)
+
+    def text_match(self, lookup, column):
+        """
+        Get the SQL for one of the TEXT_PATTERNS lookups.
+        """
+        if lookup in (ICONTAINS, ISTARTSWITH, IENDSWITH):
+            column = 'UPPER(%s)' % column
+            return "%s LIKE UPPER(%s) ESCAPE '%s'" % (column, self.placeholder, self.like_escape)
+        return "%s LIKE %s ESCAPE '%s'" % (column, self.placeholder, self.like_escape)
+
+    def lookup(self, column, lookup, value_shape):
+        """
+        Get the SQL for a single lookup.
+
+        Args:
+            column (string): The quoted column.
+            lookup (string): The lookup type.
+            value_shape: The shape of the value as returned by `value_shape`.
+
+        Returns:
+            string: The SQL with placeholders for the parameters.
+        """
+        if lookup == ISNULL:
+            return '%s IS %sNULL' % (column, '' if value_shape else 'NOT ')
+        if lookup in (EXACT, IEXACT) and value_shape:
+            return '%s IS NULL' % column
+        if lookup == IN:
+            if not value_shape:
+                return '1 = 0'
+            return '%s IN (%s)' % (column, ', '.join([self.placeholder] * value_shape))
+        if lookup == IEXACT:
+            return 'UPPER(%s) = UPPER(%s)' % (column, self.placeholder)
+        if lookup in self.TEXT_PATTERNS:
+            return self.text_match(lookup, column)
+        if lookup in self.DATE_PARTS:
+            return '%s = %s' % (self.date_part(lookup, column), self.placeholder)
+        return '%s %s %s' % (column, self.OPERATORS[lookup], self.placeholder)
+
+    def params(self, lookup, value):
+        """
+        Get the parameters for a single lookup.
+
+        Returns:
+            list: The parameters in the order of the placeholders.
+        """
+        if lookup == ISNULL or (lookup in (EXACT, IEXACT) and value is None):
+            return []
+        if lookup == IN:
+            return list(value)
+        if lookup in self.TEXT_PATTERNS:
+            return [self.TEXT_PATTERNS[lookup] % self.escape_like('%s' % value)]
+        return [value]
+
+
+class SQLiteDialect(SQLDialect):
+    """
+    Dialect for SQLite with `qmark` style placeholders.
+
+    LIKE is case insensitive in SQLite so case sensitive text lookups use
+    GLOB instead.
+    """
+    placeholder = '?'
+
+    GLOB_PATTERNS = {
+        CONTAINS: '*%s*',
+        STARTSWITH: '%s*',
+        ENDSWITH: '*%s',
+    }
+
+    DATE_PARTS = {
+        YEAR: '%Y',
+        MONTH: '%m',
+        DAY: '%d',
+        HOUR: '%H',
+        MINUTE: '%M',
+        SECOND: '%S',
+    }
+
+    def date_part(self, part, column):
+        if part == WEEK:
+            # The ISO week is the week of the year of the Thursday in the same week.
+            return "(CAST(strftime('%%j', date(%s, '-3 days', 'weekday 4')) AS INTEGER) - 1) / 7 + 1" % column
+        return "CAST(strftime('%s', %s) AS INTEGER)" % (self.DATE_PARTS[part], column)
+
+    def lookup(self, column, lookup, value_shape):
+        if lookup == WEEK:
+            return '%s = %s' % (self.date_part(lookup, column), self.placeholder)
+        return super(SQLiteDialect, self).lookup(column, lookup, value_shape)
+
+    def text_match(self, lookup, column):
+        if lookup in self.GLOB_PATTERNS:
+            return '%s GLOB %s' % (column, self.placeholder)
+        return super(SQLiteDialect, self).text_match(lookup, column)
+
+    def escape_glob(self, value):
+        """
+        Escape the wildcards of a GLOB pattern.
+        """
+        return ''.join('[%s]' % char if char in '*?[' else char for char in value)
+
+    def params(self, lookup, value):
+        if lookup in self.GLOB_PATTERNS:
+            return [self.GLOB_PATTERNS[lookup] % self.escape_glob('%s' % value)]
+        return super(SQLiteDialect, self).params(lookup, value)
+
+
+class SQLSerializer(object):
+    """
+    Class for compiling L dict or L json to a parameterized SQL where clause.
+
+    The SQL text only depends on the shape of the lookup (the structure,
+    fields and lookup types without the values), so it is cached per shape.
+    Lookups that only differ in their values get the same SQL text and reuse
+    the prepared statement of the database driver.
+    """
+    CONNECTOR_MAP = {
+        L.AND: ' AND ',
+        L.OR: ' OR ',
+    }
+
+    # The tags of the shapes of nodes and leaves.
+    NODE = 'node'
+    LEAF = 'leaf'
+
+    def __init__(self, dialect=None, cache_size=256, rewrite_dates=False):
+        """
+        Args:
+            dialect (SQLDialect): The dialect to compile to, defaults to SQLite.
+            cache_size (int): The maximum number of cached shapes.
+            rewrite_dates (bool): Whether to rewrite date part lookups into
+                index friendly ranges, see `rewrite_date_ranges`.
+        """
+        self.dialect = dialect or SQLiteDialect()
+        self.rewrite_dates = rewrite_dates
+        self.cache = LRUCache(cache_size)
+
+    def from_json(self, json_string):
+        """
+        Load a json string into a SQL where clause.
+
+        Args:
+            json_string (string): A valid json string.
+
+        Returns:
+            tuple: The SQL and the list of parameters.
+        """
+        return self.deserialize(L.from_json(json_string))
+
+    def deserialize(self, l_object):
+        """
+        Compile a lookup into a SQL where clause.
+
+        Args:
+            l_object (LookupNode): The L object to compile.
+
+        Returns:
+            tuple: The SQL and the list of parameters.
+        """
+        if self.rewrite_dates:
+            l_object = rewrite_date_ranges(l_object)
+
+        values = []
+        shape = self._shape(l_object, values)
+
+        sql = self.cache.get(shape)
+        if sql is None:
+            sql = self._compile(shape)
+            self.cache.set(shape, sql)
+
+        params = []
+        for lookup, value in values:
+            params.extend(self.dialect.params(lookup, value))
+
+        return sql, params
+
+    def _shape(self, l_object, values):
+        """
+        Get the shape of a lookup and collect the values of its filters.
+
+        Args:
+            l_object (LookupNode): The L object to get the shape of.
+            values (list): The list to append the lookup types and values to.
+
+        Returns:
+            tuple: The hashable shape of the lookup.
+        """
+        children = []
+        for _filter in l_object.filters:
+            if isinstance(_filter, LookupNode):
+                children.append(self._shape(_filter, values))
+            else:
+                lookup = _filter[LOOKUP_KEY]
+                value = _filter[VALUE_KEY]
+                values.append((lookup, value))
+                children.append((self.LEAF, _filter[FIELD_KEY], lookup, self.dialect.value_shape(lookup, value)))
+
+        return (self.NODE, l_object.connector, l_object.negated, tuple(children))
+
+    def _compile(self, shape, in_negation=False):
+        """
+        Compile the shape of a lookup into SQL.
+
+        Leaves under an odd number of negations that are NULL for NULL
+        columns are guarded with `IS NOT NULL`, so the negation includes the
+        NULL rows.
+        """
+        _, connector, negated, children = shape
+        in_negation = in_negation != negated
+        dialect = self.dialect
+        parts = []
+        for child in children:
+            if child[0] == self.NODE:
+                parts.append('(%s)' % self._compile(child, in_negation))
+                continue
+
+            _, field, lookup, value_shape = child
+            column = dialect.column(field)
+            sql = dialect.lookup(column, lookup, value_shape)
+            if in_negation and dialect.nullable(lookup, value_shape):
+                sql = '(%s AND %s IS NOT NULL)' % (sql, column)
+            parts.append(sql)
+
+        if not parts:
+            sql = '1 = 1' if connector == L.AND else '1 = 0'
+        else:
+            sql = self.CONNECTOR_MAP[connector].join(parts)
+
+        if negated:
+            return 'NOT (%s)' % sql
+        return sql
+
+
+_iso_week = None
+
+
+def iso_week(column):
+    """
+    Get a SQLAlchemy expression for the ISO week of a date column.
+
+    `extract('week', column)` is not the ISO week on every database, the
+    expression is compiled per dialect instead.
+
+    Args:
+        column (ColumnElement): The date or datetime column.
+
+    Returns:
+        ColumnElement: The integer ISO week expression.
+    """
+    global _iso_week
+    if _iso_week is None:
+        # Lazy import to avoid conflicts when not using SQLAlchemy.
+        from sqlalchemy import Integer
+        from sqlalchemy.ext.compiler import compiles
+        from sqlalchemy.sql.functions import FunctionElement
+
+        class IsoWeek(FunctionElement):
+            name = 'iso_week'
+            type = Integer()
+            inherit_cache = True
+
+        @compiles(IsoWeek)
+        def compile_iso_week(element, compiler, **kw):
+            return SQLDialect().date_part(WEEK, compiler.process(element.clauses, **kw))
+
+        @compiles(IsoWeek, 'sqlite')
+        def compile_sqlite_iso_week(element, compiler, **kw):
+            return SQLiteDialect().date_part(WEEK, compiler.process(element.clauses, **kw))
+
+        @compiles(IsoWeek, 'mysql')
+        def compile_mysql_iso_week(element, compiler, **kw):
+            # Mode 3 is the ISO week, starting on Monday.
+            return 'WEEK(%s, 3)' % compiler.process(element.clauses, **kw)
+
+        _iso_week = IsoWeek
+
+    return _iso_week(column)
+
+
+class SQLAlchemySerializer(object):
+    """
+    Class for (de)serializing L dict or L json to SQLAlchemy Core expressions.
+
+    Values are always bound as parameters and nested nodes with the same
+    connector are flattened, so lookups with the same shape produce the same
+    statement structure and hit the compiled statement cache of SQLAlchemy.
+    """
+    TEXT_METHODS = {
+        CONTAINS: 'contains',
+        ICONTAINS: 'contains',
+        STARTSWITH: 'startswith',
+        ISTARTSWITH: 'startswith',
+        ENDSWITH: 'endswith',
+        IENDSWITH: 'endswith',
+    }
+
+    OPERATORS = {
+        GT: operator.gt,
+        LT: operator.lt,
+        GTE: operator.ge,
+        LTE: operator.le,
+    }
+
+    DATE_PARTS = [YEAR, MONTH, WEEK, DAY, HOUR, MINUTE, SECOND]
+
+    def __init__(self, table):
+        """
+        Args:
+            table (Table): The SQLAlchemy table with the columns to filter on.
+        """
+        self.table = table
+
+    def from_json(self, json_string):
+        """
+        Load a json string into a SQLAlchemy expression.
+
+        Args:
+            json_string (string): A valid json string.
+
+        Returns:
+            ColumnElement: SQLAlchemy boolean expression.
+        """
+        return self.deserialize(L.from_json(json_string))
+
+    def deserialize(self, l_object):
+        """
+        Deserialize a lookup into a SQLAlchemy expression.
+
+        Args:
+            l_object (LookupNode): The L object to deserialize.
+
+        Returns:
+            ColumnElement: SQLAlchemy boolean expression.
+        """
+        # Lazy import to avoid conflicts when not using this serializer.
+        from sqlalchemy import and_, false, not_, or_, true
+
+        clauses = [self._convert(_filter) for _filter in self._flatten(l_object, l_object.connector)]
+
+        if l_object.connector == L.OR:
+            expression = or_(*clauses) if clauses else false()
+        else:
+            expression = and_(*clauses) if clauses else true()
+
+        if l_object.negated:
+            return not_(expression)
+        return expression
+
+    def _flatten(self, l_object, connector):
+        """
+        Get the filters of a node, merging children with the same connector.
+        """
+        for _filter in l_object.filters:
+            if isinstance(_filter, LookupNode) and not _filter.negated and (
+                    _filter.connector == connector or len(_filter) == 1):
+                for child in self._flatten(_filter, connector):
+                    yield child
+            else:
+                yield _filter
+
+    def _convert(self, _filter):
+        if isinstance(_filter, LookupNode):
+            return self.deserialize(_filter)
+        return self._convert_filter(_filter)
+
     def _convert_filter(self, filter_dict):
         """
-        Function to convert the L format of a filter to the django Q format
-        of a filter.
+        Function to convert the L format of a filter to a SQLAlchemy expression.
 
         Args:
             filter_dict (dict): Dict with the filter keys and values.
 
         Returns:
-            tuple: With the lookup and the value.
+            ColumnElement: SQLAlchemy boolean expression.
         """
-        field = filter_dict[FIELD_KEY]
+        from sqlalchemy import extract, func
+
+        column = self.table.c[filter_dict[FIELD_KEY]]
         value = filter_dict[VALUE_KEY]
         lookup = filter_dict[LOOKUP_KEY]
+
         if lookup == EXACT:
-            lookup = ''
+            return column.is_(None) if value is None else column == value
+        if lookup == IEXACT:
+            return column.is_(None) if value is None else func.lower(column) == ('%s' % value).lower()
+        if lookup == ISNULL:
+            return column.is_(None) if value else column.isnot(None)
+        if lookup == IN:
+            return column.in_(list(value))
+        if lookup in self.OPERATORS:
+            return self.OPERATORS[lookup](column, value)
+        if lookup == WEEK:
+            return iso_week(column) == value
+        if lookup in self.DATE_PARTS:
+            return extract(lookup, column) == value
+
+        value = '%s' % value
+        if lookup in (ICONTAINS, ISTARTSWITH, IENDSWITH):
+            column = func.lower(column)
+            value = value.lower()
+        return getattr(column, self.TEXT_METHODS[lookup])(value, autoescape=True)
+
+
+class MongoSerializer(object):
+    """
+    Class for compiling L dict or L json to a MongoDB query document.
+
+    Filters on the same field in an `and` are merged into a single field
+    document and `exact` and `in` filters on the same field in an `or` into a
+    single `$in`, so the database can use an index on the field. Date part
+    lookups compile to `$expr` with the date operators of the aggregation
+    pipeline, `__` in fields is the `.` of an embedded document.
+    """
+    OPERATORS = {
+        EXACT: '$eq',
+        GT: '$gt',
+        LT: '$lt',
+        GTE: '$gte',
+        LTE: '$lte',
+    }
+
+    TEXT_PATTERNS = {
+        CONTAINS: '%s',
+        ICONTAINS: '%s',
+        STARTSWITH: '^%s',
+        ISTARTSWITH: '^%s',
+        ENDSWITH: '%s$',
+        IENDSWITH: '%s$',
+        IEXACT: '^%s$',
+    }
+
+    CASE_INSENSITIVE = [ICONTAINS, ISTARTSWITH, IENDSWITH, IEXACT]
+
+    DATE_OPERATORS = {
+        YEAR: '$year',
+        MONTH: '$month',
+        WEEK: '$isoWeek',
+        DAY: '$dayOfMonth',
+        HOUR: '$hour',
+        MINUTE: '$minute',
+        SECOND: '$second',
+    }
+
+    # Matches no documents, `$or` needs at least one clause.
+    MATCH_NONE = {'$expr': False}
+
+    def from_json(self, json_string):
+        """
+        Load a json string into a MongoDB query document.
+
+        Args:
+            json_string (string): A valid json string.
+
+        Returns:
+            dict: The query document.
+        """
+        return self.deserialize(L.from_json(json_string))
+
+    def deserialize(self, l_object):
+        """
+        Compile a lookup into a MongoDB query document.
+
+        Args:
+            l_object (LookupNode): The L object to compile.
+
+        Returns:
+            dict: The query document.
+        """
+        documents = [self._convert(_filter) for _filter in self._flatten(l_object, l_object.connector)]
+
+        if l_object.connector == L.OR:
+            document = self._or(documents)
         else:
-            lookup = '%s%s' % (self.DJANGO_SUFFIX_DELIMITER, lookup)
+            document = self._and(documents)
+
+        if not l_object.negated:
+            return document
+        if not document:
+            return dict(self.MATCH_NONE)
+        if list(document) == ['$or']:
+            return {'$nor': document['$or']}
+        return {'$nor': [document]}
+
+    def _flatten(self, l_object, connector):
+        """
+        Get the filters of a node, merging children with the same connector.
+        """
+        for _filter in l_object.filters:
+            if isinstance(_filter, LookupNode) and not _filter.negated and (
+                    _filter.connector == connector or len(_filter) == 1):
+                for child in self._flatten(_filter, connector):
+                    yield child
+            else:
+                yield _filter
+
+    def _convert(self, _filter):
+        if isinstance(_filter, LookupNode):
+            return self.deserialize(_filter)
+        return self._convert_filter(_filter)
+
+    def _and(self, documents):
+        """
+        Combine the documents of the children of an `and` node, merging the
+        conditions on the same field when their operators are different.
+        """
+        merged = {}
+        clauses = []
+        for document in documents:
+            if all(self._can_merge(key, merged.get(key), condition) for key, condition in document.items()):
+                for key, condition in document.items():
+                    merged[key] = dict(merged[key], **condition) if key in merged else condition
+            else:
+                clauses.append(document)
+
+        if not clauses:
+            return merged
+        return {'$and': [merged] + clauses if merged else clauses}
+
+    def _can_merge(self, key, merged, condition):
+        if merged is None:
+            return True
+        return (
+            not key.startswith('$') and isinstance(merged, dict) and isinstance(condition, dict) and
+            not set(merged).intersection(condition)
+        )
+
+    def _in_values(self, document):
+        """
+        Get the field and values of a document that is a single `$eq` or `$in`.
+        """
+        if len(document) != 1:
+            return None
+        (field, condition), = document.items()
+        if field.startswith('$') or not isinstance(condition, dict) or len(condition) != 1:
+            return None
+        if '$eq' in condition:
+            return field, [condition['$eq']]
+        if '$in' in condition:
+            return field, list(condition['$in'])
+        return None
+
+    def _or(self, documents):
+        """
+        Combine the documents of the children of an `or` node, merging the
+        `$eq` and `$in` conditions on the same field into a single `$in`.
+        """
+        if not documents:
+            return dict(self.MATCH_NONE)
+
+        clauses = []
+        in_clauses = {}
+        for document in documents:
+            in_values = self._in_values(document)
+            if in_values is None:
+                clauses.append(document)
+                continue
+
+            field, values = in_values
+            if field not in in_clauses:
+                in_clauses[field] = (len(clauses), values)
+                clauses.append(document)
+            else:
+                index, merged_values = in_clauses[field]
+                merged_values.extend(values)
+                clauses[index] = {field: {'$in': merged_values}}
+
+        if len(clauses) == 1:
+            return clauses[0]
+        return {'$or': clauses}
+
+    def field(self, field):
+        """
+        Get the path of a field, `__` separates embedded documents.
+        """
+        return field.replace('__', '.')
+
+    def convert_value(self, value):
+        """
+        Convert a value to a type that can be stored in BSON, dates are
+        compared as datetimes at midnight.
+        """
+        if isinstance(value, date) and not isinstance(value, datetime):
+            return datetime.combine(value, time())
+        return value
+
+    def _convert_filter(self, filter_dict):
+        """
+        Function to convert the L format of a filter to a query document.
 
-        django_lookup = '%s%s' % (field, lookup)
+        Args:
+            filter_dict (dict): Dict with the filter keys and values.
+
+        Returns:
+            dict: The query document of the filter.
+        """
+        field = self.field(filter_dict[FIELD_KEY])
+        lookup = filter_dict[LOOKUP_KEY]
+        value = filter_dict[VALUE_KEY]
 
-        return (django_lookup, value)
+        if lookup == ISNULL:
+            return {field: {'$eq' if value else '$ne': None}}
+        if lookup == IN:
+            return {field: {'$in': [self.convert_value(item) for item in value]}}
+        if lookup in self.DATE_OPERATORS:
+            return {'$expr': {'$eq': [{self.DATE_OPERATORS[lookup]: '$%s' % field}, value]}}
+        if lookup in self.TEXT_PATTERNS and value is not None:
+            condition = {'$regex': self.TEXT_PATTERNS[lookup] % re.escape('%s' % value)}
+            if lookup in self.CASE_INSENSITIVE:
+                condition['$options'] = 'i'
+            return {field: condition}
+        # Like `exact`, `iexact` with None is a null check.
+        return {field: {self.OPERATORS.get(lookup, '$eq'): self.convert_value(value)}}
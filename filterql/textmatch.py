@@ -0,0 +1,239 @@
+from collections import deque
+
+from .evaluators import get_field_value, MATCHERS
+from .lookup import FIELD_KEY, LOOKUP_KEY, LookupNode, VALUE_KEY
+from .lookup_types import CONTAINS, ENDSWITH, ICONTAINS, IENDSWITH, ISTARTSWITH, STARTSWITH
+
+
+# Lookup types that can be answered by the automaton with the match kind
+# and whether the text is case folded.
+TEXT_LOOKUPS = {
+    CONTAINS: (CONTAINS, False),
+    STARTSWITH: (STARTSWITH, False),
+    ENDSWITH: (ENDSWITH, False),
+    ICONTAINS: (CONTAINS, True),
+    ISTARTSWITH: (STARTSWITH, True),
+    IENDSWITH: (ENDSWITH, True),
+}
+
+
+class AhoCorasick(object):
+    """
+    Automaton that finds all occurrences of a set of patterns in a single
+    pass over a text.
+    """
+    def __init__(self, patterns):
+        """
+        Build the trie with failure links for the patterns.
+
+        Args:
+            patterns (list): The (non empty) strings to search for.
+        """
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(index)
+
+        # Breadth first so the failure state is always done before its use.
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state].extend(self._output[self._fail[next_state]])
+
+    def search(self, text):
+        """
+        Find all occurrences of the patterns in a text.
+
+        Args:
+            text (string): The text to search in.
+
+        Yields:
+            tuple: The index of the pattern and the position of the last
+                character of the occurrence.
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield index, position
+
+
+class _FieldPatterns(object):
+    """
+    The patterns of all text leaves on one field with the same case folding.
+    """
+    def __init__(self, fold):
+        self.fold = fold
+        self.patterns = []
+        self._indexes = {}
+        self._automaton_indexes = []
+        self.automaton = None
+
+    def add(self, pattern):
+        index = self._indexes.get(pattern)
+        if index is None:
+            index = self._indexes[pattern] = len(self.patterns)
+            self.patterns.append(pattern)
+        return index
+
+    def compile(self):
+        self.automaton = AhoCorasick(pattern for pattern in self.patterns if pattern)
+        self._automaton_indexes = [index for index, pattern in enumerate(self.patterns) if pattern]
+
+    def match(self, text):
+        """
+        Find which patterns occur anywhere, at the start and at the end.
+
+        Returns:
+            dict: Match kind to a set of pattern indexes.
+        """
+        found = {CONTAINS: set(), STARTSWITH: set(), ENDSWITH: set()}
+        if text is None:
+            return found
+
+        # Empty patterns match every text.
+        for index, pattern in enumerate(self.patterns):
+            if not pattern:
+                for indexes in found.values():
+                    indexes.add(index)
+
+        last = len(text) - 1
+        for automaton_index, position in self.automaton.search(text):
+            index = self._automaton_indexes[automaton_index]
+            found[CONTAINS].add(index)
+            if position == last:
+                found[ENDSWITH].add(index)
+            if position == len(self.patterns[index]) - 1:
+                found[STARTSWITH].add(index)
+
+        return found
+
+
+class TextMatcher(object):
+    """
+    Evaluation strategy for lookups with many text leaves.
+
+    All `contains`, `startswith` and `endswith` leaves (and their case
+    insensitive variants) on the same field are matched in a single pass
+    with an Aho-Corasick automaton. Field values are read and case folded
+    once per record instead of once per leaf.
+    """
+    def __init__(self, lookup):
+        """
+        Group the text leaves of the lookup and build the automatons.
+
+        Args:
+            lookup (LookupNode): The lookup to match records with.
+        """
+        self.lookup = lookup
+        self._groups = {}
+        self._leaves = {}
+        self._compile(lookup)
+
+        for group in self._groups.values():
+            group.compile()
+
+    def _compile(self, node):
+        for _filter in node.filters:
+            if isinstance(_filter, LookupNode):
+                self._compile(_filter)
+                continue
+
+            text_lookup = TEXT_LOOKUPS.get(_filter[LOOKUP_KEY])
+            if text_lookup is None or _filter[VALUE_KEY] is None:
+                continue
+
+            kind, fold = text_lookup
+            key = (_filter[FIELD_KEY], fold)
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = _FieldPatterns(fold)
+
+            pattern = '%s' % _filter[VALUE_KEY]
+            index = group.add(pattern.lower() if fold else pattern)
+            self._leaves[id(_filter)] = (key, kind, index)
+
+    def _text_matches(self, record, key, cache):
+        """
+        Run the automaton of a group once per record.
+        """
+        found = cache.get(key)
+        if found is None:
+            field, fold = key
+            text = cache.get(field, cache)
+            if text is cache:
+                value = get_field_value(record, field)
+                text = cache[field] = None if value is None else '%s' % value
+            if fold and text is not None:
+                text = text.lower()
+            found = cache[key] = self._groups[key].match(text)
+        return found
+
+    def _evaluate(self, node, record, cache):
+        results = (
+            self._evaluate(_filter, record, cache) if isinstance(_filter, LookupNode)
+            else self._match_filter(_filter, record, cache)
+            for _filter in node.filters
+        )
+
+        if node.connector == LookupNode.OR:
+            result = any(results)
+        else:
+            result = all(results)
+
+        return result != node.negated
+
+    def _match_filter(self, filter_dict, record, cache):
+        leaf = self._leaves.get(id(filter_dict))
+        if leaf is None:
+            match = MATCHERS[filter_dict[LOOKUP_KEY]]
+            return match(get_field_value(record, filter_dict[FIELD_KEY]), filter_dict[VALUE_KEY])
+
+        key, kind, index = leaf
+        return index in self._text_matches(record, key, cache)[kind]
+
+    def matches(self, record):
+        """
+        Check whether a record matches the lookup.
+
+        Args:
+            record (dict|object): The record to match.
+
+        Returns:
+            bool: True when the record matches the lookup.
+        """
+        return self._evaluate(self.lookup, record, {})
+
+    def filter(self, records):
+        """
+        Filter an iterable of records with the lookup.
+
+        Args:
+            records (iterable): The records to filter.
+
+        Returns:
+            list: The records matching the lookup.
+        """
+        return [record for record in records if self.matches(record)]
@@ -1,9 +1,16 @@
-from datetime import date, datetime
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from timeit import default_timer
 import traceback
+import uuid
 
 from dateutil import parser
 import simplejson as json
 
+from . import instrumentation
 from .exceptions import DecodeException
 
 
@@ -20,14 +27,221 @@ class TypeEncoder(json.JSONEncoder):
         Args:
             obj: The obj of a unknown JSON type.
         """
-        encode = ENCODERS.get(type(obj))
+        obj_type = type(obj)
+        encode = ENCODERS.get(obj_type) or _SUBCLASS_ENCODERS.get(obj_type)
+
+        if encode is None:
+            encode = _SUBCLASS_ENCODERS[obj_type] = _subclass_encoder(obj_type)
 
         if encode:
             return encode(obj)
+        # Compact `in` values are sent as plain lists.
+        if isinstance(obj, (SortedValues, frozenset, set)):
+            return list(obj)
         # Let the base class default method raise the TypeError
         return json.JSONEncoder.default(self, obj)
 
 
+# Encoders of subclasses of the ENCODERS types, False for other types.
+_SUBCLASS_ENCODERS = {}
+
+
+def _subclass_encoder(obj_type):
+    """
+    Get the encoder of the closest base class in the ENCODERS.
+    """
+    for base in obj_type.__mro__[1:]:
+        if base in ENCODERS:
+            return ENCODERS[base]
+    return False
+
+
+class LRUCache(object):
+    """
+    Size limited cache that evicts the least recently used entry and counts
+    its hits and misses.
+    """
+    def __init__(self, maxsize=128, on_evict=None):
+        """
+        Args:
+            maxsize (int): The maximum number of entries.
+            on_evict (callable): Called with the key and value of every entry
+                evicted to make room.
+        """
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        """
+        Get an entry and mark it as recently used.
+
+        Args:
+            key: The hashable key of the entry.
+            default: The value returned when there is no entry.
+
+        Returns:
+            The cached value or the default.
+        """
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self._data[key] = value
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """
+        Add an entry, evicting the least recently used entry when full.
+        """
+        self._data.pop(key, None)
+        self._data[key] = value
+        while len(self._data) > self.maxsize:
+            evicted = self._data.popitem(last=False)
+            if self.on_evict is not None:
+                self.on_evict(*evicted)
+
+    def peek(self, key, default=None):
+        """
+        Get an entry without marking it as used or counting it.
+        """
+        return self._data.get(key, default)
+
+    def pop(self, key, default=None):
+        """
+        Remove an entry and return its value or the default.
+        """
+        return self._data.pop(key, default)
+
+    def items(self):
+        """
+        Get the keys and values from the least to the most recently used.
+        """
+        return list(self._data.items())
+
+    def clear(self):
+        """
+        Remove all entries and reset the counters.
+        """
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        """
+        The fraction of lookups that were a hit.
+        """
+        total = self.hits + self.misses
+        return float(self.hits) / total if total else 0.0
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SortedValues(object):
+    """
+    Sorted values without duplicates with O(log n) membership tests.
+
+    Integers and floats are stored in a typed array, other values in a tuple.
+    """
+    __slots__ = ('values',)
+
+    def __init__(self, values, typecode=None):
+        """
+        Args:
+            values (iterable): Values of a single type that can be ordered.
+            typecode (string): The `array` typecode for numbers, a tuple is
+                used when None.
+
+        Raises:
+            TypeError: When the values can not be ordered, like NaN.
+            OverflowError: When a value does not fit the typecode.
+        """
+        values = sorted(set(values))
+        # Values that are not ordered after sorting break the binary search.
+        if not all(a < b for a, b in zip(values, values[1:])):
+            raise TypeError('Values can not be ordered')
+        self.values = array(typecode, values) if typecode else tuple(values)
+
+    def __contains__(self, value):
+        values = self.values
+        try:
+            index = bisect_left(values, value)
+        except TypeError:
+            return False
+        return index < len(values) and values[index] == value
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __eq__(self, other):
+        return isinstance(other, SortedValues) and self.values == other.values
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'SortedValues(%r)' % (list(self.values),)
+
+
+# Array typecodes for `in` values of a single numeric type.
+ARRAY_TYPECODES = {
+    int: 'q',
+    float: 'd',
+}
+
+
+def compact_values(values):
+    """
+    Store the values of an `in` lookup compactly with fast membership tests.
+
+    Values of a single type that can be ordered are sorted, in a typed array
+    for integers and floats. Other values that can be hashed, like NaN, are
+    stored in a frozenset. The types of the values are checked in one pass.
+
+    Args:
+        values (iterable): The values of an `in` lookup.
+
+    Returns:
+        SortedValues|frozenset|iterable: The compact values, or the given
+            values when they can not be iterated or hashed.
+    """
+    if isinstance(values, (SortedValues, frozenset)):
+        return values
+    try:
+        if not hasattr(values, '__len__'):
+            values = list(values)
+        types = set(map(type, values))
+    except TypeError:
+        return values
+
+    if len(types) == 1:
+        try:
+            return SortedValues(values, ARRAY_TYPECODES.get(types.pop()))
+        except (ArithmeticError, TypeError):
+            pass
+
+    try:
+        return frozenset(values)
+    except TypeError:
+        return values
+
+
 def type_decoder(dct):
     """
     Decodes a value if there is a type given for the value.
@@ -48,15 +262,67 @@ def type_decoder(dct):
     if value_type:
         decode = DECODERS.get(value_type)
         if decode:
+            active = instrumentation.active
+            start = default_timer() if active is not None else None
             try:
-                dct[VALUE_KEY] = decode(dct[VALUE_KEY])
+                value = dct[VALUE_KEY]
+                # The values of `in` lookups are decoded one by one.
+                if isinstance(value, list):
+                    dct[VALUE_KEY] = [decode(item) for item in value]
+                else:
+                    dct[VALUE_KEY] = decode(value)
             except:
                 trace = traceback.format_exc()
                 raise DecodeException(
                     'Error decoding type `%s` %s\n%s' % (value_type, dct[VALUE_KEY], trace))
+            if active is not None:
+                active.on_decode(value_type, default_timer() - start)
     return dct
 
 
+def encoded_type(value):
+    """
+    Get the `_type` of a value that needs a type to be decoded.
+
+    Lists and tuples of values of a single type (like the values of an `in`
+    lookup) get the type of their values. Subclasses get the type of their
+    closest base class, like they are encoded by `TypeEncoder`.
+
+    Args:
+        value: The value of a filter.
+
+    Returns:
+        string: The name of the type or None when no type is needed.
+    """
+    value_type = type(value)
+    name = _type_name(value_type)
+    if name:
+        return name
+
+    if (value_type is list or value_type is tuple) and value:
+        names = set(map(_type_name, set(map(type, value))))
+        if len(names) == 1:
+            return names.pop() or None
+    return None
+
+
+# The `_type` of every type seen by `encoded_type`, False for other types.
+_TYPE_NAMES = {}
+
+
+def _type_name(value_type):
+    """
+    Get the `_type` of a type, the name of its closest base class that is
+    decoded.
+    """
+    name = _TYPE_NAMES.get(value_type)
+    if name is None:
+        name = _TYPE_NAMES[value_type] = next((
+            base.__name__ for base in value_type.__mro__ if base in ENCODERS or base in NATIVE_TYPES
+        ), False)
+    return name
+
+
 def decode_date(date_string):
     """
     Decode a date string into a python date.
@@ -72,7 +338,8 @@ def decode_date(date_string):
 
 def decode_datetime(datetime_string):
     """
-    Decode a datetime string into a python datetime.
+    Decode a datetime string into a python datetime, aware when the string
+    has an offset.
 
     Args:
         datetime_string (string): The string containing the datetime.
@@ -83,12 +350,46 @@ def decode_datetime(datetime_string):
     return parser.parse(datetime_string, fuzzy=False)
 
 
+def decode_time(time_string):
+    """
+    Decode a time string into a python time, aware when the string has an
+    offset.
+    """
+    return parser.parse(time_string, fuzzy=False).timetz()
+
+
+def decode_timedelta(seconds):
+    """
+    Decode a number of seconds into a python timedelta.
+    """
+    return timedelta(microseconds=int(Decimal('%s' % seconds).scaleb(6)))
+
+
+def encode_timedelta(value):
+    """
+    Encode a timedelta as its exact number of seconds.
+    """
+    return Decimal(value.days * 86400 + value.seconds) + Decimal(value.microseconds).scaleb(-6)
+
+
 DECODERS = {
     date.__name__: decode_date,
     datetime.__name__: decode_datetime,
+    time.__name__: decode_time,
+    timedelta.__name__: decode_timedelta,
+    uuid.UUID.__name__: uuid.UUID,
+    Decimal.__name__: lambda value: Decimal('%s' % value),
 }
 
+# Encoders by exact type, the type of a value is looked up once.
 ENCODERS = {
-    date: lambda x: x.isoformat(),
-    datetime: lambda x: x.isoformat(),
+    date: date.isoformat,
+    datetime: datetime.isoformat,
+    time: time.isoformat,
+    timedelta: encode_timedelta,
+    uuid.UUID: str,
 }
+
+# Types dumped by simplejson itself that need a type to be decoded, Decimal
+# is dumped as a number with `use_decimal` and would be loaded as a float.
+NATIVE_TYPES = (Decimal,)
@@ -1,4 +1,4 @@
-from .lookup_types import DAY, HOUR, ISNULL, MINUTE, MONTH, SECOND, WEEK
+from .lookup_types import DAY, HOUR, IN, ISNULL, MINUTE, MONTH, SECOND, WEEK
 from .exceptions import InvalidValueException
 
 
@@ -55,6 +55,15 @@ def isnull_validator(value):
             'Only True or False allowed for ISNULL lookup type.')
 
 
+def in_validator(values):
+    if isinstance(values, (str, bytes, dict)) or not hasattr(values, '__iter__'):
+        raise InvalidValueException('Value needs to be a list of values for IN lookup type.')
+
+    # Check every type once instead of every value.
+    if any(issubclass(value_type, (list, dict, set)) for value_type in set(map(type, values))):
+        raise InvalidValueException('Values of IN lookup type can not be lists, dicts or sets.')
+
+
 VALIDATORS = {
     # Date/time related validators.
     MONTH: month_validator,
@@ -65,5 +74,6 @@ VALIDATORS = {
     SECOND: second_validator,
 
     # Miscellaneous validators.
+    IN: in_validator,
     ISNULL: isnull_validator,
 }
@@ -0,0 +1,229 @@
+from .evaluators import get_field_value, MATCHERS
+from .lookup import FIELD_KEY, LOOKUP_KEY, LookupNode, VALUE_KEY
+
+
+class MaterializedView(object):
+    """
+    Set of records matching a lookup that is kept up to date incrementally.
+
+    Every record keeps the result of each leaf and a count of the matching
+    children of each node. A change only re-evaluates the leaves on the
+    changed fields and propagates the difference up the tree, so the full
+    lookup is never evaluated again after the initial insert.
+    """
+    def __init__(self, lookup, records=None, key=None):
+        """
+        Compile the lookup and materialize the given records.
+
+        Args:
+            lookup (LookupNode): The lookup the view is bound to.
+            records (iterable): The initial records of the collection.
+            key (callable): Function returning the unique key of a record,
+                defaults to `id` on dicts and objects.
+        """
+        self.lookup = lookup
+        self.key = key or (lambda record: get_field_value(record, 'id'))
+
+        # Compiled lookup, all nodes are stored in post-order so the root is
+        # always the last node.
+        self._leaves = []
+        self._leaf_parents = []
+        self._nodes = []
+        self._node_parents = []
+        self._field_leaves = {}
+        self._compile(lookup, None)
+
+        self._states = {}
+        self._matches = {}
+        self._listeners = []
+
+        for record in records or []:
+            self.insert(record)
+
+    def _compile(self, node, parent):
+        """
+        Flatten a node and its children into the leaf and node lists.
+
+        Args:
+            node (LookupNode): The node to compile.
+            parent (int): The index of the parent node or None for the root.
+
+        Returns:
+            int: The index of the compiled node.
+        """
+        leaf_indexes = []
+        node_indexes = []
+
+        for _filter in node.filters:
+            if isinstance(_filter, LookupNode):
+                node_indexes.append(self._compile(_filter, None))
+            else:
+                index = len(self._leaves)
+                field = _filter[FIELD_KEY]
+                self._leaves.append((field, MATCHERS[_filter[LOOKUP_KEY]], _filter[VALUE_KEY]))
+                self._leaf_parents.append(None)
+                self._field_leaves.setdefault(field, []).append(index)
+                leaf_indexes.append(index)
+
+        index = len(self._nodes)
+        self._nodes.append((node.connector == LookupNode.OR, node.negated, len(node.filters)))
+        self._node_parents.append(parent)
+
+        for leaf_index in leaf_indexes:
+            self._leaf_parents[leaf_index] = index
+        for node_index in node_indexes:
+            self._node_parents[node_index] = index
+
+        return index
+
+    @property
+    def fields(self):
+        """
+        The fields referenced by the lookup.
+        """
+        return set(self._field_leaves)
+
+    def _node_value(self, index, count):
+        is_or, negated, size = self._nodes[index]
+        value = count > 0 if is_or else count == size
+        return value != negated
+
+    def _snapshot(self, record):
+        return dict((field, get_field_value(record, field)) for field in self._field_leaves)
+
+    def _build_state(self, snapshot):
+        """
+        Evaluate all leaves and nodes for a snapshot of a record.
+        """
+        leaf_results = [match(snapshot[field], value) for field, match, value in self._leaves]
+        counts = [0] * len(self._nodes)
+        node_results = [False] * len(self._nodes)
+
+        for index, result in enumerate(leaf_results):
+            if result:
+                counts[self._leaf_parents[index]] += 1
+
+        # Post-order guarantees children are final before their parents.
+        for index in range(len(self._nodes)):
+            node_results[index] = self._node_value(index, counts[index])
+            parent = self._node_parents[index]
+            if parent is not None and node_results[index]:
+                counts[parent] += 1
+
+        return [snapshot, leaf_results, counts, node_results]
+
+    def _propagate(self, state, parent, delta):
+        """
+        Propagate a changed child result up the tree.
+        """
+        _, _, counts, node_results = state
+        while parent is not None and delta:
+            counts[parent] += delta
+            value = self._node_value(parent, counts[parent])
+            if value == node_results[parent]:
+                return
+            node_results[parent] = value
+            delta = 1 if value else -1
+            parent = self._node_parents[parent]
+
+    def add_listener(self, listener):
+        """
+        Register a listener for changes of the matching set.
+
+        Args:
+            listener (callable): Called with a list of added and a list of
+                removed records each time the matching set changes.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """
+        Unregister a previously added listener.
+        """
+        self._listeners.remove(listener)
+
+    def _notify(self, added, removed):
+        for listener in self._listeners:
+            listener(added, removed)
+
+    def _set_match(self, key, record, matches):
+        """
+        Update the matching set for a record and notify listeners.
+        """
+        matched = key in self._matches
+        if matches:
+            self._matches[key] = record
+            if not matched:
+                self._notify([record], [])
+        elif matched:
+            removed = self._matches.pop(key)
+            self._notify([], [removed])
+
+    def insert(self, record):
+        """
+        Add a record to the collection.
+
+        Args:
+            record (dict|object): The record to add.
+        """
+        key = self.key(record)
+        if key in self._states:
+            raise KeyError('Record with key `%s` already exists' % key)
+
+        state = self._build_state(self._snapshot(record))
+        self._states[key] = state
+        self._set_match(key, record, state[3][-1])
+
+    def update(self, record, fields=None):
+        """
+        Update a record in the collection.
+
+        Only the leaves on the changed fields are evaluated again.
+
+        Args:
+            record (dict|object): The new version of the record.
+            fields (iterable): The names of the changed fields, when not
+                given the changed fields are detected from the record.
+        """
+        key = self.key(record)
+        state = self._states[key]
+        snapshot, leaf_results = state[0], state[1]
+
+        detect = fields is None
+        for field in self._field_leaves if detect else fields:
+            indexes = self._field_leaves.get(field)
+            if not indexes:
+                continue
+            value = get_field_value(record, field)
+            if detect and value == snapshot[field]:
+                continue
+            snapshot[field] = value
+
+            for index in indexes:
+                _, match, lookup_value = self._leaves[index]
+                result = match(value, lookup_value)
+                if result != leaf_results[index]:
+                    leaf_results[index] = result
+                    self._propagate(state, self._leaf_parents[index], 1 if result else -1)
+
+        self._set_match(key, record, state[3][-1])
+
+    def delete(self, record):
+        """
+        Remove a record from the collection.
+
+        Args:
+            record (dict|object): The record to remove.
+        """
+        key = self.key(record)
+        del self._states[key]
+        self._set_match(key, record, False)
+
+    def __contains__(self, record):
+        return self.key(record) in self._matches
+
+    def __iter__(self):
+        return iter(list(self._matches.values()))
+
+    def __len__(self):
+        return len(self._matches)
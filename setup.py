@@ -25,6 +25,8 @@ tests_require = [
     'pytest-cov>=2.4.0',
     'pytest-flake8>=0.8.1',
     'django>=1.8.0',
+    'sqlalchemy>=1.4.0',
+    'numpy>=1.17.0',
 ]
 
 setup(
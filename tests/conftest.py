@@ -0,0 +1,14 @@
+import django
+from django.conf import settings
+
+
+def pytest_configure():
+    """
+    Configure Django with an in memory sqlite database for the tests.
+    """
+    if not settings.configured:
+        settings.configure(
+            DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+            INSTALLED_APPS=[],
+        )
+        django.setup()
@@ -0,0 +1,179 @@
+from datetime import date, datetime
+
+from filterql import (CONTAINS, ENDSWITH, GT, GTE, ICONTAINS, IEXACT, IN, ISNULL, ISTARTSWITH, L, LT, LTE, MONTH,
+                      STARTSWITH, YEAR)
+from filterql.analysis import field_domain, Interval, IntervalSet, leaf_domain
+
+
+def test_interval_set_operations():
+    """
+    Test union, intersection and complement of interval sets.
+    """
+    first = IntervalSet.range(1, 5)
+    second = IntervalSet.range(3, 8, lower_closed=False, upper_closed=True)
+
+    assert first.union(second).intervals == [Interval(1, True, 8, True)]
+    assert first.intersection(second).intervals == [Interval(3, False, 5, False)]
+    assert first.complement().intervals == [Interval(None, False, 1, False), Interval(5, True, None, False)]
+    assert first.complement().null
+    assert first.complement().complement() == first
+
+    # Touching intervals merge, intervals with a gap of one value do not.
+    assert IntervalSet.range(1, 2).union(IntervalSet.range(2, 3)) == IntervalSet.range(1, 3)
+    gap = IntervalSet.range(1, 2).union(IntervalSet.range(2, 3, lower_closed=False))
+    assert len(gap.intervals) == 2
+    assert not gap.contains(2)
+    assert gap.contains(1)
+
+    assert IntervalSet.range(2, 2).is_empty()
+    assert IntervalSet.range(2, 2, upper_closed=True).values() == [2]
+    assert IntervalSet.universe().is_universe()
+    assert IntervalSet().complement().is_universe()
+    assert IntervalSet.points([3, 1, 3]).values() == [1, 3]
+    assert IntervalSet(null=True).values() == [None]
+    assert IntervalSet(null=True).contains(None)
+    assert first.values() is None
+    assert first.issubset(IntervalSet.range(0, 10))
+    assert not first.issubset(second)
+    assert first.overlaps(second)
+    assert first != second
+    assert repr(IntervalSet.points([1])) == 'IntervalSet([Interval(lower=1, lower_closed=True, upper=1, ' \
+        'upper_closed=True)], null=False)'
+
+
+def test_leaf_domain():
+    """
+    Test the values matching single filters.
+    """
+    def domain(value, lookup):
+        return leaf_domain(L('field', value, lookup=lookup).filters[0])
+
+    assert domain(5, 'exact').values() == [5]
+    assert domain(None, 'exact').values() == [None]
+    assert domain([3, 1], IN).values() == [1, 3]
+    assert domain(True, ISNULL).values() == [None]
+    assert domain(False, ISNULL) == IntervalSet.range()
+    assert domain(5, GT).intervals == [Interval(5, False, None, False)]
+    assert domain(5, GTE).intervals == [Interval(5, True, None, False)]
+    assert domain(5, LT).intervals == [Interval(None, False, 5, False)]
+    assert domain(5, LTE).intervals == [Interval(None, False, 5, True)]
+    assert domain('ab', STARTSWITH).intervals == [Interval('ab', True, 'ac', False)]
+    assert domain('ab', CONTAINS) is None
+
+
+def test_tenant_pruning():
+    """
+    Test getting the possible tenants of a lookup.
+    """
+    lookup = L('tenant', [1, 2, 3], lookup=IN) & (L('name', 'spindle') | L('tenant', 4))
+    assert field_domain(lookup, 'tenant').values() == [1, 2, 3]
+
+    lookup = (L('tenant', 1) | L('tenant', 4)) & ~L('tenant', 4)
+    assert field_domain(lookup, 'tenant').values() == [1]
+
+    # Other fields say nothing about the tenant.
+    lookup = L('tenant', 1) | L('name', 'spindle')
+    assert field_domain(lookup, 'tenant').is_universe()
+
+    lookup = ~(L('tenant', 1) | L('name', 'spindle'))
+    assert field_domain(lookup, 'tenant').contains(2)
+    assert not field_domain(lookup, 'tenant').contains(1)
+
+    lookup = ~(L('tenant', 1) & L('name', 'spindle'))
+    assert field_domain(lookup, 'tenant').is_universe()
+
+    lookup = L('tenant', 1) & L('tenant', 'a')
+    assert field_domain(lookup, 'tenant').is_universe()
+
+    lookup = L('tenant', [1, 'a'], lookup=IN)
+    assert field_domain(lookup, 'tenant').is_universe()
+
+    empty = L('tenant', 1)
+    empty.filters = []
+    assert field_domain(empty, 'tenant').is_universe()
+    empty.connector = L.OR
+    assert field_domain(empty, 'tenant').is_empty()
+
+
+def test_date_pruning():
+    """
+    Test pruning date partitions.
+    """
+    partitions = [IntervalSet.range(date(year, month, 1), date(year + month // 12, month % 12 + 1, 1))
+                  for year in (2019, 2020) for month in range(1, 13)]
+
+    def matching(lookup):
+        domain = field_domain(lookup, 'created')
+        return [index for index, partition in enumerate(partitions) if domain.overlaps(partition)]
+
+    assert matching(L('created', 2020, lookup=YEAR)) == list(range(12, 24))
+    assert matching(L('created', 2020, lookup=YEAR) & L('created', 3, lookup=MONTH)) == [14]
+    assert matching(L('created', date(2019, 11, 15), lookup=GTE) & L('created', date(2020, 1, 1), lookup=LTE)) == [
+        10, 11, 12]
+    assert matching(~L('created', 2019, lookup=YEAR) & L('created', date(2020, 2, 1), lookup=LT)) == [12]
+    assert matching(L('created', 3, lookup=MONTH)) == list(range(24))
+
+    domain = field_domain(L('created', 2020, lookup=YEAR), 'created', as_datetime=True)
+    assert domain.contains(datetime(2020, 12, 31, 23, 59))
+
+
+def test_implies_conjunctions():
+    """
+    Test implication of added leaves and disjunctions.
+    """
+    wide = L('status', 'active') & L('owner', 'spindle')
+    narrow = wide & L('country', 'netherlands')
+
+    assert narrow.implies(wide)
+    assert wide.contains(narrow)
+    assert not wide.implies(narrow)
+    assert narrow.implies(L('status', 'active') | L('name', 'devhouse'))
+    assert (L('status', 'active') | L('status', 'new')).implies(L('status', ['active', 'new', 'old'], lookup=IN))
+    assert not (L('status', 'active') | L('name', 'spindle')).implies(L('status', 'active'))
+    assert not L('status', 'active').implies(L('status', 'active') & L('name', 'spindle'))
+
+
+def test_implies_ranges():
+    """
+    Test implication of range bounds and `in` subsets.
+    """
+    assert L('count', 10, lookup=GT).implies(L('count', 5, lookup=GTE))
+    assert (L('count', 5, lookup=GTE) & L('count', 10, lookup=LTE)).implies(L('count', 3, lookup=GT))
+    assert (L('count', 5, lookup=GTE) & L('count', 10, lookup=LTE)).implies(
+        L('count', 0, lookup=GT) & L('count', 11, lookup=LT))
+    assert not L('count', 5, lookup=GTE).implies(L('count', 5, lookup=GT))
+    assert L('count', [1, 2], lookup=IN).implies(L('count', [1, 2, 3], lookup=IN))
+    assert not L('count', [1, 4], lookup=IN).implies(L('count', [1, 2, 3], lookup=IN))
+    assert L('count', 2).implies(L('count', [1, 2, 3], lookup=IN))
+    assert L('count', 2).implies(~L('count', 3))
+    assert not L('count', 2).implies(~L('count', 2))
+    assert L('count', False, lookup=ISNULL).contains(L('count', 2, lookup=GT))
+    assert not L('count', 'a').implies(L('count', 2, lookup=GT))
+
+
+def test_implies_text():
+    """
+    Test implication of text patterns.
+    """
+    assert L('name', 'spindle').implies(L('name', 'pin', lookup=CONTAINS))
+    assert L('name', 'spindle', lookup=STARTSWITH).implies(L('name', 'SPI', lookup=ISTARTSWITH))
+    assert L('name', 'Spindle', lookup=ICONTAINS).implies(L('name', 'pin', lookup=ICONTAINS))
+    assert L('name', 'spindle').implies(L('name', 'SPINDLE', lookup=IEXACT))
+    assert L('name', 'spindle', lookup=ENDSWITH).implies(L('name', 'dle', lookup=ENDSWITH))
+    assert not L('name', 'spindle', lookup=ICONTAINS).implies(L('name', 'pin', lookup=CONTAINS))
+    assert not L('name', 'spindle', lookup=CONTAINS).implies(L('name', 'spin', lookup=STARTSWITH))
+    assert not L('name', 'spindle', lookup=CONTAINS).implies(L('name', 'spindle', lookup=IEXACT))
+    assert not L('name', 1).implies(L('name', '1', lookup=CONTAINS))
+    assert not L('name', 'spindle').implies(L('other', 'pin', lookup=CONTAINS))
+
+
+def test_implies_date_parts():
+    """
+    Test implication of date part refinements.
+    """
+    year = L('created', 2020, lookup=YEAR)
+
+    assert (year & L('created', 3, lookup=MONTH)).implies(year)
+    assert (L('created', date(2020, 3, 1), lookup=GTE) & L('created', date(2020, 4, 1), lookup=LT)).implies(year)
+    assert not L('created', date(2020, 3, 1), lookup=GTE).implies(year)
+    assert not L('created', datetime(2020, 3, 1), lookup=GTE).implies(year)
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+from pytest import raises
+
+from filterql import GT, IN, L, LT, YEAR
+from filterql.batch import BatchEvaluator
+from filterql.dateparts import DatePartCache
+from filterql.evaluators import evaluate, filter_records
+
+
+RECORDS = [
+    {'id': number, 'tenant': number % 3, 'status': ['active', 'inactive', None][number % 3 - 1],
+     'created': datetime(2016 + number % 3, 1 + number % 12, 1)}
+    for number in range(30)
+]
+
+
+def _lookups():
+    tenant_window = L('tenant', 1) & L('created', datetime(2017, 1, 1), lookup=GT)
+    active = L('status', 'active')
+    return [
+        tenant_window & active,
+        active & tenant_window,
+        active | L('id', 5, lookup=LT),
+        ~(L('created', datetime(2017, 1, 1), lookup=GT) & L('tenant', 1)),
+        L('id', [1, 2, 3], lookup=IN) | (tenant_window & L('created', 2018, lookup=YEAR)),
+        L('id', [3, 2, 1], lookup=IN),
+        L('status', 'active') & L('status', 'active'),
+        L('id', 5),
+    ]
+
+
+def test_batch_evaluator():
+    """
+    Test that the batch evaluator gives the same results as the evaluators.
+    """
+    lookups = _lookups()
+    batch = BatchEvaluator(lookups)
+    expected = [filter_records(lookup, RECORDS) for lookup in lookups]
+
+    assert batch.filter(RECORDS) == expected
+    assert batch.filter(RECORDS, DatePartCache(RECORDS)) == expected
+    with raises(ValueError):
+        batch.filter(RECORDS[:], DatePartCache(RECORDS))
+    for record in RECORDS:
+        assert batch.evaluate(record) == [evaluate(lookup, record) for lookup in lookups]
+
+
+def test_shared_predicates():
+    """
+    Test that equal leaves and subtrees are shared.
+    """
+    batch = BatchEvaluator(_lookups())
+
+    # tenant, created gt, status, id lt, id in, year and id exact.
+    assert batch.leaf_count == 7
+    assert batch.roots[0] == batch.roots[1]
+    assert batch.roots[5] == batch.nodes.index(L('id', [1, 2, 3], lookup=IN).filters[0])
+    assert batch.roots[6] == batch.nodes.index(L('status', 'active').filters[0])
+
+    reads = []
+
+    class Record(dict):
+        def get(self, name, default=None):
+            reads.append(name)
+            return dict.get(self, name, default)
+
+    batch.evaluate(Record(RECORDS[1]))
+    assert len(reads) <= batch.leaf_count
+
+    # Columns are read once per field.
+    del reads[:]
+    batch.evaluate_mask([Record(record) for record in RECORDS])
+    assert sorted(reads) == sorted(['tenant', 'created', 'status', 'id'] * len(RECORDS))
+
+
+def test_value_types():
+    """
+    Test that filters with values that are encoded the same are not merged.
+    """
+    records = [{'created': datetime(2017, 1, 1)}, {'created': '2017-01-01T00:00:00'}]
+    text = L.from_dict({'_and': [{'_field': 'created', '_lookup': 'exact', '_value': '2017-01-01T00:00:00'}]})
+    lookups = [L('created', datetime(2017, 1, 1)), text]
+    batch = BatchEvaluator(lookups)
+
+    assert batch.leaf_count == 2
+    assert batch.evaluate_mask(records) == [[True, False], [False, True]]
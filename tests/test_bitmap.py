@@ -0,0 +1,75 @@
+from filterql import CONTAINS, GT, IN, ISNULL, L
+from filterql.bitmap import bitset, bitset_indexes, BitmapIndex
+from filterql.evaluators import filter_records
+
+
+RECORDS = [
+    {'id': index, 'status': status, 'country': country, 'count': index * 10 if index % 4 else None}
+    for index, (status, country) in enumerate([
+        ('active', 'nl'), ('inactive', 'nl'), ('active', 'de'), (None, 'be'), ('active', None),
+        ('new', 'nl'), ('inactive', 'de'), ('active', 'nl'), ('new', 'be'), ('active', 'de'),
+    ] * 3)
+]
+
+
+def test_bitset():
+    assert bitset([0, 3, 9], 10) == 0b1000001001
+    assert bitset_indexes(0b1000001001) == [0, 3, 9]
+    assert bitset_indexes(0) == []
+
+
+def test_bitmap_index():
+    """
+    Test that the bitmap index gives the same records as the evaluators.
+    """
+    index = BitmapIndex(RECORDS, ['status', 'country'])
+    assert index.cardinality('status') == 4
+
+    lookups = [
+        L('status', 'active'),
+        L('status', None),
+        L('status', 'unknown'),
+        L('status', ['active', 'new'], lookup=IN),
+        L('status', [], lookup=IN),
+        L('status', 'activ', lookup=IN, validate=False),
+        L('status', [['active']], lookup=IN, validate=False),
+        L('country', True, lookup=ISNULL),
+        L('country', False, lookup=ISNULL),
+        L('status', 'act', lookup=CONTAINS),
+        L('status', 'active') & L('country', 'nl'),
+        L('status', 'active') | L('country', 'be'),
+        ~L('status', 'active') & L('count', 50, lookup=GT),
+        L('count', 50, lookup=GT) | ~(L('status', 'new') | L('country', 'de')),
+        (L('status', 'active') & L('count', None)) | (L('country', 'nl') & ~L('count', 100, lookup=GT)),
+        L('count', 100, lookup=GT) & L('status', 'missing'),
+        ~(L('status', 'active') & L('country', 'nl')),
+        L('id', [1, 2], lookup=IN),
+    ]
+    for lookup in lookups:
+        expected = filter_records(lookup, RECORDS)
+        assert index.filter(lookup) == expected, lookup.to_dict()
+        assert index.where(lookup) == [record['id'] for record in expected]
+        assert index.count(lookup) == len(expected)
+
+
+def test_row_checks():
+    """
+    Test that leaves without an index are only checked for open rows.
+    """
+    checked = []
+
+    class Record(dict):
+        def get(self, name, default=None):
+            if name == 'count':
+                checked.append(self['id'])
+            return dict.get(self, name, default)
+
+    records = [Record(record) for record in RECORDS]
+    index = BitmapIndex(records, ['status', 'country'])
+
+    index.evaluate(L('count', 50, lookup=GT) & L('status', 'active') & L('country', 'nl'))
+    assert sorted(checked) == [0, 7, 10, 17, 20, 27]
+
+    del checked[:]
+    index.evaluate(L('status', 'active') | L('count', 50, lookup=GT))
+    assert len(checked) == len(RECORDS) - len(filter_records(L('status', 'active'), RECORDS))
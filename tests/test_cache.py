@@ -0,0 +1,144 @@
+from datetime import date
+from decimal import Decimal
+
+from filterql import GT, IN, L
+from filterql.cache import fingerprint, ResultCache
+from filterql.lookup import LookupNode
+
+
+class Timer(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+RECORDS = [
+    {'id': 1, 'status': 'active', 'owner': 'spindle', 'count': 10},
+    {'id': 2, 'status': 'active', 'owner': 'devhouse', 'count': 20},
+    {'id': 3, 'status': 'inactive', 'owner': 'spindle', 'count': 30},
+]
+
+
+class Executor(object):
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, lookup):
+        from filterql.evaluators import filter_records
+        self.calls += 1
+        return filter_records(lookup, RECORDS)
+
+
+def test_fingerprint():
+    """
+    Test that lookups with the same meaning have the same fingerprint.
+    """
+    first = L('status', 'active') & L('owner', 'spindle') & L('count', [1, 2], lookup=IN)
+    second = L('count', [2, 1, 1], lookup=IN) & (L('owner', 'spindle') & L('status', 'active'))
+
+    assert fingerprint(first) == fingerprint(second)
+    assert fingerprint(L('status', 'active') & L('status', 'active')) == fingerprint(L('status', 'active'))
+    assert fingerprint(first) != fingerprint(first | L('status', 'new'))
+    assert fingerprint(~first) != fingerprint(first)
+    # Values that are encoded the same are not the same.
+    for a, b in [
+        (L('created', date(2020, 1, 1)), LookupNode(filters=[{'_field': 'created', '_lookup': 'exact',
+                                                              '_value': '2020-01-01'}])),
+        (L('count', Decimal('1.5')), L('count', 1.5)),
+        (L('count', (1, 2)), L('count', [1, 2])),
+        (L('count', [date(2020, 1, 1)], lookup=IN), L('count', ['2020-01-01'], lookup=IN)),
+    ]:
+        assert fingerprint(a) != fingerprint(b)
+    assert fingerprint(L('count', (1, 2), lookup=IN)) == fingerprint(L('count', [2, 1], lookup=IN))
+    # Nested nodes of loaded lookups are merged like the combined ones.
+    nested = LookupNode.from_dict({'_and': [
+        (L('status', 'active') & L('owner', 'spindle')).to_dict(), {'_or': [L('count', [1, 2], lookup=IN).to_dict()]},
+    ]})
+    assert fingerprint(nested) == fingerprint(first)
+    assert fingerprint(L('count', [1, 'a'], lookup=IN)) != fingerprint(L('count', ['a', 1], lookup=IN))
+    assert fingerprint(L('status', 'active') | ~L('count', 5)) == fingerprint(~L('count', 5) | L('status', 'active'))
+
+
+def test_get():
+    """
+    Test caching results and counting hits.
+    """
+    cache = ResultCache()
+    executor = Executor()
+
+    assert cache.get(L('status', 'active'), executor) == RECORDS[:2]
+    assert cache.get(L('status', 'active') & L('status', 'active'), executor) == RECORDS[:2]
+    assert executor.calls == 1
+    assert cache.hits == 1
+    assert cache.misses == 1
+    assert L('status', 'active') in cache
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.hits == 0
+
+
+def test_lru_and_ttl():
+    """
+    Test evicting the least recently used and expired results.
+    """
+    timer = Timer()
+    cache = ResultCache(maxsize=2, ttl=10, timer=timer)
+    executor = Executor()
+
+    cache.get(L('id', 1), executor)
+    cache.get(L('id', 2), executor)
+    cache.get(L('id', 1), executor)
+    cache.get(L('id', 3), executor)
+
+    assert L('id', 1) in cache
+    assert L('id', 2) not in cache
+    assert len(cache) == cache.maxsize == 2
+
+    timer.now = 10
+    assert L('id', 1) not in cache
+    cache.get(L('id', 1), executor)
+    assert executor.calls == 4
+    # Evicted results are no longer indexed by their fields.
+    assert cache.invalidate(['id']) == 2
+    assert len(cache) == 0
+
+
+def test_invalidate():
+    """
+    Test evicting only the results of lookups on written fields.
+    """
+    cache = ResultCache()
+    executor = Executor()
+
+    cache.get(L('status', 'active'), executor)
+    cache.get(L('status', 'active') & L('owner', 'spindle'), executor)
+    cache.get(L('count', 10, lookup=GT), executor)
+
+    assert cache.invalidate(['owner', 'unknown']) == 1
+    assert L('status', 'active') in cache
+    assert cache.invalidate(['status']) == 1
+    assert len(cache) == 1
+    assert L('count', 10, lookup=GT) in cache
+
+
+def test_answer_from_supersets():
+    """
+    Test answering a narrower lookup from the results of a wider one.
+    """
+    timer = Timer()
+    cache = ResultCache(answer_from_supersets=True, ttl=10, timer=timer)
+    executor = Executor()
+
+    cache.get(L('status', 'active'), executor)
+    result = cache.get(L('status', 'active') & L('count', 15, lookup=GT), executor)
+
+    assert result == RECORDS[1:2]
+    assert executor.calls == 1
+
+    timer.now = 20
+    cache.get(L('status', 'active') & L('count', 5, lookup=GT), executor)
+    assert executor.calls == 2
+    assert len(cache) == 1
@@ -0,0 +1,163 @@
+from datetime import date, datetime
+
+import numpy as np
+from pytest import fixture, raises
+
+from filterql import (CONTAINS, DAY, ENDSWITH, GT, GTE, HOUR, ICONTAINS, IENDSWITH, IEXACT, IN, ISNULL,
+                      ISTARTSWITH, L, LT, LTE, MINUTE, MONTH, SECOND, STARTSWITH, WEEK, YEAR)
+from filterql.columnar import ColumnarDataset, evaluate_columns, python_values, read_bitmap, SharedColumnPool
+from filterql.evaluators import filter_records
+from filterql.lookup import LookupNode
+
+
+COLUMNS = {
+    'id': np.arange(10),
+    'name': np.array(['spindle', 'Devhouse Spindle', '', 'SPINDLE', 'devhouse'] * 2),
+    'count': np.array([10, 20, np.nan, 5, 0, 10, 20, np.nan, 5, 0]),
+    'created': np.array([
+        '2017-06-06T13:37:05', '2016-01-01T00:00:30', 'NaT', '2015-12-28T23:59:00', '2017-01-01T00:00:00',
+    ] * 2, dtype='M8[us]'),
+    'born': np.array(['2017-06-06', 'NaT', '2016-02-29', '2015-12-28', '2000-01-01'] * 2, dtype='M8[D]'),
+    'tags': np.array(['a', None, 1, 'b', None] * 2, dtype=object),
+}
+
+LOOKUPS = [
+    L('name', 'spindle'),
+    L('name', 'SPINDLE', lookup=IEXACT),
+    L('name', 'spin', lookup=CONTAINS),
+    L('name', 'SPIN', lookup=ICONTAINS),
+    L('name', 'spin', lookup=STARTSWITH),
+    L('name', 'DEV', lookup=ISTARTSWITH),
+    L('name', 'dle', lookup=ENDSWITH),
+    L('name', 'DLE', lookup=IENDSWITH),
+    L('name', 'devhouse', lookup=GT),
+    L('name', ['spindle', 'devhouse'], lookup=IN),
+    L('name', 1),
+    L('count', 10),
+    L('count', None),
+    L('count', [5, 20, 'a'], lookup=IN),
+    L('count', [5, 20], lookup=IN),
+    L('count', [], lookup=IN),
+    L('count', 10, lookup=GT),
+    L('count', 10, lookup=GTE),
+    L('count', 10, lookup=LT),
+    L('count', 10, lookup=LTE),
+    L('count', 'a', lookup=LT),
+    L('count', True, lookup=ISNULL),
+    L('count', False, lookup=ISNULL),
+    L('created', datetime(2016, 1, 1, 0, 0, 30)),
+    L('created', datetime(2016, 6, 1), lookup=GT),
+    L('created', date(2016, 6, 1), lookup=GT),
+    L('created', 2017, lookup=YEAR),
+    L('created', 6, lookup=MONTH),
+    L('created', 53, lookup=WEEK),
+    L('created', 28, lookup=DAY),
+    L('created', 13, lookup=HOUR),
+    L('created', 59, lookup=MINUTE),
+    L('created', 30, lookup=SECOND),
+    L('created', True, lookup=ISNULL),
+    L('born', date(2016, 2, 29)),
+    L('born', 2, lookup=MONTH),
+    L('born', 0, lookup=HOUR),
+    L('born', date(2016, 1, 1), lookup=LTE),
+    L('tags', 'a'),
+    L('tags', ['a', 1], lookup=IN),
+    L('tags', True, lookup=ISNULL),
+    L('id', True, lookup=ISNULL),
+    L('missing', None),
+    L('missing', 1, lookup=GT),
+    (L('name', 'spindle') | L('count', 5)) & ~L('id', 3),
+    ~(L('count', 10, lookup=GTE) & L('created', 2017, lookup=YEAR)),
+    LookupNode(),
+]
+
+
+# Columns of Python objects can not be memory mapped.
+FILE_COLUMNS = dict((field, column) for field, column in COLUMNS.items() if column.dtype.kind != 'O')
+
+
+def _records(columns=COLUMNS):
+    values = dict((field, python_values(column)) for field, column in columns.items())
+    return [dict((field, values[field][index]) for field in columns) for index in range(len(columns['id']))]
+
+
+@fixture
+def dataset(tmp_path):
+    for field, column in FILE_COLUMNS.items():
+        np.save(str(tmp_path / ('%s.npy' % field)), column)
+    return ColumnarDataset(str(tmp_path), chunk_size=8)
+
+
+def test_evaluate_columns():
+    """
+    Test that columnar evaluation matches the in memory evaluators.
+    """
+    records = _records()
+
+    for lookup in LOOKUPS:
+        expected = [record['id'] for record in filter_records(lookup, records)]
+        assert list(np.flatnonzero(evaluate_columns(lookup, COLUMNS))) == expected, lookup.to_dict()
+        assert list(np.flatnonzero(evaluate_columns(lookup, COLUMNS, 2, 7)) + 2) == [
+            index for index in expected if 2 <= index < 7]
+
+
+def test_dataset(dataset, tmp_path):
+    """
+    Test evaluating a memory mapped dataset in chunks.
+    """
+    records = _records(FILE_COLUMNS)
+    assert len(dataset) == 10
+
+    for lookup in LOOKUPS:
+        expected = [record['id'] for record in filter_records(lookup, records)]
+        assert list(dataset.where(lookup)) == expected, lookup.to_dict()
+
+        path = str(tmp_path / 'bitmap')
+        assert dataset.write_bitmap(lookup, path) == len(expected)
+        assert list(np.flatnonzero(read_bitmap(path, len(dataset)))) == expected
+
+    # Only the columns used by the lookups are opened.
+    dataset = ColumnarDataset(dataset.path)
+    dataset.where(L('id', 1))
+    assert list(dataset._columns) == ['id']
+    assert isinstance(dataset.column('id'), np.memmap)
+
+    dataset.chunk_size = 10
+    with raises(ValueError):
+        dataset.write_bitmap(L('id', 1), str(tmp_path / 'bitmap'))
+
+    np.save(str(tmp_path / 'short.npy'), np.arange(3))
+    with raises(ValueError):
+        len(ColumnarDataset(dataset.path))
+
+
+def test_python_values():
+    """
+    Test converting columns to Python values.
+    """
+    created = np.array(['2017-06-06T13:37:05.123456789', 'NaT'], dtype='M8[ns]')
+
+    assert python_values(created) == [datetime(2017, 6, 6, 13, 37, 5, 123456), None]
+    assert python_values(np.array([1.5, np.nan])) == [1.5, None]
+
+
+def test_shared_column_pool():
+    """
+    Test evaluating many lookups with workers over shared columns.
+    """
+    records = _records(FILE_COLUMNS)
+
+    with SharedColumnPool(FILE_COLUMNS, processes=2, slice_size=8) as pool:
+        for lookup in LOOKUPS:
+            expected = [record['id'] for record in filter_records(lookup, records)]
+            assert list(pool.where(lookup)) == expected, lookup.to_dict()
+
+    with SharedColumnPool({'id': np.arange(0)}, processes=1) as pool:
+        assert len(pool.evaluate(L('id', 1))) == 0
+
+    with raises(ValueError):
+        SharedColumnPool(COLUMNS, processes=1)
+    with raises(ValueError):
+        SharedColumnPool({'id': np.arange(3), 'count': np.arange(4)}, processes=1)
+    with raises(ValueError):
+        SharedColumnPool(FILE_COLUMNS, processes=1, slice_size=4)
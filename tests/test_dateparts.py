@@ -0,0 +1,125 @@
+from datetime import date, datetime, timedelta, timezone
+
+from pytest import raises
+
+from filterql import DAY, HOUR, L, MONTH, SECOND, WEEK, YEAR
+from filterql.dateparts import DatePartCache, decompose
+from filterql.evaluators import evaluate_mask, filter_records
+from filterql.lookup import LookupNode
+
+
+def _records():
+    return [
+        {'id': 1, 'created': datetime(2017, 6, 6, 13, 37, 0)},
+        {'id': 2, 'created': datetime(2016, 1, 1, 0, 0, 30)},
+        {'id': 3, 'created': date(2017, 1, 2)},
+        {'id': 4, 'created': None},
+    ]
+
+
+def test_decompose():
+    """
+    Test decomposing dates and datetimes.
+    """
+    assert decompose(datetime(2017, 6, 6, 13, 37, 0)) == (2017, 6, 23, 6, 13, 37, 0)
+    assert decompose(date(2016, 1, 1)) == (2016, 1, 53, 1, None, None, None)
+    assert decompose(None) == (None,) * 7
+
+
+def test_column():
+    """
+    Test decomposing a field once for all date parts.
+    """
+    cache = DatePartCache(_records())
+
+    assert cache.column('created', YEAR) == [2017, 2016, 2017, None]
+    assert 'created' in cache
+    assert cache.column('created', WEEK) == [23, 53, 1, None]
+    assert cache.column('created', HOUR) == [13, 0, None, None]
+    assert cache.column('missing', DAY) == [None] * 4
+    assert DatePartCache([]).column('created', YEAR) == []
+
+
+def test_evaluate_with_cache():
+    """
+    Test evaluating date part lookups with the cache.
+    """
+    records = _records()
+    cache = DatePartCache(records)
+
+    lookups = [
+        L('created', 2017, lookup=YEAR),
+        L('created', 2017, lookup=YEAR) & ~L('created', 1, lookup=MONTH),
+        L('created', 30, lookup=SECOND) | L('created', 1, lookup=WEEK),
+        L('id', 4) | L('created', 6, lookup=DAY),
+        LookupNode(),
+        ~LookupNode(connector=LookupNode.OR),
+    ]
+
+    for lookup in lookups:
+        assert filter_records(lookup, records, date_parts=cache) == filter_records(lookup, records)
+
+    assert evaluate_mask(L('created', 2017, lookup=YEAR), records, cache) == [True, False, True, False]
+    assert evaluate_mask(LookupNode(connector=LookupNode.OR), records, cache) == [False] * 4
+
+
+def test_invalidate():
+    """
+    Test invalidating the cache after the data changed.
+    """
+    records = _records()
+    cache = DatePartCache(records)
+    lookup = L('created', 2017, lookup=YEAR)
+
+    assert len(filter_records(lookup, records, date_parts=cache)) == 2
+
+    records[1]['created'] = datetime(2017, 2, 2)
+    cache.invalidate(['created'])
+    assert 'created' not in cache
+    assert len(filter_records(lookup, records, date_parts=cache)) == 3
+
+    records.append({'id': 5, 'created': date(2017, 3, 3)})
+    assert len(filter_records(lookup, records, date_parts=cache)) == 4
+
+    cache.invalidate()
+    assert 'created' not in cache
+
+
+def test_aware_datetimes():
+    """
+    Test that equal aware datetimes in different time zones keep their own parts.
+    """
+    records = [
+        {'id': 1, 'created': datetime(2017, 6, 6, 12, 0, tzinfo=timezone.utc)},
+        {'id': 2, 'created': datetime(2017, 6, 6, 14, 0, tzinfo=timezone(timedelta(hours=2)))},
+        {'id': 3, 'created': datetime(2017, 6, 7, 1, 0, tzinfo=timezone(timedelta(hours=13)))},
+        {'id': 4, 'created': datetime(2017, 6, 6, 12, 0, tzinfo=timezone.utc)},
+    ]
+    cache = DatePartCache(records)
+
+    assert cache.column('created', HOUR) == [12, 14, 1, 12]
+    assert cache.column('created', DAY) == [6, 6, 7, 6]
+    for lookup in [L('created', 14, lookup=HOUR), L('created', 6, lookup=DAY)]:
+        assert filter_records(lookup, records, date_parts=cache) == filter_records(lookup, records)
+
+
+def test_unhashable_values():
+    """
+    Test decomposing a field with values that can not be cached.
+    """
+    cache = DatePartCache([{'created': [2017]}, {'created': datetime(2017, 1, 1)}])
+
+    assert cache.column('created', YEAR) == [None, 2017]
+
+
+def test_other_records():
+    """
+    Test that a cache for other records is rejected.
+    """
+    records = _records()
+    cache = DatePartCache(records)
+
+    with raises(ValueError):
+        filter_records(L('created', 2017, lookup=YEAR), list(records), date_parts=cache)
+    with raises(ValueError):
+        evaluate_mask(L('created', 2017, lookup=YEAR), _records(), cache)
@@ -0,0 +1,116 @@
+from datetime import date, datetime
+
+from filterql import (CONTAINS, DAY, ENDSWITH, GT, GTE, HOUR, ICONTAINS, IEXACT, IN, ISNULL, ISTARTSWITH, L, LT,
+                      LTE, MONTH, STARTSWITH, WEEK, YEAR)
+from filterql.evaluators import evaluate, evaluate_leaf_mask, filter_records, get_field_value, iter_leaves
+
+
+class Record(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def test_get_field_value():
+    """
+    Test getting field values from dicts, objects and related records.
+    """
+    record = {'name': 'spindle', 'owner': Record(name='devhouse')}
+
+    assert get_field_value(record, 'name') == 'spindle'
+    assert get_field_value(record, 'owner__name') == 'devhouse'
+    assert get_field_value(record, 'missing') is None
+    assert get_field_value(record, 'missing__name') is None
+
+
+def test_iter_leaves():
+    """
+    Test iterating over all filters of a nested lookup.
+    """
+    lookup = L('name', 'spindle') & (L('country', 'netherlands') | ~L('status', 'awesome'))
+
+    assert [leaf['_field'] for leaf in iter_leaves(lookup)] == ['name', 'country', 'status']
+
+
+def test_lookup_types():
+    """
+    Test the in memory semantics of all lookup types.
+    """
+    record = {
+        'name': 'Devhouse Spindle',
+        'count': 10,
+        'created': datetime(2017, 6, 6, 13, 37, 0),
+        'deleted': None,
+    }
+
+    matching = [
+        L('name', 'house', lookup=CONTAINS),
+        L('name', 'HOUSE', lookup=ICONTAINS),
+        L('name', 'Devhouse', lookup=STARTSWITH),
+        L('name', 'devhouse', lookup=ISTARTSWITH),
+        L('name', 'Spindle', lookup=ENDSWITH),
+        L('name', 'devhouse spindle', lookup=IEXACT),
+        L('count', [5, 10], lookup=IN),
+        L('count', 5, lookup=GT),
+        L('count', 10, lookup=GTE),
+        L('count', 11, lookup=LT),
+        L('count', 10, lookup=LTE),
+        L('deleted', True, lookup=ISNULL),
+        L('count', False, lookup=ISNULL),
+        L('created', 2017, lookup=YEAR),
+        L('created', 6, lookup=MONTH),
+        L('created', 23, lookup=WEEK),
+        L('created', 6, lookup=DAY),
+        L('created', 13, lookup=HOUR),
+    ]
+    not_matching = [
+        L('name', 'HOUSE', lookup=CONTAINS),
+        L('deleted', 'a', lookup=CONTAINS),
+        L('count', 'a', lookup=GT),
+        L('deleted', 5, lookup=LT),
+        L('count', 5, lookup=IN, validate=False),
+        L('created', 2016, lookup=YEAR),
+        L('name', 20, lookup=WEEK),
+    ]
+
+    for lookup in matching:
+        assert evaluate(lookup, record), lookup.to_dict()
+    for lookup in not_matching:
+        assert not evaluate(lookup, record), lookup.to_dict()
+
+
+def test_evaluate_nodes():
+    """
+    Test evaluating `and`, `or` and `not` nodes.
+    """
+    record = {'name': 'spindle', 'country': 'netherlands'}
+
+    assert evaluate(L('name', 'spindle') & L('country', 'netherlands'), record)
+    assert not evaluate(L('name', 'spindle') & L('country', 'germany'), record)
+    assert evaluate(L('name', 'devhouse') | L('country', 'netherlands'), record)
+    assert evaluate(~(L('name', 'devhouse') | L('country', 'germany')), record)
+    assert not evaluate(~L('name', 'spindle'), record)
+
+
+def test_filter_records():
+    """
+    Test filtering a list of records.
+    """
+    records = [
+        {'name': 'spindle', 'created': date(2017, 6, 6)},
+        {'name': 'devhouse', 'created': date(2016, 6, 6)},
+    ]
+
+    assert filter_records(L('created', 2017, lookup=YEAR), records) == records[:1]
+    assert filter_records(~L('created', 2017, lookup=YEAR), records) == records[1:]
+
+
+def test_evaluate_leaf_mask():
+    """
+    Test evaluating a filter for all records and sharing the read columns.
+    """
+    records = [{'count': 1}, {'count': 5}, {}]
+    columns = {}
+
+    assert evaluate_leaf_mask(L('count', [5, 1], lookup=IN).filters[0], records, columns, None) == [True, True, False]
+    assert columns == {'count': [1, 5, None]}
+    assert evaluate_leaf_mask(L('count', 2, lookup=GT).filters[0], records, columns, None) == [False, True, False]
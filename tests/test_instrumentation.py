@@ -0,0 +1,89 @@
+from datetime import date, datetime
+
+from filterql import GT, IN, L
+from filterql import instrumentation
+from filterql.instrumentation import install, Instrumentation, instrumented, lookup_stats
+from filterql.serializers import DjangoSerializer
+
+
+class Recorder(Instrumentation):
+    def __init__(self):
+        self.calls = []
+
+    def on_from_json(self, seconds, stats):
+        self.calls.append(('from_json', stats))
+
+    def on_from_dict(self, seconds, stats):
+        self.calls.append(('from_dict', stats))
+
+    def on_dumps(self, seconds, stats):
+        self.calls.append(('dumps', stats))
+
+    def on_decode(self, value_type, seconds):
+        assert seconds >= 0
+        self.calls.append(('decode', value_type))
+
+    def on_deserialize(self, seconds, stats):
+        self.calls.append(('deserialize', stats))
+
+
+LOOKUP = (L('created', date(2017, 1, 1), lookup=GT) | L('created', datetime(2017, 1, 1, 12))) & (
+    L('id', [1, 2], lookup=IN) & ~L('created', date(2018, 1, 1)))
+
+
+def test_lookup_stats():
+    """
+    Test the size statistics of a lookup.
+    """
+    assert lookup_stats(L('id', 1)) == {'nodes': 1, 'leaves': 1, 'depth': 1}
+    assert lookup_stats(LOOKUP, bytes=1) == {'nodes': 3, 'leaves': 4, 'depth': 2, 'bytes': 1}
+
+
+def test_instrumentation():
+    """
+    Test the callbacks of an installed instrumentation.
+    """
+    recorder = Recorder()
+    lookup_json = LOOKUP.dumps()
+
+    with instrumented(recorder):
+        assert instrumentation.active is recorder
+        assert LOOKUP.dumps() == lookup_json
+        L.from_json(lookup_json)
+        L.from_dict(LOOKUP.to_dict())
+
+    stats = {'nodes': 3, 'leaves': 4, 'depth': 2}
+    assert recorder.calls == [
+        ('dumps', dict(stats, bytes=len(lookup_json))),
+        ('decode', 'date'),
+        ('decode', 'datetime'),
+        ('decode', 'date'),
+        ('from_json', dict(stats, bytes=len(lookup_json), decoded={'date': 2, 'datetime': 1})),
+        ('from_dict', stats),
+    ]
+
+    # Nothing is reported when disabled.
+    assert instrumentation.active is None
+    L.from_json(lookup_json)
+    assert len(recorder.calls) == 6
+
+
+def test_deserialize_instrumentation():
+    """
+    Test the template cache results reported by the Django serializer.
+    """
+    # Templates of other tests in the process cache would be hits.
+    DjangoSerializer.process_cache.clear()
+    recorder = Recorder()
+    previous = install(recorder)
+    try:
+        DjangoSerializer(use_process_cache=False).deserialize(L('id', 1))
+        serializer = DjangoSerializer()
+        serializer.deserialize(LOOKUP)
+        serializer.deserialize(LOOKUP)
+        DjangoSerializer().deserialize(LOOKUP)
+    finally:
+        install(previous)
+
+    assert [stats['cache'] for _, stats in recorder.calls] == ['miss', 'miss', 'hit', 'process_hit']
+    assert recorder.calls[1][1]['leaves'] == 4
@@ -1,12 +1,14 @@
-from datetime import date
+from datetime import date, datetime
+import uuid
 
 from pytest import raises
 import simplejson as json
 
 from filterql.exceptions import InvalidFormat, InvalidValueException, UnsupportedLookupException
-from filterql import ISNULL, L
-from filterql.lookup import FIELD_KEY, LookupNode, LOOKUP_KEY, TYPE_KEY, VALUE_KEY
+from filterql import IN, ISNULL, L
+from filterql.lookup import FIELD_KEY, LazyLookupNode, LookupNode, LOOKUP_KEY, TYPE_KEY, VALUE_KEY
 from filterql.lookup_types import LOOKUP_TYPES
+from filterql.utils import SortedValues
 
 
 def test_invalid_lookup_type():
@@ -333,3 +335,183 @@ def test_adding_type_to_filter():
 
     assert _type
     assert _type == date.__name__
+
+
+def test_in_values_type_round_trip():
+    """
+    Test that the values of an `in` lookup get the type of their values.
+    """
+    ids = [uuid.UUID(int=1), uuid.UUID(int=2)]
+    lookup = L('id', ids, lookup=IN)
+
+    assert lookup.filters[0][TYPE_KEY] == uuid.UUID.__name__
+    assert L.from_json(lookup.dumps()).filters[0][VALUE_KEY] == ids
+
+
+def test_in_values_iterator():
+    """
+    Test that an iterator of `in` values is kept after validating it.
+    """
+    lookup = L('id', (number for number in [1, 2]), lookup=IN)
+
+    assert lookup.filters[0][VALUE_KEY] == [1, 2]
+    assert L.from_json(lookup.dumps()).filters[0][VALUE_KEY] == [1, 2]
+
+
+def test_subclass_type_round_trip():
+    """
+    Test that values of subclasses of typed values are decoded.
+    """
+    class Timestamp(datetime):
+        pass
+
+    lookup = L('created', Timestamp(2017, 6, 6, 13, 37))
+
+    assert lookup.filters[0][TYPE_KEY] == datetime.__name__
+    assert L.from_json(lookup.dumps()).filters[0][VALUE_KEY] == datetime(2017, 6, 6, 13, 37)
+
+
+def test_compact_in():
+    """
+    Test storing the values of `in` lookups compactly when loading.
+    """
+    lookup = L('id', [3, 1, 2], lookup=IN) | (L('name', ['b', 'a'], lookup=IN) & L('id', 1))
+    compact = L.from_json(lookup.dumps(), compact_in=True)
+
+    assert compact.filters[0][VALUE_KEY] == SortedValues([1, 2, 3], 'q')
+    assert compact.filters[1].filters[0][VALUE_KEY] == SortedValues(['a', 'b'])
+    assert compact.filters[1].filters[1][VALUE_KEY] == 1
+    assert L.from_json(compact.dumps()).to_dict() == L.from_json(
+        (L('id', [1, 2, 3], lookup=IN) | (L('name', ['a', 'b'], lookup=IN) & L('id', 1))).dumps()).to_dict()
+    assert L.from_json(lookup.dumps()).filters[0][VALUE_KEY] == [3, 1, 2]
+
+
+def test_lazy_from_json():
+    """
+    Test that a lazy lookup only builds the nodes that are accessed.
+    """
+    lookup = L('tenant', 1) & (L('date', date(2017, 6, 6)) | ~L('id', [1, 2], lookup=IN))
+    lookup_json = lookup.dumps()
+    lazy = L.from_json(lookup_json, lazy=True)
+
+    assert isinstance(lazy, LazyLookupNode)
+    assert lazy.filters[0] == {FIELD_KEY: 'tenant', LOOKUP_KEY: 'exact', VALUE_KEY: 1}
+    assert not lazy.filters[1].is_loaded
+    # Unmodified lookups dump to the json they were loaded from.
+    assert lazy.dumps() is lookup_json
+
+    assert lazy.filters[1].filters[0][VALUE_KEY] == date(2017, 6, 6)
+    assert lazy.to_dict() == lookup.to_dict()
+    assert lazy.dumps() is lookup_json
+
+
+def test_lazy_modified():
+    """
+    Test dumping a lazy lookup after modifying it.
+    """
+    lookup = L('tenant', 1) & (L('date', date(2017, 6, 6)) | ~L('id', [1, 2], lookup=IN))
+    lazy = L.from_json(lookup.dumps(), lazy=True)
+    lazy.filters[0][VALUE_KEY] = 2
+
+    assert json.loads(lazy.dumps()) == json.loads((L('tenant', 2) & lookup.filters[1]).dumps())
+    assert not lazy.filters[1].is_loaded
+
+    lazy = L.from_json(lookup.dumps(), lazy=True)
+    lazy.filters[1].negate()
+    expected = lookup.to_dict()
+    expected[LookupNode.AND][1] = {LookupNode.NOT: expected[LookupNode.AND][1]}
+    assert L.from_json(lazy.dumps()).to_dict() == expected
+
+    lazy = L.from_json(lookup.dumps(), lazy=True)
+    lazy = lazy & L('name', 'spindle')
+    assert L.from_json(lazy.dumps()).to_dict() == (lookup & L('name', 'spindle')).to_dict()
+
+    with raises(InvalidFormat):
+        L.from_json('{"_and": [{"_field": "id"}]}', lazy=True).filters
+
+
+def test_lazy_negate_and_bytes():
+    """
+    Test negating a lazy lookup and loading it from bytes.
+    """
+    lookup = L('tenant', 1) & L('date', date(2017, 6, 6))
+    lookup_json = lookup.dumps()
+
+    negated = ~L.from_json(lookup_json, lazy=True)
+    assert not isinstance(negated, LazyLookupNode)
+    assert negated.to_dict() == (~L.from_json(lookup_json)).to_dict()
+    assert L.from_json(negated.dumps()).to_dict() == (~lookup).to_dict()
+
+    lookup_bytes = lookup_json.encode('utf-8')
+    assert L.from_json(lookup_bytes, lazy=True).dumps() is lookup_bytes
+
+
+def test_lazy_compact_in():
+    """
+    Test compacting the values of `in` lookups when they are accessed.
+    """
+    lookup = L('id', [3, 1, 2], lookup=IN) & (L('id', 1) | L('name', ['b', 'a'], lookup=IN))
+    lookup_json = lookup.dumps()
+    lazy = L.from_json(lookup_json, compact_in=True, lazy=True)
+
+    assert isinstance(lazy.filters[0][VALUE_KEY], SortedValues)
+    assert list(lazy.filters[1].filters[1][VALUE_KEY]) == ['a', 'b']
+    assert lazy.to_dict() == L.from_json(lookup_json, compact_in=True).to_dict()
+    assert lazy.dumps() is lookup_json
+
+
+def test_lazy_modifications():
+    """
+    Test every change that makes a lazy lookup modified.
+    """
+    lookup = L('tenant', 1) & (L('date', date(2017, 6, 6)) | L('id', 2))
+    lookup_json = lookup.dumps()
+
+    def load():
+        return L.from_json(lookup_json, lazy=True)
+
+    # Replacing the filters, before or after they were built.
+    lazy = load()
+    lazy.filters = [{FIELD_KEY: 'tenant', LOOKUP_KEY: 'exact', VALUE_KEY: 2}]
+    assert lazy.is_modified()
+    assert L.from_json(lazy.dumps()).to_dict() == L('tenant', 2).to_dict()
+
+    lazy = load()
+    lazy.filters = lazy.filters
+    assert lazy.is_modified()
+
+    # Replacing a filter with an equal one.
+    lazy = load()
+    lazy.filters[0] = dict(lazy.filters[0])
+    assert lazy.is_modified()
+
+    # Adding a node that was not loaded.
+    lazy = load()
+    lazy.filters.append(L('name', 'spindle') | L('id', 3))
+    assert lazy.is_modified()
+    assert L.from_json(lazy.dumps()).to_dict() == (lookup & (L('name', 'spindle') | L('id', 3))).to_dict()
+    assert not lazy.filters[1].is_modified()
+
+    # Changing a nested node.
+    lazy = load()
+    lazy.filters[1].connector = LookupNode.AND
+    assert lazy.is_modified()
+    assert L.from_json(lazy.dumps()).filters[1].connector == LookupNode.AND
+
+    lazy = load()
+    lazy.filters[1].filters.pop()
+    assert lazy.is_modified()
+    expected = lookup.to_dict()
+    expected[LookupNode.AND][1][LookupNode.OR].pop()
+    assert L.from_json(lazy.dumps()).to_dict() == expected
+
+    lazy = load()
+    assert not lazy.is_modified()
+    assert lazy.filters[1].filters[0][VALUE_KEY] == date(2017, 6, 6)
+    assert not lazy.is_modified()
+
+    # Changing a value in place.
+    lazy = L.from_json(L('id', [1, 2], lookup=IN).dumps(), lazy=True)
+    lazy.filters[0][VALUE_KEY].append(3)
+    assert lazy.is_modified()
+    assert L.from_json(lazy.dumps()).to_dict() == L('id', [1, 2, 3], lookup=IN).to_dict()
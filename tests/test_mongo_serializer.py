@@ -0,0 +1,180 @@
+from datetime import date, datetime
+import operator
+import re
+
+from filterql import (CONTAINS, DAY, ENDSWITH, GT, GTE, HOUR, ICONTAINS, IENDSWITH, IEXACT, IN, ISNULL,
+                      ISTARTSWITH, L, LT, LTE, MINUTE, MONTH, SECOND, STARTSWITH, WEEK, YEAR)
+from filterql.evaluators import filter_records
+from filterql.lookup import LookupNode
+from filterql.serializers import MongoSerializer
+
+
+RECORDS = [
+    {'id': 1, 'name': 'devhouse spindle', 'count': 10, 'created': datetime(2017, 6, 6, 13, 37, 5),
+     'owner': {'name': 'Spindle'}},
+    {'id': 2, 'name': 'spindle', 'count': 20, 'created': datetime(2016, 1, 1, 0, 0, 30), 'owner': {'name': 'dev'}},
+    {'id': 3, 'name': '100% spindle_ (v1.0)', 'count': None, 'created': datetime(2015, 12, 28, 23, 59, 0)},
+    {'id': 4, 'name': None, 'count': 5, 'created': None},
+    {'id': 5, 'created': datetime(2017, 1, 2)},
+]
+
+COMPARISONS = {
+    '$gt': operator.gt,
+    '$gte': operator.ge,
+    '$lt': operator.lt,
+    '$lte': operator.le,
+}
+
+DATE_OPERATORS = {
+    '$year': lambda value: value.year,
+    '$month': lambda value: value.month,
+    '$isoWeek': lambda value: value.isocalendar()[1],
+    '$dayOfMonth': lambda value: value.day,
+    '$hour': lambda value: value.hour,
+    '$minute': lambda value: value.minute,
+    '$second': lambda value: value.second,
+}
+
+
+def _get(record, path):
+    for name in path.split('.'):
+        if not isinstance(record, dict):
+            return None
+        record = record.get(name)
+    return record
+
+
+def _expression(expression, record):
+    """
+    Evaluate the subset of aggregation expressions used by the serializer.
+    """
+    if isinstance(expression, str) and expression.startswith('$'):
+        return _get(record, expression[1:])
+    if not isinstance(expression, dict):
+        return expression
+
+    (operator_name, argument), = expression.items()
+    if operator_name == '$eq':
+        left, right = [_expression(item, record) for item in argument]
+        return left == right
+    value = _expression(argument, record)
+    return None if value is None else DATE_OPERATORS[operator_name](value)
+
+
+def _match_field(value, condition):
+    for operator_name, argument in condition.items():
+        if operator_name == '$eq':
+            matches = value == argument
+        elif operator_name == '$ne':
+            matches = value != argument
+        elif operator_name == '$in':
+            matches = value in argument
+        elif operator_name == '$regex':
+            flags = re.IGNORECASE if 'i' in condition.get('$options', '') else 0
+            matches = isinstance(value, str) and re.search(argument, value, flags) is not None
+        elif operator_name == '$options':
+            continue
+        else:
+            try:
+                matches = value is not None and COMPARISONS[operator_name](value, argument)
+            except TypeError:
+                matches = False
+        if not matches:
+            return False
+    return True
+
+
+def match(document, record):
+    """
+    Match a record with a query document like MongoDB does, for the subset
+    of operators used by the serializer.
+    """
+    for key, condition in document.items():
+        if key == '$and':
+            matches = all(match(clause, record) for clause in condition)
+        elif key == '$or':
+            matches = any(match(clause, record) for clause in condition)
+        elif key == '$nor':
+            matches = not any(match(clause, record) for clause in condition)
+        elif key == '$expr':
+            matches = _expression(condition, record) is True
+        else:
+            matches = _match_field(_get(record, key), condition)
+        if not matches:
+            return False
+    return True
+
+
+def test_matches_in_memory_evaluation():
+    """
+    Test that the documents match the same records as the in memory evaluation.
+    """
+    lookups = [
+        L('count', 10),
+        L('count', 10, lookup=GT),
+        L('count', 10, lookup=GTE) & L('count', 20, lookup=LT),
+        L('count', 5, lookup=LTE) | L('name', 'spindle'),
+        ~L('count', 10, lookup=LT),
+        L('count', [5, 20], lookup=IN),
+        L('count', 5) | L('count', 20) | L('count', [10], lookup=IN) | L('id', 3),
+        L('count', None),
+        L('count', True, lookup=ISNULL),
+        L('name', False, lookup=ISNULL) & ~L('name', 'spindle'),
+        L('name', 'SPINDLE', lookup=IEXACT),
+        L('name', '% spindle_', lookup=CONTAINS),
+        L('name', '(V1.0)', lookup=ICONTAINS),
+        L('name', 'dev', lookup=STARTSWITH),
+        L('name', 'DEV', lookup=ISTARTSWITH),
+        L('name', 'le', lookup=ENDSWITH),
+        L('name', ').0)', lookup=IENDSWITH) | L('name', '1.0)', lookup=IENDSWITH),
+        L('owner__name', 'spindle', lookup=ISTARTSWITH),
+        L('created', 2017, lookup=YEAR),
+        L('created', 6, lookup=MONTH) | L('created', 1, lookup=DAY),
+        L('created', 53, lookup=WEEK),
+        L('created', 13, lookup=HOUR) & L('created', 37, lookup=MINUTE) & L('created', 5, lookup=SECOND),
+        L('created', datetime(2016, 1, 1), lookup=GTE) & ~(L('created', 2017, lookup=YEAR) | L('id', 2)),
+        ~(L('name', 'dev', lookup=STARTSWITH) & L('count', 10)),
+        LookupNode(connector=LookupNode.OR),
+        ~LookupNode(connector=LookupNode.AND),
+    ]
+    serializer = MongoSerializer()
+    for lookup in lookups:
+        document = serializer.from_json(lookup.dumps())
+        expected = [record['id'] for record in filter_records(lookup, RECORDS)]
+
+        assert [record['id'] for record in RECORDS if match(document, record)] == expected, lookup.dumps()
+
+
+def test_documents():
+    """
+    Test merging of filters on the same field and the operators used.
+    """
+    serializer = MongoSerializer()
+
+    assert serializer.deserialize(
+        L('count', 1, lookup=GT) & L('count', 5, lookup=LT) & L('name', 'a')
+    ) == {'count': {'$gt': 1, '$lt': 5}, 'name': {'$eq': 'a'}}
+    assert serializer.deserialize(
+        L('count', 1, lookup=GT) & (L('count', 5, lookup=LT) & L('count', 3, lookup=GT))
+    ) == {'$and': [{'count': {'$gt': 1, '$lt': 5}}, {'count': {'$gt': 3}}]}
+    assert serializer.deserialize(
+        L('count', 1) | L('count', [2, 3], lookup=IN) | L('name', 'a')
+    ) == {'$or': [{'count': {'$in': [1, 2, 3]}}, {'name': {'$eq': 'a'}}]}
+    assert serializer.deserialize(L('count', 1) | L('count', 2)) == {'count': {'$in': [1, 2]}}
+    assert serializer.deserialize(
+        L('count', 1) | (L('count', 2, lookup=GT) & L('name', 'a'))
+    ) == {'$or': [{'count': {'$eq': 1}}, {'count': {'$gt': 2}, 'name': {'$eq': 'a'}}]}
+    # Nested nodes of loaded lookups are merged like the combined ones.
+    assert serializer.deserialize(LookupNode.from_dict({'_or': [
+        L('count', 1).to_dict(), (L('count', 2) | L('name', 'a')).to_dict(),
+    ]})) == {'$or': [{'count': {'$in': [1, 2]}}, {'name': {'$eq': 'a'}}]}
+    assert serializer.deserialize(~(L('count', 1) | L('name', 'a'))) == {
+        '$nor': [{'count': {'$eq': 1}}, {'name': {'$eq': 'a'}}]
+    }
+    assert serializer.deserialize(L('name', 'a.b', lookup=ISTARTSWITH) & L('created', 2017, lookup=YEAR)) == {
+        'name': {'$regex': '^a\\.b', '$options': 'i'},
+        '$expr': {'$eq': [{'$year': '$created'}, 2017]},
+    }
+    assert serializer.deserialize(L('owner__created', date(2017, 6, 6), lookup=GTE)) == {
+        'owner.created': {'$gte': datetime(2017, 6, 6)}
+    }
@@ -0,0 +1,118 @@
+import datetime
+
+import pytest
+
+from filterql import GT, IN, L, MONTH
+from filterql.exceptions import InvalidFormat, InvalidValueException
+from filterql.patch import apply_patch, diff, dumps_patch, loads_patch
+
+
+def test_diff_apply():
+    """
+    Test that applying the diff of two lookups gives the new lookup.
+    """
+    old = L('owner', 'spindle') & (L('count', 1, lookup=GT) | L('status', 'new')) & L('name', 'a')
+    lookups = [
+        L('owner', 'devhouse') & (L('count', 1, lookup=GT) | L('status', 'new')) & L('name', 'a'),
+        L('owner', 'spindle') & (L('count', 2, lookup=GT) | L('status', 'new')) & L('name', 'a'),
+        L('owner', 'spindle') & L('name', 'a'),
+        L('owner', 'spindle') & (L('count', 1, lookup=GT) | L('status', 'new')) & L('name', 'a') & L('id', 1),
+        L('owner', 'spindle') & ~(L('count', 1, lookup=GT) | L('status', 'new')) & L('name', 'a'),
+        L('owner', 'spindle') | L('name', 'a'),
+        L('created', datetime.date(2020, 1, 1)),
+    ]
+
+    for new in lookups:
+        patch = diff(old, new)
+        assert apply_patch(old, patch).to_dict() == new.to_dict()
+        assert apply_patch(old, loads_patch(dumps_patch(patch))).to_dict() == new.to_dict()
+
+    assert diff(old, old) == []
+
+
+def test_diff_size():
+    """
+    Test that the patch scales with the edit and shares unchanged subtrees.
+    """
+    old = L('name', 'a') & (L('count', 1, lookup=GT) | L('status', 'new'))
+    for index in range(100):
+        old = old & L('id', index)
+    new = apply_patch(old, [{'op': 'replace', 'path': [0], '_value': 'ab'}])
+
+    patch = diff(old, new)
+    assert patch == [{'op': 'replace', 'path': [0], '_value': 'ab'}]
+    assert new.filters[1] is old.filters[1]
+    assert old.filters[0]['_value'] == 'a'
+
+    removed = diff(old, apply_patch(old, [{'op': 'remove', 'path': [50]}]))
+    assert removed == [{'op': 'remove', 'path': [50]}]
+
+
+def test_typed_values():
+    """
+    Test that typed values survive the json of a patch.
+    """
+    old = L('created', datetime.date(2020, 1, 1), lookup=GT)
+    new = L('created', datetime.datetime(2020, 1, 2, 12), lookup=GT)
+
+    patch = loads_patch(dumps_patch(diff(old, new)))
+    assert apply_patch(old, patch).filters[0] == new.filters[0]
+    assert apply_patch(new, diff(new, L('created', 2, lookup=GT))).filters[0] == {
+        '_field': 'created', '_lookup': GT, '_value': 2}
+
+
+def test_invalid_patch():
+    """
+    Test that invalid operations and paths are rejected.
+    """
+    lookup = L('name', 'a') & L('id', 1) & (L('id', 2) | L('id', 3))
+    for patch in [
+        [{'op': 'replace', 'path': [2], '_value': 1}],
+        [{'op': 'move', 'path': [0]}],
+        [{'op': 'remove', 'path': []}],
+        [{'op': 'remove', 'path': [5]}],
+        [{'op': 'add', 'path': [4], 'filter': {'_field': 'a', '_lookup': 'exact', '_value': 1}}],
+        [{'op': 'replace', 'path': [0, 1], '_value': 1}],
+        [{'op': 'set', 'path': [0], 'filter': {'_field': 'a'}}],
+        [{'op': 'set', 'path': [], 'filter': {'_field': 'a', '_lookup': 'exact', '_value': 1}}],
+    ]:
+        with pytest.raises(InvalidFormat):
+            apply_patch(lookup, patch)
+
+
+def test_invalid_replace_value():
+    """
+    Test that replaced values are validated for the lookup type of the filter.
+    """
+    lookup = L('created', 6, lookup=MONTH) & L('id', [1, 2], lookup=IN)
+
+    for patch in [
+        [{'op': 'replace', 'path': [0], '_value': 13}],
+        [{'op': 'replace', 'path': [1], '_value': 1}],
+    ]:
+        with pytest.raises(InvalidValueException):
+            apply_patch(lookup, patch)
+
+    patched = apply_patch(lookup, [{'op': 'replace', 'path': [1], '_value': iter([3])}])
+    assert patched.to_dict() == (L('created', 6, lookup=MONTH) & L('id', [3], lookup=IN)).to_dict()
+
+
+def test_invalid_inserted_filters():
+    """
+    Test that added and set filters are validated and negative indexes rejected.
+    """
+    lookup = L('name', 'a') & L('id', 1)
+    month = {'_field': 'created', '_lookup': MONTH, '_value': 13}
+
+    for patch in [
+        [{'op': 'add', 'path': [0], 'filter': month}],
+        [{'op': 'set', 'path': [1], 'filter': {'_or': [L('id', 2).to_dict(), month]}}],
+        [{'op': 'set', 'path': [], 'filter': {'_and': [month]}}],
+        [{'op': 'remove', 'path': [-1]}],
+        [{'op': 'replace', 'path': [-2], '_value': 'b'}],
+    ]:
+        with pytest.raises(InvalidValueException):
+            apply_patch(lookup, patch)
+
+    patched = apply_patch(lookup, [{'op': 'add', 'path': [2], 'filter': dict(month, _value=12)}])
+    assert patched.to_dict() == (lookup & L('created', 12, lookup=MONTH)).to_dict()
@@ -0,0 +1,126 @@
+from datetime import date
+
+from filterql import CONTAINS, GT, ICONTAINS, IN, ISNULL, L, LT, YEAR
+from filterql.bitmap import BitmapIndex
+from filterql.planner import ColumnStatistics, DEFAULT_SELECTIVITY, leaf_cost, leaf_selectivity, Statistics
+from filterql.utils import compact_values
+
+
+RECORDS = [
+    {'status': 'active' if number % 4 else None, 'count': number, 'created': date(2017, 1, 1 + number % 28)}
+    for number in range(100)
+]
+
+
+def test_leaf_cost():
+    """
+    Test that expensive lookups cost more.
+    """
+    assert leaf_cost(L('name', 'a', lookup=ICONTAINS).filters[0]) > leaf_cost(L('name', 'a').filters[0])
+    assert leaf_cost(L('name', 'abcd', lookup=CONTAINS).filters[0]) > leaf_cost(
+        L('name', 'a', lookup=CONTAINS).filters[0])
+
+    values = list(range(1000))
+    scan = leaf_cost(L('id', values, lookup=IN).filters[0])
+    search = leaf_cost(L('id', compact_values(values), lookup=IN).filters[0])
+    assert scan > search > leaf_cost(L('id', frozenset(values), lookup=IN).filters[0])
+    # Values without a length cost like a single value.
+    assert leaf_cost(L('id', 5, lookup=IN, validate=False).filters[0]) == leaf_cost(L('id', 5).filters[0])
+
+
+def test_statistics():
+    statistics = Statistics.from_records(RECORDS, ['status', 'count'])
+    status = statistics.columns['status']
+
+    assert statistics.rows == 100
+    assert (status.count, status.nulls, status.distinct) == (100, 25, 1)
+    assert status.fraction('active') == 0.75
+    assert status.fraction(None) == 0.25
+    assert status.fraction('unknown') == 0.0
+
+    count = statistics.columns['count']
+    assert (count.minimum, count.maximum) == (0, 99)
+    assert count.fraction(1) == 0.01
+    assert abs(count.range_fraction(GT, 49.5) - 0.5) < 0.01
+    assert count.range_fraction(LT, 200) == 1.0
+    assert ColumnStatistics(10, distinct=5).fraction(1) == 0.2
+    assert ColumnStatistics(10, minimum='a', maximum='b').range_fraction(GT, 'a') is None
+    assert count.range_fraction(GT, -1) == 1.0
+    assert ColumnStatistics(0).fraction(1) == 0.0
+    assert ColumnStatistics(10, frequencies={1: 5}).fraction([1]) == 0.0
+
+
+def test_statistics_of_unorderable_values():
+    """
+    Test statistics of values that can not be counted or ordered.
+    """
+    records = [{'tags': ['a']}, {'tags': ['b']}, {'tags': None}, {'mixed': 1}, {'mixed': 'a'}]
+    statistics = Statistics.from_records(records, ['tags', 'mixed'])
+    tags, mixed = statistics.columns['tags'], statistics.columns['mixed']
+
+    assert (tags.nulls, tags.distinct, tags.frequencies) == (3, None, {})
+    assert (tags.minimum, tags.maximum) == (['a'], ['b'])
+    assert mixed.distinct == 2
+    assert (mixed.minimum, mixed.maximum) == (None, None)
+
+
+def test_leaf_selectivity():
+    """
+    Test the selectivity of the lookup types with statistics.
+    """
+    statistics = Statistics.from_records(RECORDS, ['status', 'count'])
+
+    def selectivity(lookup):
+        return leaf_selectivity(lookup.filters[0], statistics)
+
+    assert leaf_selectivity(L('count', 1).filters[0], None) is None
+    assert selectivity(L('unknown', 1)) == DEFAULT_SELECTIVITY['exact']
+    assert selectivity(L('status', True, lookup=ISNULL)) == 0.25
+    assert selectivity(L('status', False, lookup=ISNULL)) == 0.75
+    assert selectivity(L('count', [1, 2, 2], lookup=IN)) == 0.02
+    assert selectivity(L('count', [[1]], lookup=IN, validate=False)) == 0.0
+    assert selectivity(L('status', 'act', lookup=CONTAINS)) == DEFAULT_SELECTIVITY['contains'] * 0.75
+
+
+def test_explain():
+    """
+    Test the plan, selectivity and cost of a lookup.
+    """
+    lookup = (L('name', 'spindle', lookup=ICONTAINS) & L('status', 'active')) | ~L('count', 90, lookup=LT)
+    plan = lookup.explain()
+
+    assert plan.selectivity is None
+    assert plan.rows is None and plan.total_cost == plan.cost
+    negated, node = plan.children
+    assert negated.negated and negated.children[0].field == 'count'
+    # The cheap leaf is evaluated first.
+    assert [child.lookup for child in node.children] == ['exact', 'icontains']
+    assert node.children[1].strategy == 'text match'
+
+    statistics = Statistics.from_records(RECORDS, ['status', 'count', 'created'])
+    plan = lookup.explain(statistics)
+    assert plan.rows == 100
+    assert plan.total_cost == plan.cost * 100
+    negated = [child for child in plan.children if child.negated][0]
+    assert abs(negated.selectivity - 0.1) < 0.01
+    assert 0 < plan.selectivity < 1
+    assert plan.to_dict()['children'][1]['children'][0] == {
+        'lookup': 'exact', 'field': 'status', 'strategy': 'compare', 'cost': 1.0, 'selectivity': 0.75}
+    assert 'total cost=' in str(plan)
+
+
+def test_explain_strategies():
+    index = BitmapIndex(RECORDS, ['status'])
+    lookup = (
+        L('status', 'active') & L('status', True, lookup=ISNULL) & L('created', 2017, lookup=YEAR) &
+        L('name', 'a', lookup=CONTAINS) & L('name', 'b', lookup=ICONTAINS) & L('id', [1], lookup=IN) &
+        L('id', compact_values([1, 2]), lookup=IN) & L('id', frozenset([1, 'a']), lookup=IN) &
+        L('count', 1, lookup=GT)
+    )
+    strategies = [(child.field, child.strategy) for child in lookup.explain(index=index).children]
+    assert sorted(strategies) == sorted([
+        ('status', 'bitmap'), ('status', 'bitmap'), ('created', 'date part'), ('name', 'multi-pattern'),
+        ('name', 'multi-pattern'), ('id', 'scan'), ('id', 'binary search'), ('id', 'hash'), ('count', 'compare'),
+    ])
+    assert lookup.explain(index=index).strategy == 'short-circuit'
+    assert (L('status', 'active') | ~L('status', None)).explain(index=index).strategy == 'bitwise'
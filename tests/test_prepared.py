@@ -0,0 +1,104 @@
+import datetime
+
+import pytest
+
+from filterql import GT, IN, L, MONTH, Param
+from filterql.exceptions import InvalidValueException, UnsupportedLookupException
+from filterql.lookup import LookupNode
+from filterql.serializers import SQLSerializer
+
+
+def test_bind():
+    """
+    Test that bound lookups are the same as lookups built with the values.
+    """
+    prepared = (
+        (L('owner', Param('owner')) | L('owner', 'spindle')) & L('count', Param('count'), lookup=GT)
+    ).prepare()
+
+    assert prepared.params == frozenset(['owner', 'count'])
+
+    lookup = prepared.bind(owner='devhouse', count=10)
+    expected = (L('owner', 'devhouse') | L('owner', 'spindle')) & L('count', 10, lookup=GT)
+    assert isinstance(lookup, LookupNode)
+    assert lookup.to_dict() == expected.to_dict()
+    assert prepared.bind_dict(owner='devhouse', count=10) == expected.to_dict()
+    assert prepared.bind_json(owner='devhouse', count=10) == expected.dumps()
+
+    # Filters without parameters are shared, the bound ones are not.
+    other = prepared.bind(owner='other', count=20)
+    assert other.filters[0].filters[1] is lookup.filters[0].filters[1]
+    assert lookup.filters[0].filters[0]['_value'] == 'devhouse'
+
+
+def test_bind_types():
+    """
+    Test that bound values get the type of the filter.
+    """
+    prepared = L('created', Param('created'), lookup=GT).prepare()
+    created = datetime.date(2020, 1, 1)
+
+    assert prepared.bind_json(created=created) == L('created', created, lookup=GT).dumps()
+    assert L.from_json(prepared.bind_json(created=created)).filters[0]['_value'] == created
+
+
+def test_bind_validation():
+    """
+    Test that the values are validated when preparing and binding.
+    """
+    with pytest.raises(UnsupportedLookupException):
+        L('owner', Param('owner'), lookup='unknown')
+    with pytest.raises(UnsupportedLookupException):
+        L('owner', Param('owner'), lookup='unknown', validate=False).prepare()
+    with pytest.raises(InvalidValueException):
+        (L('created', 13, lookup=MONTH, validate=False) & L('owner', Param('owner'))).prepare()
+
+    prepared = L('created', Param('month'), lookup=MONTH).prepare()
+    assert prepared.bind(month=12).filters[0]['_value'] == 12
+    with pytest.raises(InvalidValueException):
+        prepared.bind(month=13)
+    with pytest.raises(InvalidValueException):
+        prepared.bind()
+    with pytest.raises(InvalidValueException):
+        prepared.bind(month=1, other=1)
+
+
+def test_bind_in_values():
+    """
+    Test binding iterators to `in` parameters and sharing the constant filters.
+    """
+    lookup = L('owner', 'spindle') & L('id', Param('ids'), lookup=IN)
+    expected = lookup.filters[0].copy()
+    prepared = lookup.prepare()
+
+    bound = prepared.bind(ids=(number for number in [1, 2]))
+    assert bound.to_dict() == (L('owner', 'spindle') & L('id', [1, 2], lookup=IN)).to_dict()
+
+    other = prepared.bind(ids=iter([3]))
+    assert other.filters[1]['_value'] == [3]
+    assert bound.filters[1]['_value'] == [1, 2]
+    assert other.filters[0] is bound.filters[0] is lookup.filters[0]
+    assert lookup.filters[0] == expected
+
+
+def test_bind_to():
+    """
+    Test binding to a serializer that caches per shape.
+    """
+    serializer = SQLSerializer()
+    prepared = (L('owner', Param('owner')) & L('count', Param('count'), lookup=GT)).prepare()
+
+    assert prepared.bind_to(serializer, owner='spindle', count=1) == (
+        '"owner" = ? AND "count" > ?', ['spindle', 1])
+    prepared.bind_to(serializer, owner='devhouse', count=2)
+    assert serializer.cache.hits == 1
+
+
+def test_param():
+    """
+    Test that parameters are equal by name.
+    """
+    assert Param('owner') == Param('owner')
+    assert Param('owner') != Param('count') and Param('owner') != 'owner'
+    assert len({Param('owner'), Param('owner'), Param('count')}) == 2
+    assert repr(Param('owner')) == "Param('owner')"
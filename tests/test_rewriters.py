@@ -0,0 +1,113 @@
+from datetime import date, datetime
+import sqlite3
+
+from filterql import DAY, GTE, HOUR, L, LT, MINUTE, MONTH, YEAR
+from filterql.evaluators import filter_records
+from filterql.lookup import FIELD_KEY, LOOKUP_KEY, VALUE_KEY
+from filterql.rewriters import date_part_range, rewrite_date_ranges
+from filterql.serializers import SQLSerializer
+
+
+def _leaf(field, value, lookup):
+    return L(field, value, lookup=lookup).filters[0]
+
+
+def test_date_part_range():
+    """
+    Test the ranges for the date parts.
+    """
+    assert date_part_range([2020]) == (date(2020, 1, 1), date(2021, 1, 1))
+    assert date_part_range([2020, 12]) == (date(2020, 12, 1), date(2021, 1, 1))
+    assert date_part_range([2020, 2, 29]) == (date(2020, 2, 29), date(2020, 3, 1))
+    assert date_part_range([2020, 12, 31, 23]) == (datetime(2020, 12, 31, 23), datetime(2021, 1, 1))
+    assert date_part_range([2020, 2], as_datetime=True) == (datetime(2020, 2, 1), datetime(2020, 3, 1))
+
+
+def test_rewrite_year():
+    """
+    Test rewriting a single year lookup.
+    """
+    lookup = rewrite_date_ranges(L('created', 2020, lookup=YEAR))
+
+    assert lookup.filters == [
+        _leaf('created', date(2020, 1, 1), GTE),
+        _leaf('created', date(2021, 1, 1), LT),
+    ]
+
+
+def test_rewrite_combined_parts():
+    """
+    Test combining the date parts under one `and` into a single range.
+    """
+    original = (
+        L('created', 3, lookup=DAY) & L('name', 'spindle') & L('created', 2020, lookup=YEAR) &
+        L('created', 2, lookup=MONTH) & L('created', 30, lookup=MINUTE)
+    )
+    lookup = rewrite_date_ranges(original)
+
+    assert lookup.filters == [
+        L('name', 'spindle').filters[0],
+        _leaf('created', date(2020, 2, 3), GTE),
+        _leaf('created', date(2020, 2, 4), LT),
+        _leaf('created', 30, MINUTE),
+    ]
+    assert len(original.filters) == 5
+
+    # Hours are only combined with a full date and months need a year.
+    lookup = rewrite_date_ranges(L('created', 2, lookup=MONTH) & L('created', 13, lookup=HOUR))
+    assert [_filter[LOOKUP_KEY] for _filter in lookup.filters] == [MONTH, HOUR]
+
+    # Invalid dates can never match and are left alone.
+    lookup = rewrite_date_ranges(L('created', 2021, lookup=YEAR) & L('created', 2, lookup=MONTH) &
+                                 L('created', 30, lookup=DAY))
+    assert [_filter[LOOKUP_KEY] for _filter in lookup.filters] == [YEAR, MONTH, DAY]
+
+
+def test_rewrite_or_and_not():
+    """
+    Test rewriting years under `or` and `not` nodes.
+    """
+    lookup = rewrite_date_ranges(L('created', 2019, lookup=YEAR) | ~L('created', 2020, lookup=YEAR) |
+                                 L('created', 3, lookup=MONTH))
+
+    assert lookup.connector == L.OR
+    assert lookup.filters[0].filters == [
+        _leaf('created', date(2019, 1, 1), GTE),
+        _leaf('created', date(2020, 1, 1), LT),
+    ]
+    assert lookup.filters[1].negated
+    assert [_filter[VALUE_KEY] for _filter in lookup.filters[1].filters] == [date(2020, 1, 1), date(2021, 1, 1)]
+    assert lookup.filters[2][FIELD_KEY] == 'created'
+
+    # Years without a date range are left alone.
+    lookup = rewrite_date_ranges(L('created', 0, lookup=YEAR) | L('created', '2019', lookup=YEAR))
+    assert [_filter[LOOKUP_KEY] for _filter in lookup.filters] == [YEAR, YEAR]
+
+
+def test_equivalent_results():
+    """
+    Test that rewritten lookups match the same records.
+    """
+    records = [{'created': datetime(year, month, day, hour)}
+               for year in (2019, 2020) for month in (1, 2, 12) for day in (1, 28) for hour in (0, 23)]
+    lookups = [
+        L('created', 2020, lookup=YEAR),
+        L('created', 2020, lookup=YEAR) & L('created', 12, lookup=MONTH),
+        L('created', 2019, lookup=YEAR) & L('created', 2, lookup=MONTH) & L('created', 28, lookup=DAY) &
+        L('created', 23, lookup=HOUR),
+        ~(L('created', 2019, lookup=YEAR) & L('created', 1, lookup=MONTH)) | L('created', 2020, lookup=YEAR),
+    ]
+
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE record (created TEXT)')
+    connection.executemany(
+        'INSERT INTO record VALUES (?)', [(record['created'].isoformat(' '),) for record in records])
+
+    for lookup in lookups:
+        expected = filter_records(lookup, records)
+        assert filter_records(rewrite_date_ranges(lookup, as_datetime=True), records) == expected
+
+        sql, params = SQLSerializer(rewrite_dates=True).deserialize(lookup)
+        assert 'strftime' not in sql
+        count = connection.execute('SELECT COUNT(*) FROM record WHERE %s' % sql, params).fetchone()[0]
+        assert count == len(expected)
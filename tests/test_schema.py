@@ -0,0 +1,96 @@
+from datetime import date, datetime
+from decimal import Decimal
+import uuid
+
+from pytest import raises
+
+from filterql import CONTAINS, GT, IN, ISNULL, L, MONTH, YEAR
+from filterql.exceptions import InvalidValueException, SchemaException
+from filterql.lookup import TYPE_KEY, VALUE_KEY
+from filterql.schema import Field, Schema
+
+
+SCHEMA = Schema({
+    'id': uuid.UUID,
+    'name': str,
+    'age': int,
+    'price': Decimal,
+    'score': float,
+    'born': date,
+    'created': datetime,
+    'active': Field(bool, lookups=[ISNULL]),
+})
+
+
+def test_coerce_values():
+    """
+    Test that decoded json values are coerced to the types of the fields.
+    """
+    _id = uuid.UUID(int=1)
+    lookup = L.from_json((
+        L('id', [str(_id)], lookup=IN) & L('born', '2017-06-06', lookup=GT) &
+        L('price', '1.5') & L('name', 'a', lookup=CONTAINS) & L('age', 3) & L('score', 1.5, lookup=GT)
+    ).dumps())
+
+    validated = SCHEMA.validate(lookup)
+
+    assert [_filter[VALUE_KEY] for _filter in validated.filters] == [
+        [_id], date(2017, 6, 6), Decimal('1.5'), 'a', 3, 1.5]
+    assert type(validated.filters[5][VALUE_KEY]) is float
+    assert validated.filters[0][TYPE_KEY] == uuid.UUID.__name__
+    # Filters that did not change are shared.
+    assert validated.filters[3] is lookup.filters[3]
+    assert SCHEMA.from_json(lookup.dumps()).to_dict() == validated.to_dict()
+
+
+def test_collect_errors():
+    """
+    Test that all errors of a lookup are collected.
+    """
+    lookup = L('unknown', 1) | (L('age', 'old') & L('active', True)) | L('born', 13, lookup=MONTH, validate=False)
+
+    with raises(SchemaException) as excinfo:
+        SCHEMA.validate(lookup)
+
+    assert excinfo.value.errors == [
+        ([0], 'Unknown field `unknown`'),
+        ([1, 0], '`age`: Value needs to be of type int'),
+        ([1, 1], 'Lookup `exact` is not allowed for field `active`'),
+        ([2], '`born`: Month needs to be 1 <= month <= 12'),
+    ]
+    assert isinstance(excinfo.value, InvalidValueException)
+
+
+def test_type_mismatches():
+    """
+    Test values that are not coerced to the type of a field.
+    """
+    invalid = [
+        L('age', True),
+        L('age', 1.5),
+        L('born', datetime(2017, 6, 6)),
+        L('born', '06/06/2017'),
+        L('name', 1, lookup=CONTAINS),
+        L('created', 2017.5, lookup=YEAR),
+        L('age', [1, 'a'], lookup=IN, validate=False),
+        L('age', 1, lookup=IN, validate=False),
+        L('born', 'x', lookup=ISNULL, validate=False),
+        L('name', 'a', lookup=YEAR),
+    ]
+    for lookup in invalid:
+        with raises(SchemaException):
+            SCHEMA.validate(lookup)
+
+    assert SCHEMA.validate(L('created', 2017, lookup=YEAR)).to_dict() == L('created', 2017, lookup=YEAR).to_dict()
+
+
+def test_unchanged_filters():
+    """
+    Test that valid filters that need no coercion are kept.
+    """
+    lookup = L('active', True, lookup=ISNULL) & L('age', [1, 2], lookup=IN) & L('born', 6, lookup=MONTH)
+
+    validated = SCHEMA.from_dict(lookup.to_dict())
+
+    assert validated.to_dict() == lookup.to_dict()
+    assert validated.filters[1][VALUE_KEY] is lookup.filters[1][VALUE_KEY]
@@ -1,7 +1,39 @@
+from datetime import date, datetime, time, timedelta, timezone
+import threading
+import uuid
+
+from django.db import connection, models
 from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from pytest import fixture, raises
+
+from filterql import IN, ISNULL, L, YEAR
+from filterql.serializers import (ArrayInStrategy, ChunkedInStrategy, DjangoSerializer, InStrategy,
+                                  TemporaryTableInStrategy)
+
+
+CREATED = datetime(2017, 1, 1, 12, tzinfo=timezone.utc)
+
 
-from filterql import ISNULL, L
-from filterql.serializers import DjangoSerializer
+class Item(models.Model):
+    name = models.CharField(max_length=32)
+    created = models.DateTimeField(null=True)
+
+    class Meta:
+        app_label = 'filterql_tests'
+
+
+@fixture
+def items():
+    with connection.schema_editor() as schema_editor:
+        schema_editor.create_model(Item)
+    Item.objects.bulk_create([
+        Item(id=number, name='item %s' % number, created=CREATED + timedelta(hours=number))
+        for number in range(1, 3001)
+    ])
+    yield Item.objects
+    with connection.schema_editor() as schema_editor:
+        schema_editor.delete_model(Item)
 
 
 def _do_compare(result, expected):
@@ -157,3 +189,185 @@ def test_special_type_lookup():
     expected = Q(pi=pi)
 
     _do_comparison_test(lookup, expected)
+
+
+def test_template_cache():
+    """
+    Test reusing the template for lookups with the same shape.
+    """
+    DjangoSerializer.process_cache.clear()
+    serializer = DjangoSerializer()
+
+    lookup = L('name', 'spindle') & ~L('country', 'netherlands')
+    _do_compare(serializer.deserialize(lookup), Q(name='spindle') & ~Q(country='netherlands'))
+
+    lookup = L('name', 'devhouse') & ~L('country', 'germany')
+    _do_compare(serializer.deserialize(lookup), Q(name='devhouse') & ~Q(country='germany'))
+
+    assert len(serializer.cache) == 1
+    assert serializer.cache.hits == 1
+    assert serializer.cache.misses == 1
+    assert serializer.cache.hit_rate == 0.5
+
+    # A new serializer uses the template of the process cache.
+    other = DjangoSerializer()
+    _do_compare(other.deserialize(lookup), Q(name='devhouse') & ~Q(country='germany'))
+
+    assert other.cache.misses == 1
+    assert DjangoSerializer.process_cache.hits == 1
+
+    # Different lookup types have a different shape.
+    lookup = L('name', True, lookup=ISNULL) & ~L('country', 'germany')
+    _do_compare(serializer.deserialize(lookup), Q(name__isnull=True) & ~Q(country='germany'))
+
+    assert len(serializer.cache) == 2
+
+
+def test_without_process_cache():
+    """
+    Test a serializer that does not share its templates.
+    """
+    DjangoSerializer.process_cache.clear()
+    serializer = DjangoSerializer(cache_size=1, use_process_cache=False)
+
+    serializer.deserialize(L('name', 'spindle'))
+    serializer.deserialize(L('country', 'netherlands'))
+
+    assert len(serializer.cache) == 1
+    assert len(DjangoSerializer.process_cache) == 0
+
+
+def _table_exists(table):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM sqlite_temp_master WHERE name = %s", [table.strip('"')])
+        return cursor.fetchone()[0] == 1
+
+
+def test_in_strategies(items):
+    """
+    Test the strategies for `in` lookups with many values.
+    """
+    ids = list(range(2, 5001, 2))
+    lookup = L('id', ids, lookup=IN) & ~L('name', 'item 4')
+    expected = [2] + list(range(6, 3001, 2))
+
+    temporary_table = TemporaryTableInStrategy()
+    strategies = [
+        InStrategy(),
+        ChunkedInStrategy(),
+        ChunkedInStrategy(chunk_size=100, max_params=10000),
+        ArrayInStrategy(),
+        temporary_table,
+    ]
+
+    with temporary_table.scope():
+        for strategy in strategies:
+            serializer = DjangoSerializer(in_strategy=strategy, in_threshold=10)
+            query = items.filter(serializer.deserialize(lookup)).order_by('id')
+            assert list(query.values_list('id', flat=True)) == expected
+
+        tables = list(temporary_table.tables)
+        assert len(tables) == 1
+        assert _table_exists(tables[0])
+
+    # The tables are dropped at the end of the scope.
+    assert temporary_table.tables is None
+    assert not _table_exists(tables[0])
+
+    # Chunks are `or`ed together.
+    in_query = DjangoSerializer(in_strategy=strategies[2]).deserialize(lookup).children[0]
+    assert in_query.connector == Q.OR
+    assert len(in_query.children) == 25
+
+    # More values than the parameters sqlite allows in a query are not chunked.
+    assert ChunkedInStrategy().get_max_params() == 999
+    django_lookup, values = ChunkedInStrategy(chunk_size=100).convert(Q, 'id__in', ids)
+    assert django_lookup == 'id__in'
+    assert isinstance(values, RawSQL)
+
+    # Small lookups are not changed.
+    small = L('id', [1, 2], lookup=IN)
+    assert DjangoSerializer(in_strategy=strategies[2]).deserialize(small).children == [('id__in', [1, 2])]
+    assert InStrategy().convert(Q, 'id__in', iter([1, 2])) == ('id__in', [1, 2])
+
+
+def test_in_strategy_types(items):
+    """
+    Test the column types of the temporary table and unsupported backends.
+    """
+    strategy = TemporaryTableInStrategy()
+    assert strategy.get_column_type([1]) == 'bigint'
+    assert strategy.get_column_type([1.5]) == 'double precision'
+    assert strategy.get_column_type(['a']) == 'text'
+    assert strategy.get_column_type([]) == 'text'
+    assert TemporaryTableInStrategy(column_type='uuid').get_column_type([1]) == 'uuid'
+
+    serializer = DjangoSerializer(in_strategy=strategy, in_threshold=1)
+    with strategy.scope():
+        query = items.filter(serializer.deserialize(L('name', ['item 1', 'item 2', 'x'], lookup=IN)))
+        assert query.count() == 2
+
+    # Values are compared in the format the database stores them.
+    created = [CREATED + timedelta(hours=number) for number in (1, 3)] + [CREATED]
+
+    def created_ids(strategy):
+        serializer = DjangoSerializer(in_strategy=strategy, in_threshold=1)
+        query = items.filter(serializer.deserialize(L('created', created, lookup=IN))).order_by('id')
+        return list(query.values_list('id', flat=True))
+
+    assert created_ids(ArrayInStrategy()) == [1, 3]
+    with strategy.scope():
+        assert created_ids(strategy) == [1, 3]
+
+    strategy = ArrayInStrategy()
+    assert strategy.adapt_value(date(2017, 1, 1)) == '2017-01-01'
+    assert strategy.adapt_value(time(12, 30)) == '12:30:00'
+    assert strategy.adapt_value(uuid.UUID(int=1)) == uuid.UUID(int=1).hex
+    assert strategy.adapt_value(1) == 1
+    strategy.ARRAY_SQL = {}
+    assert isinstance(strategy.convert(Q, 'id__in', [1, 2]), Q)
+
+
+def test_temporary_table_scopes(items):
+    """
+    Test that temporary tables are only created in a scope of the thread.
+    """
+    strategy = TemporaryTableInStrategy()
+    lookup = L('id', [1, 2, 3], lookup=IN)
+    serializer = DjangoSerializer(in_strategy=strategy, in_threshold=1)
+
+    with raises(RuntimeError):
+        serializer.deserialize(lookup)
+
+    with strategy.scope():
+        serializer.deserialize(lookup)
+        with strategy.scope():
+            inner = items.filter(serializer.deserialize(lookup))
+            assert inner.count() == 3
+            assert len(strategy.tables) == 1
+        assert len(strategy.tables) == 1
+
+        # Other threads have their own scopes.
+        errors = []
+
+        def convert():
+            try:
+                strategy.convert(Q, 'id__in', [1])
+            except RuntimeError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=convert)
+        thread.start()
+        thread.join()
+        assert len(errors) == 1
+    assert strategy.tables is None
+
+
+def test_rewrite_dates():
+    """
+    Test rewriting date part lookups into ranges.
+    """
+    lookup = L('created', 2020, lookup=YEAR) & L('name', 'spindle')
+    expected = Q(created__gte=date(2020, 1, 1)) & Q(created__lt=date(2021, 1, 1)) & Q(name='spindle')
+
+    _do_compare(DjangoSerializer(rewrite_dates=True).deserialize(lookup), expected)
@@ -0,0 +1,172 @@
+from datetime import datetime
+import sqlite3
+
+from pytest import fixture
+
+from filterql import (CONTAINS, DAY, ENDSWITH, GT, GTE, HOUR, ICONTAINS, IENDSWITH, IEXACT, IN, ISNULL,
+                      ISTARTSWITH, L, LT, LTE, MINUTE, MONTH, SECOND, STARTSWITH, WEEK, YEAR)
+from filterql.evaluators import filter_records
+from filterql.serializers import SQLDialect, SQLSerializer
+from filterql.utils import compact_values
+
+
+RECORDS = [
+    {'id': 1, 'name': 'Devhouse Spindle', 'count': 10, 'created': datetime(2017, 6, 6, 13, 37, 5)},
+    {'id': 2, 'name': 'spindle', 'count': 20, 'created': datetime(2016, 1, 1, 0, 0, 30)},
+    {'id': 3, 'name': '100% sp*ndle_', 'count': None, 'created': datetime(2015, 12, 28, 23, 59, 0)},
+    {'id': 4, 'name': None, 'count': 5, 'created': None},
+]
+
+
+@fixture
+def connection():
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE record (id INTEGER, name TEXT, count INTEGER, created TEXT)')
+    for record in RECORDS:
+        created = record['created'].isoformat(' ') if record['created'] else None
+        connection.execute(
+            'INSERT INTO record VALUES (?, ?, ?, ?)', (record['id'], record['name'], record['count'], created))
+    yield connection
+    connection.close()
+
+
+def _query(connection, lookup, serializer=None):
+    sql, params = (serializer or SQLSerializer()).deserialize(lookup)
+    rows = connection.execute('SELECT id FROM record WHERE %s ORDER BY id' % sql, params).fetchall()
+    return [row[0] for row in rows]
+
+
+def test_lookup_types(connection):
+    """
+    Test all lookup types against sqlite and the in memory evaluators.
+    """
+    lookups = [
+        L('name', 'spindle'),
+        L('name', 'SPINDLE', lookup=IEXACT),
+        L('name', None),
+        L('name', 'Spin', lookup=CONTAINS),
+        L('name', 'spin', lookup=ICONTAINS),
+        L('name', '% sp*', lookup=CONTAINS),
+        L('name', 'ndle_', lookup=ENDSWITH),
+        L('name', 'spindle', lookup=IENDSWITH),
+        L('name', 'spin', lookup=STARTSWITH),
+        L('name', 'DEV', lookup=ISTARTSWITH),
+        L('count', [5, 20], lookup=IN),
+        L('count', compact_values([20, 5]), lookup=IN),
+        L('name', compact_values(['spindle', 'x']), lookup=IN),
+        L('count', [], lookup=IN),
+        L('count', 10, lookup=GT),
+        L('count', 10, lookup=GTE),
+        L('count', 10, lookup=LT),
+        L('count', 10, lookup=LTE),
+        L('count', True, lookup=ISNULL),
+        L('count', False, lookup=ISNULL),
+        L('created', 2016, lookup=YEAR),
+        L('created', 6, lookup=MONTH),
+        L('created', 53, lookup=WEEK),
+        L('created', 23, lookup=WEEK),
+        L('created', 28, lookup=DAY),
+        L('created', 13, lookup=HOUR),
+        L('created', 59, lookup=MINUTE),
+        L('created', 30, lookup=SECOND),
+    ]
+
+    for lookup in lookups:
+        expected = [record['id'] for record in filter_records(lookup, RECORDS)]
+        assert _query(connection, lookup) == expected, lookup.to_dict()
+
+
+def test_nodes(connection):
+    """
+    Test `and`, `or` and `not` nodes.
+    """
+    lookup = (L('count', 5, lookup=GT) & ~L('name', 'spindle')) | L('created', 2015, lookup=YEAR)
+    assert _query(connection, lookup) == [1, 3]
+
+    # Negations include the rows with NULL columns, like the evaluators.
+    lookups = [
+        ~L('name', 'spindle'),
+        ~L('count', 10, lookup=GT),
+        ~(L('count', 10, lookup=GT) | ~L('name', 'spin', lookup=STARTSWITH)),
+        ~(L('name', None) | L('count', [], lookup=IN) | L('created', True, lookup=ISNULL)),
+        ~L('created', 2016, lookup=YEAR),
+    ]
+    for lookup in lookups:
+        expected = [record['id'] for record in filter_records(lookup, RECORDS)]
+        assert _query(connection, lookup) == expected, lookup.to_dict()
+
+    empty = L('count', 5, lookup=GT)
+    empty.filters = []
+    assert _query(connection, empty) == [1, 2, 3, 4]
+
+    empty.connector = L.OR
+    assert _query(connection, empty) == []
+
+
+def test_shape_cache(connection):
+    """
+    Test that lookups with the same shape share the SQL text.
+    """
+    serializer = SQLSerializer(cache_size=2)
+
+    first = serializer.deserialize(L('name', 'spindle') & L('count', [1, 2], lookup=IN))
+    second = serializer.deserialize(L('name', 'devhouse') & L('count', [3, 4], lookup=IN))
+
+    assert first[0] is second[0]
+    assert first[1] == ['spindle', 1, 2]
+    assert second[1] == ['devhouse', 3, 4]
+    assert len(serializer.cache) == 1
+
+    # Different value shapes need different SQL.
+    serializer.deserialize(L('name', None) & L('count', [3, 4], lookup=IN))
+    serializer.deserialize(L('name', 'spindle') & L('count', [3], lookup=IN))
+    assert len(serializer.cache) == 2
+
+    assert _query(connection, L('count', 10), serializer) == [1]
+
+
+def test_from_json():
+    """
+    Test compiling a json lookup.
+    """
+    lookup = L('name', 'spindle') | ~L('count', 10, lookup=GT)
+    sql, params = SQLSerializer().from_json(lookup.dumps())
+
+    assert sql == '"name" = ? OR (NOT (("count" > ? AND "count" IS NOT NULL)))'
+    assert params == ['spindle', 10]
+
+
+def test_default_dialect():
+    """
+    Test the standard SQL dialect.
+    """
+    serializer = SQLSerializer(dialect=SQLDialect())
+    lookup = (
+        L('owner__name', '50%_off', lookup=ICONTAINS) &
+        L('created', 2017, lookup=YEAR) &
+        L('name', 'a"b', lookup=STARTSWITH)
+    )
+    sql, params = serializer.deserialize(lookup)
+
+    assert sql == (
+        'UPPER("owner"."name") LIKE UPPER(%s) ESCAPE \'\\\' AND EXTRACT(YEAR FROM "created") = %s AND '
+        '"name" LIKE %s ESCAPE \'\\\''
+    )
+    assert params == ['%50\\%\\_off%', 2017, 'a"b%']
+
+
+def test_tuple_value_shapes():
+    """
+    Test dialects with value shapes that are tuples.
+    """
+    class PairDialect(SQLDialect):
+        def value_shape(self, lookup, value):
+            return (lookup, super(PairDialect, self).value_shape(lookup, value))
+
+        def lookup(self, column, lookup, value_shape):
+            return super(PairDialect, self).lookup(column, lookup, value_shape[1])
+
+    sql, params = SQLSerializer(dialect=PairDialect()).deserialize(L('count', [1, 2], lookup=IN) & L('name', 'a'))
+
+    assert sql == '"count" IN (%s, %s) AND "name" = %s'
+    assert params == [1, 2, 'a']
@@ -0,0 +1,153 @@
+from datetime import datetime
+
+from pytest import fixture
+from sqlalchemy import Column, create_engine, DateTime, Integer, MetaData, select, String, Table
+
+from filterql import (CONTAINS, DAY, ENDSWITH, GT, GTE, HOUR, ICONTAINS, IENDSWITH, IEXACT, IN, ISNULL,
+                      ISTARTSWITH, L, LT, LTE, MINUTE, MONTH, SECOND, STARTSWITH, WEEK, YEAR)
+from filterql.evaluators import filter_records
+from filterql.serializers import SQLAlchemySerializer
+
+
+metadata = MetaData()
+table = Table(
+    'record', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String),
+    Column('count', Integer),
+    Column('created', DateTime),
+)
+
+RECORDS = [
+    {'id': 1, 'name': 'devhouse spindle', 'count': 10, 'created': datetime(2017, 6, 6, 13, 37, 5)},
+    {'id': 2, 'name': 'spindle', 'count': 20, 'created': datetime(2016, 1, 1, 0, 0, 30)},
+    {'id': 3, 'name': '100% spindle_', 'count': None, 'created': datetime(2015, 12, 28, 23, 59, 0)},
+    {'id': 4, 'name': None, 'count': 5, 'created': None},
+]
+
+
+@fixture
+def connection():
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    with engine.connect() as connection:
+        connection.execute(table.insert(), RECORDS)
+        yield connection
+
+
+def _query(connection, lookup):
+    expression = SQLAlchemySerializer(table).deserialize(lookup)
+    statement = select(table.c.id).where(expression).order_by(table.c.id)
+    return [row[0] for row in connection.execute(statement)]
+
+
+def test_lookup_types(connection):
+    """
+    Test all lookup types against sqlite and the in memory evaluators.
+
+    LIKE is case insensitive in sqlite so the records only use lowercase.
+    """
+    lookups = [
+        L('name', 'spindle'),
+        L('name', 'SPINDLE', lookup=IEXACT),
+        L('name', None),
+        L('name', None, lookup=IEXACT),
+        L('name', 'spin', lookup=CONTAINS),
+        L('name', 'SPIN', lookup=ICONTAINS),
+        L('name', '% sp', lookup=CONTAINS),
+        L('name', 'dle_', lookup=ENDSWITH),
+        L('name', 'SPINDLE', lookup=IENDSWITH),
+        L('name', 'spin', lookup=STARTSWITH),
+        L('name', 'DEV', lookup=ISTARTSWITH),
+        L('count', [5, 20], lookup=IN),
+        L('count', [], lookup=IN),
+        L('count', 10, lookup=GT),
+        L('count', 10, lookup=GTE),
+        L('count', 10, lookup=LT),
+        L('count', 10, lookup=LTE),
+        L('count', True, lookup=ISNULL),
+        L('count', False, lookup=ISNULL),
+        L('created', 2016, lookup=YEAR),
+        L('created', 6, lookup=MONTH),
+        L('created', 28, lookup=DAY),
+        L('created', 53, lookup=WEEK),
+        L('created', 23, lookup=WEEK),
+        L('created', 13, lookup=HOUR),
+        L('created', 59, lookup=MINUTE),
+        L('created', 30, lookup=SECOND),
+    ]
+
+    for lookup in lookups:
+        expected = [record['id'] for record in filter_records(lookup, RECORDS)]
+        assert _query(connection, lookup) == expected, lookup.to_dict()
+
+
+def test_nodes(connection):
+    """
+    Test `and`, `or` and `not` nodes.
+    """
+    lookup = (L('count', 5, lookup=GT) & ~L('name', 'spindle')) | L('created', 2015, lookup=YEAR)
+    assert _query(connection, lookup) == [1, 3]
+
+    empty = L('count', 5, lookup=GT)
+    empty.filters = []
+    assert _query(connection, empty) == [1, 2, 3, 4]
+
+    empty.connector = L.OR
+    assert _query(connection, empty) == []
+
+
+def test_flatten():
+    """
+    Test flattening nested nodes with the same connector.
+    """
+    lookup = L('count', 1) & L('count', 2)
+    lookup.filters.append(L('name', 'a') & L('name', 'b'))
+    lookup.filters.append(L('name', 'c') | L('name', 'd'))
+    expression = SQLAlchemySerializer(table).deserialize(lookup)
+
+    assert len(expression.clauses) == 5
+    assert str(expression) == (
+        'record.count = :count_1 AND record.count = :count_2 AND record.name = :name_1 AND '
+        'record.name = :name_2 AND (record.name = :name_3 OR record.name = :name_4)'
+    )
+
+
+def test_cache_key():
+    """
+    Test that lookups with the same shape have the same cache key.
+    """
+    serializer = SQLAlchemySerializer(table)
+
+    def cache_key(lookup):
+        return select(table.c.id).where(serializer.deserialize(lookup))._generate_cache_key().key
+
+    first = L('name', 'spindle', lookup=ICONTAINS) & L('count', [1, 2], lookup=IN)
+    second = L('name', 'devhouse', lookup=ICONTAINS) & L('count', [3, 4, 5], lookup=IN)
+    third = L('name', 'devhouse', lookup=CONTAINS) & L('count', [3, 4, 5], lookup=IN)
+
+    assert cache_key(first) == cache_key(second)
+    assert cache_key(first) != cache_key(third)
+
+
+def test_from_json(connection):
+    """
+    Test deserializing a json lookup.
+    """
+    lookup = L('created', datetime(2016, 1, 1, 0, 0, 30)) | L('id', 1)
+    expression = SQLAlchemySerializer(table).from_json(lookup.dumps())
+    statement = select(table.c.id).where(expression).order_by(table.c.id)
+
+    assert [row[0] for row in connection.execute(statement)] == [1, 2]
+
+
+def test_iso_week_dialects():
+    """
+    Test that the ISO week compiles to the expression of the dialect.
+    """
+    from sqlalchemy.dialects import mysql, postgresql
+
+    expression = SQLAlchemySerializer(table).deserialize(L('created', 53, lookup=WEEK))
+
+    assert 'EXTRACT(WEEK FROM record.created)' in str(expression.compile(dialect=postgresql.dialect()))
+    assert 'WEEK(record.created, 3)' in str(expression.compile(dialect=mysql.dialect()))
@@ -0,0 +1,58 @@
+from filterql import CONTAINS, ENDSWITH, EXACT, ICONTAINS, IENDSWITH, ISTARTSWITH, L, STARTSWITH
+from filterql.evaluators import filter_records
+from filterql.textmatch import AhoCorasick, TextMatcher
+
+
+RECORDS = [
+    {'name': 'Devhouse Spindle', 'city': 'Amsterdam'},
+    {'name': 'spindle', 'city': 'Utrecht'},
+    {'name': 'house of cards', 'city': 'Rotterdam'},
+    {'name': 'Bob', 'city': None},
+    {'name': None, 'city': 'Amsterdam'},
+    {'name': 12345, 'city': 'Den Haag'},
+]
+
+
+def test_aho_corasick():
+    """
+    Test finding all occurrences of overlapping patterns.
+    """
+    automaton = AhoCorasick(['he', 'she', 'his', 'hers'])
+
+    assert sorted(automaton.search('ushers')) == [(0, 3), (1, 3), (3, 5)]
+    assert list(automaton.search('xyz')) == []
+    assert list(AhoCorasick([]).search('text')) == []
+
+
+def test_same_results_as_evaluators():
+    """
+    Test the text matcher has the same semantics as the evaluators.
+    """
+    lookups = [
+        L('name', 'spindle', lookup=ICONTAINS) | L('name', 'HOUSE', lookup=ICONTAINS),
+        L('name', 'house', lookup=CONTAINS) | L('name', 'Dev', lookup=STARTSWITH) | L('name', 'dle', lookup=ENDSWITH),
+        L('name', 'spin', lookup=ISTARTSWITH) & ~L('name', 'DLE', lookup=IENDSWITH),
+        L('name', 'spindle', lookup=IENDSWITH) & L('city', 'dam', lookup=ENDSWITH),
+        L('name', '', lookup=CONTAINS) & ~L('city', 'Amsterdam', lookup=EXACT),
+        L('name', '234', lookup=CONTAINS) | L('name', 'bob', lookup=IENDSWITH),
+        L('name', None, lookup=CONTAINS) | L('name', 'se', lookup=CONTAINS),
+    ]
+
+    for lookup in lookups:
+        assert TextMatcher(lookup).filter(RECORDS) == filter_records(lookup, RECORDS), lookup.to_dict()
+
+
+def test_many_patterns():
+    """
+    Test a large `or` of `icontains` leaves on the same field.
+    """
+    words = ['word%s' % number for number in range(50)]
+    lookup = L('text', words[0], lookup=ICONTAINS)
+    for word in words[1:]:
+        lookup = lookup | L('text', word, lookup=ICONTAINS)
+
+    records = [{'text': 'This has WORD42 in it'}, {'text': 'This has none'}, {'text': 'WoRd7'}]
+    matcher = TextMatcher(lookup)
+
+    assert matcher.filter(records) == [records[0], records[2]]
+    assert len(matcher._groups) == 1
@@ -1,13 +1,20 @@
-from datetime import date, datetime
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+import uuid
 
 from pytest import raises
+import simplejson as json
 
 from filterql.exceptions import DecodeException
 from filterql.lookup import TYPE_KEY, VALUE_KEY
 from filterql.utils import (
+    compact_values,
     decode_date,
     decode_datetime,
+    encoded_type,
     ENCODERS,
+    LRUCache,
+    SortedValues,
     TypeEncoder,
     type_decoder,
 )
@@ -63,6 +70,51 @@ def test_type_decoder():
         decoded = type_decoder(decimal_dict)
 
 
+def test_extended_types_round_trip():
+    """
+    Test encoding and decoding of all types with an encoder.
+    """
+    values = [
+        datetime(2017, 6, 6, 13, 37, 0, 123456, tzinfo=timezone(timedelta(hours=2))),
+        time(13, 37, 5, 10),
+        timedelta(days=3, seconds=7, microseconds=1),
+        -timedelta(microseconds=1),
+        uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        Decimal('0.1'),
+        [uuid.UUID(int=1), uuid.UUID(int=2)],
+    ]
+    for value in values:
+        value_json = json.dumps({VALUE_KEY: value, TYPE_KEY: encoded_type(value)}, cls=TypeEncoder)
+        decoded = json.loads(value_json, object_hook=type_decoder, use_decimal=True)
+
+        assert decoded[VALUE_KEY] == value
+        assert type(decoded[VALUE_KEY]) is type(value)
+
+
+def test_encoded_type():
+    """
+    Test the type of values, lists of values and subclasses.
+    """
+    class Day(date):
+        pass
+
+    assert encoded_type(date(2017, 6, 6)) == 'date'
+    assert encoded_type(Decimal(1)) == 'Decimal'
+    assert encoded_type([time(1), time(2)]) == 'time'
+    assert encoded_type([time(1), 2]) is None
+    assert encoded_type([]) is None
+    assert encoded_type('2017-06-06') is None
+
+    # Subclasses are encoded and typed like their base class.
+    assert encoded_type(Day(2017, 6, 6)) == 'date'
+    assert encoded_type([Day(2017, 6, 6), date(2017, 6, 7)]) == 'date'
+    assert encoded_type([Day(2017, 6, 6), datetime(2017, 6, 7)]) is None
+    assert json.dumps(Day(2017, 6, 6), cls=TypeEncoder) == '"2017-06-06"'
+
+    with raises(DecodeException):
+        type_decoder({VALUE_KEY: ['2017-06-06', 'x'], TYPE_KEY: 'date'})
+
+
 def test_decode_date():
     """
     Test decoding of date string.
@@ -83,3 +135,70 @@ def test_decode_datetime():
     result = decode_datetime(datetime_obj.isoformat())
 
     assert result == datetime_obj
+    # Other formats than ISO 8601 are parsed too.
+    assert decode_datetime('June 6 2017 13:37') == datetime_obj
+
+
+def test_lru_cache():
+    """
+    Test evicting the least recently used entry and counting hits.
+    """
+    cache = LRUCache(maxsize=2)
+
+    assert cache.hit_rate == 0.0
+
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+
+    cache.set('c', 3)
+    assert 'b' not in cache
+    assert 'a' in cache
+    assert cache.get('b', 'default') == 'default'
+    assert len(cache) == 2
+    assert cache.hits == 1
+    assert cache.misses == 1
+    assert cache.hit_rate == 0.5
+
+    evicted = []
+    cache.on_evict = lambda key, value: evicted.append((key, value))
+    assert cache.peek('c') == 3 and cache.peek('b') is None
+    cache.set('d', 4)
+    assert evicted == [('a', 1)]
+    assert cache.items() == [('c', 3), ('d', 4)]
+    assert cache.pop('c') == 3 and cache.pop('c') is None
+    assert cache.hits == 1
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.hits == cache.misses == 0
+
+
+def test_compact_values():
+    """
+    Test the compact storage and membership of `in` values.
+    """
+    values = compact_values([3, 1, 2, 3])
+    assert isinstance(values, SortedValues)
+    assert values.values.typecode == 'q'
+    assert list(values) == [1, 2, 3] and len(values) == 3 and values[0] == 1
+    assert 2 in values and 2.0 in values and 4 not in values and None not in values and 'a' not in values
+
+    assert compact_values([1.5, 0.5]).values.typecode == 'd'
+    assert compact_values(['b', 'a']).values == ('a', 'b')
+    assert 'a' in compact_values(['b', 'a'])
+    assert compact_values([2 ** 70, 1]) == frozenset([2 ** 70, 1])
+    assert compact_values([1, 'a']) == frozenset([1, 'a'])
+    assert compact_values([[1], 2]) == [[1], 2]
+    assert compact_values(values) is values
+    assert compact_values(iter([2, 1])) == SortedValues([1, 2], 'q')
+    assert compact_values(iter([2, 1])) != SortedValues([1, 2])
+    assert repr(compact_values(['b', 'a'])) == "SortedValues(['a', 'b'])"
+    assert compact_values(5) == 5
+
+    # Values that can not be ordered are not searched with bisection.
+    nan = float('nan')
+    assert 1.0 in compact_values([nan, 1.0, 0.5]) and isinstance(compact_values([nan, 1.0]), frozenset)
+    decimals = compact_values([Decimal('NaN'), Decimal(1)])
+    assert isinstance(decimals, frozenset) and Decimal(1) in decimals
+    assert json.loads(json.dumps({'values': values}, cls=TypeEncoder)) == {'values': [1, 2, 3]}
@@ -1,6 +1,6 @@
 from pytest import raises
 
-from filterql import DAY, HOUR, ISNULL, MINUTE, MONTH, SECOND, WEEK
+from filterql import DAY, HOUR, IN, ISNULL, MINUTE, MONTH, SECOND, WEEK
 from filterql.exceptions import InvalidValueException
 from filterql.validators import VALIDATORS
 
@@ -163,3 +163,22 @@ def test_second_validator():
         validator('spindle')
 
     assert str(excinfo.value) == message
+
+
+def test_in_validator():
+    validator = VALIDATORS[IN]
+
+    validator([1, 2])
+    validator(('a', 1))
+    validator(frozenset([1]))
+
+    for value in ['spindle', 1, {'a': 1}]:
+        with raises(InvalidValueException) as excinfo:
+            validator(value)
+
+        assert str(excinfo.value) == 'Value needs to be a list of values for IN lookup type.'
+
+    with raises(InvalidValueException) as excinfo:
+        validator([1, [2]])
+
+    assert str(excinfo.value) == 'Values of IN lookup type can not be lists, dicts or sets.'
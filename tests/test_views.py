@@ -0,0 +1,103 @@
+from pytest import raises
+
+from filterql import GTE, L
+from filterql.views import MaterializedView
+
+
+def _records():
+    return [
+        {'id': 1, 'status': 'active', 'owner': 'spindle', 'count': 10},
+        {'id': 2, 'status': 'inactive', 'owner': 'spindle', 'count': 20},
+        {'id': 3, 'status': 'active', 'owner': 'devhouse', 'count': 5},
+    ]
+
+
+def _ids(view):
+    return sorted(record['id'] for record in view)
+
+
+def test_initial_records():
+    """
+    Test materializing the initial records of a view.
+    """
+    lookup = L('status', 'active') & (L('owner', 'spindle') | L('count', 5))
+    view = MaterializedView(lookup, _records())
+
+    assert _ids(view) == [1, 3]
+    assert len(view) == 2
+    assert {'id': 1} in view
+    assert view.fields == {'status', 'owner', 'count'}
+
+
+def test_insert_update_delete():
+    """
+    Test keeping the view up to date and notifying listeners.
+    """
+    events = []
+    lookup = L('status', 'active') & ~L('count', 100, lookup=GTE)
+    view = MaterializedView(lookup, _records())
+    view.add_listener(lambda added, removed: events.append(([r['id'] for r in added], [r['id'] for r in removed])))
+
+    view.insert({'id': 4, 'status': 'active', 'owner': 'spindle', 'count': 1})
+    assert _ids(view) == [1, 3, 4]
+
+    view.update({'id': 4, 'status': 'active', 'owner': 'spindle', 'count': 100})
+    assert _ids(view) == [1, 3]
+
+    view.update({'id': 2, 'status': 'active', 'owner': 'spindle', 'count': 20}, fields=['status', 'unknown'])
+    assert _ids(view) == [1, 2, 3]
+
+    # Unchanged results do not notify the listeners.
+    view.update({'id': 2, 'status': 'active', 'owner': 'devhouse', 'count': 20})
+    view.delete({'id': 1})
+    view.delete({'id': 4})
+    assert _ids(view) == [2, 3]
+
+    assert events == [([4], []), ([], [4]), ([2], []), ([], [1])]
+
+
+def test_in_place_updates():
+    """
+    Test detecting changes of records that are modified in place.
+    """
+    records = _records()
+    view = MaterializedView(L('count', 10, lookup=GTE), records, key=lambda record: record['id'])
+
+    records[2]['count'] = 50
+    view.update(records[2])
+
+    assert _ids(view) == [1, 2, 3]
+
+
+def test_duplicate_insert():
+    """
+    Test inserting a record with an existing key.
+    """
+    view = MaterializedView(L('status', 'active'), _records())
+
+    with raises(KeyError):
+        view.insert({'id': 1})
+
+
+def test_unchanged_nodes():
+    """
+    Test that changes stop propagating at nodes with an unchanged result.
+    """
+    events = []
+
+    def listener(added, removed):
+        events.append((added, removed))
+
+    lookup = L('status', 'active') & (L('owner', 'spindle') | L('count', 5))
+    view = MaterializedView(lookup, _records())
+    view.add_listener(listener)
+
+    view.update({'id': 3, 'status': 'active', 'owner': 'spindle', 'count': 5})
+    view.update({'id': 3, 'status': 'active', 'owner': 'spindle', 'count': 6})
+    assert _ids(view) == [1, 3]
+    assert events == []
+
+    view.remove_listener(listener)
+    view.delete({'id': 3})
+    assert _ids(view) == [1]
+    assert events == []